@@ -0,0 +1,179 @@
+"""
+Cold archival of old log partitions.
+
+The logs table only needs to hold the most recent partitions. This job takes
+every day/week partition (Database.partition) that ended more than
+LOG_HOT_DAYS ago, writes its rows to a gzip NDJSON file under
+Database.archive_dir, records it in the log_archives manifest and deletes the
+rows from the hot table in the same transaction. Database.get_logs and the
+time-series queries read archived partitions back when a query's time range
+reaches them; unranged /api/logs reads stay on the hot table. Each manifest
+row carries the Merkle root of its archived rows, which /api/merkle folds
+into its root over all events.
+
+Rollup tables are untouched, so /api/stats keeps covering the full history.
+
+Usage:
+    python -m backend.archive [db_path]
+"""
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from backend.database import Database, DAY_MS, now_ms, partition_bounds, row_to_log
+from backend.utils.hash import compute_merkle_root, log_leaf_hash
+from backend.logger import get_logger
+
+log = get_logger('archive')
+
+
+# Rows read per query while writing an archive file
+ARCHIVE_READ_BATCH = 1000
+
+
+def archive_partition(db, start_ms, end_ms):
+    """
+    Move the rows of one partition into an archive file.
+
+    The file and its Merkle root are written first, outside any write
+    transaction, from id-bounded batches of at most ARCHIVE_READ_BATCH rows,
+    so ingest is never held up by the copy. A short BEGIN IMMEDIATE then
+    checks the id range still holds exactly the rows written, records the
+    manifest and deletes that range. If rows moved into the window meanwhile
+    (a ts_ms backfill) nothing is deleted and the partition is retried on the
+    next run.
+
+    Returns:
+        Manifest dict for the written file, or None if the partition was
+        empty or changed while it was being written
+    """
+    conn = sqlite3.connect(db.db_name, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    path = tmp_path = None
+    try:
+        min_id, max_id = conn.execute("SELECT MIN(id), MAX(id) FROM logs WHERE ts_ms >= ? AND ts_ms < ?",
+                                      (start_ms, end_ms)).fetchone()
+        if min_id is None:
+            return None
+
+        os.makedirs(db.archive_dir, exist_ok=True)
+        day = time.strftime('%Y-%m-%d', time.gmtime(start_ms // 1000))
+        filename = f"logs-{db.partition}-{day}-{min_id}.ndjson.gz"
+        path = os.path.join(db.archive_dir, filename)
+        tmp_path = path + ".tmp"
+        leaves = []
+        min_ts = max_ts = None
+        last_id = min_id - 1
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            while True:
+                rows = conn.execute("SELECT * FROM logs WHERE id > ? AND id <= ? AND ts_ms >= ? AND ts_ms < ? "
+                                    "ORDER BY id LIMIT ?",
+                                    (last_id, max_id, start_ms, end_ms, ARCHIVE_READ_BATCH)).fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    record = dict(row)
+                    f.write(json.dumps(record, separators=(',', ':')) + "\n")
+                    leaves.append(log_leaf_hash(row_to_log(row)))  # as the API serves it
+                    min_ts = record['ts_ms'] if min_ts is None else min(min_ts, record['ts_ms'])
+                    max_ts = record['ts_ms'] if max_ts is None else max(max_ts, record['ts_ms'])
+                last_id = rows[-1]['id']
+
+        manifest = {
+            'path': filename,
+            'partition_start_ms': start_ms,
+            'partition_end_ms': end_ms,
+            'min_ts_ms': min_ts,
+            'max_ts_ms': max_ts,
+            'min_id': min_id,
+            'max_id': last_id,
+            'row_count': len(leaves),
+            'archived_ms': now_ms(),
+            # Newest first, the order /api/merkle hashes the hot logs in
+            'merkle_root': compute_merkle_root(leaves[::-1]),
+        }
+        window = (min_id, last_id, start_ms, end_ms)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            count = conn.execute("SELECT COUNT(*) FROM logs WHERE id BETWEEN ? AND ? AND ts_ms >= ? AND ts_ms < ?",
+                                 window).fetchone()[0]
+            if count != len(leaves):
+                conn.execute("ROLLBACK")
+                os.remove(tmp_path)
+                log.warning("Partition changed while archiving, retrying next run", path=filename)
+                return None
+            conn.execute("INSERT OR REPLACE INTO log_archives (path, partition_start_ms, partition_end_ms, min_ts_ms, max_ts_ms, min_id, max_id, row_count, archived_ms, merkle_root) "
+                         "VALUES (:path, :partition_start_ms, :partition_end_ms, :min_ts_ms, :max_ts_ms, :min_id, :max_id, :row_count, :archived_ms, :merkle_root)",
+                         manifest)
+            conn.execute("DELETE FROM logs WHERE id BETWEEN ? AND ? AND ts_ms >= ? AND ts_ms < ?", window)
+            os.replace(tmp_path, path)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return manifest
+    except BaseException:
+        for leftover in (tmp_path, path):
+            if leftover and os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    finally:
+        conn.close()
+
+
+def archive_old_partitions(db, hot_days=None):
+    """
+    Archive every partition that ended before the hot window.
+
+    Args:
+        db: Database instance
+        hot_days: Days of recent data kept in the logs table (default LOG_HOT_DAYS or 30)
+
+    Returns:
+        List of manifest dicts for the partitions archived in this run
+    """
+    if hot_days is None:
+        hot_days = int(os.getenv("LOG_HOT_DAYS", 30))
+    # Only whole partitions that lie entirely before the hot window
+    cutoff_ms, _ = partition_bounds(now_ms() - hot_days * DAY_MS, db.partition)
+    archived = []
+    while True:
+        conn = sqlite3.connect(db.db_name, timeout=30)
+        oldest = conn.execute("SELECT MIN(ts_ms) FROM logs WHERE ts_ms IS NOT NULL").fetchone()[0]
+        conn.close()
+        if oldest is None or oldest >= cutoff_ms:
+            break
+        start_ms, end_ms = partition_bounds(oldest, db.partition)
+        manifest = archive_partition(db, start_ms, end_ms)
+        if manifest is None:
+            break
+        log.info("Archived partition", path=manifest['path'], events=manifest['row_count'])
+        archived.append(manifest)
+    return archived
+
+
+def start_archiver(db, interval=None):
+    """Run archive_old_partitions periodically on a daemon thread"""
+    if interval is None:
+        interval = float(os.getenv("LOG_ARCHIVE_INTERVAL", 3600))
+
+    def worker():
+        while True:
+            try:
+                archive_old_partitions(db)
+            except Exception as e:
+                log.error("Archival run failed", error=str(e))
+            time.sleep(interval)
+
+    thread = threading.Thread(target=worker, name="log-archiver", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    for manifest in archive_old_partitions(Database(path, migrate=False)):
+        print(manifest)
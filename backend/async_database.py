@@ -0,0 +1,78 @@
+"""
+Awaitable access to a storage backend for async route handlers.
+
+Storage calls (sqlite3, file I/O) block, so async handlers must not call the
+store directly.
+AsyncDatabase exposes the same methods as coroutines and runs each call on a
+dedicated thread pool: one pool for reads and a separate one for writes, whose
+sizes bound read and write concurrency independently.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Database methods that write; everything else is treated as a read
+WRITE_METHODS = {
+    'log_attack',
+    'log_attacks',
+    'save_actions',
+    'append_action_chunk',
+    'close_action_session',
+    'log_session_attack',
+    'expire_action_sessions',
+    'save_explanations',
+    'flush',
+    'close',
+}
+
+
+class AsyncDatabase:
+    def __init__(self, db, read_concurrency=None, write_concurrency=None):
+        """
+        Args:
+            db: Store to wrap (see backend/storage/)
+            read_concurrency: Max concurrent reads (default DB_READ_CONCURRENCY or 4)
+            write_concurrency: Max concurrent writes (default DB_WRITE_CONCURRENCY or 1)
+        """
+        self.db = db
+        if read_concurrency is None:
+            read_concurrency = int(os.getenv("DB_READ_CONCURRENCY", 4))
+        if write_concurrency is None:
+            write_concurrency = int(os.getenv("DB_WRITE_CONCURRENCY", 1))
+        self._read_executor = ThreadPoolExecutor(max_workers=read_concurrency, thread_name_prefix="db-read")
+        self._write_executor = ThreadPoolExecutor(max_workers=write_concurrency, thread_name_prefix="db-write")
+
+    async def queue_attack(self, *args, **kwargs):
+        """Log an attack and return its id once committed"""
+        if self.db.write_behind:
+            # Enqueueing can block (a full queue, starting the writer), so it runs on the write
+            # pool too; the commit itself is awaited without holding a pool thread
+            future = await self._run(self._write_executor, self.db.queue_attack, *args, **kwargs)
+            return await asyncio.wrap_future(future)
+        return await self._run(self._write_executor, self.db.log_attack, *args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+        executor = self._write_executor if name in WRITE_METHODS else self._read_executor
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await self._run(executor, attr, *args, **kwargs)
+
+        return method
+
+    async def run(self, func, *args, write=False, **kwargs):
+        """Run another blocking storage-bound callable on the read (or write) pool"""
+        return await self._run(self._write_executor if write else self._read_executor, func, *args, **kwargs)
+
+    async def _run(self, executor, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        """Stop the worker threads (pending calls are completed first)"""
+        self._read_executor.shutdown(wait=True)
+        self._write_executor.shutdown(wait=True)
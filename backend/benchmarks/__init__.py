@@ -0,0 +1,2 @@
+# Benchmark scripts - run from the project root, e.g.:
+#   python -m backend.benchmarks.action_storage
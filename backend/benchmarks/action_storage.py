@@ -0,0 +1,74 @@
+"""
+Storage savings of the compact session-action encoding.
+
+Compares the JSON blob previously stored in session_actions.actions_json with
+the columnar encoding (with and without zlib) on demo_replays.json-style
+sessions, and times encoding/decoding.
+
+Usage:
+    python -m backend.benchmarks.action_storage [replays.json] [--repeat N]
+"""
+import argparse
+import json
+import time
+from backend.utils.action_codec import encode_actions, decode_actions
+
+
+def _time(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def measure(sessions, repeat=200):
+    """Return per-session and total byte counts plus encode/decode timings"""
+    results = []
+    totals = {'json_bytes': 0, 'compact_bytes': 0, 'compact_zlib_bytes': 0}
+    for session in sessions:
+        actions = session.get('actions') or []
+        as_json = json.dumps(actions).encode('utf-8')
+        compact = encode_actions(actions, compress=False)
+        compact_zlib = encode_actions(actions, compress=True)
+        assert decode_actions(compact_zlib) == actions
+        row = {
+            'id': session.get('id'),
+            'actions': len(actions),
+            'json_bytes': len(as_json),
+            'compact_bytes': len(compact),
+            'compact_zlib_bytes': len(compact_zlib),
+            'json_decode_us': _time(lambda: json.loads(as_json), repeat) * 1e6,
+            'compact_decode_us': _time(lambda: decode_actions(compact_zlib), repeat) * 1e6,
+            'compact_slice_decode_us': _time(lambda: decode_actions(compact_zlib, 0, 10), repeat) * 1e6,
+            'compact_encode_us': _time(lambda: encode_actions(actions), repeat) * 1e6,
+        }
+        for key in totals:
+            totals[key] += row[key]
+        results.append(row)
+    json_total = totals['json_bytes'] or 1
+    totals['compact_ratio'] = totals['compact_bytes'] / json_total
+    totals['compact_zlib_ratio'] = totals['compact_zlib_bytes'] / json_total
+    return {'sessions': results, 'totals': totals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', nargs='?', default='public/demo_replays.json')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    with open(args.path) as f:
+        sessions = json.load(f)
+    report = measure(sessions, args.repeat)
+    for row in report['sessions']:
+        print(f"event {row['id']}: {row['actions']} actions, json {row['json_bytes']} B, "
+              f"compact {row['compact_bytes']} B, compact+zlib {row['compact_zlib_bytes']} B | "
+              f"decode json {row['json_decode_us']:.1f} us, compact {row['compact_decode_us']:.1f} us, "
+              f"first 10 {row['compact_slice_decode_us']:.1f} us")
+    totals = report['totals']
+    print(f"total: json {totals['json_bytes']} B, compact {totals['compact_bytes']} B "
+          f"({totals['compact_ratio']:.1%}), compact+zlib {totals['compact_zlib_bytes']} B "
+          f"({totals['compact_zlib_ratio']:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Component micro-benchmarks, written as JSON so runs can be compared across commits.
+
+Times the pieces a request goes through - model prediction (single and
+batched), MerkleTree.add_leaf at growing tree sizes, compute_merkle_root,
+hash_event, SQLite log_attack/log_attacks/get_logs/get_log, the explanation
+rules and ReportLab PDF generation - on payloads drawn from the bundled
+backend/sqli.csv, backend/xss.csv and SQLiV3.csv corpora (seeded, so every
+run sees the same inputs).
+
+Each benchmark runs once to warm up, then --repeat timed samples; the JSON
+keeps per-operation median/p95/min nanoseconds. With --compare, medians are
+checked against an earlier results file and the exit status is 1 when one is
+slower by more than --threshold.
+
+Usage:
+    python -m backend.benchmarks.components [--quick] [--only SUITE ...]
+        [--output FILE] [--compare OLD.json] [--threshold 1.10]
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CORPORA = ('backend/sqli.csv', 'backend/xss.csv', 'SQLiV3.csv')
+SEED = 46
+
+
+class Skip(Exception):
+    """A benchmark that cannot run here (missing model file, optional dependency)"""
+
+
+def read_csv_rows(path):
+    # The corpora come in different encodings (sqli.csv is UTF-16), as in train_model.py
+    for encoding in ('utf-8-sig', 'utf-16', 'latin-1'):
+        try:
+            with open(path, encoding=encoding, newline='') as f:
+                return list(csv.reader(f))
+        except (UnicodeError, csv.Error):
+            continue
+    return []
+
+
+def load_corpus(per_file=2000):
+    """Up to per_file payloads from each bundled corpus, shuffled with a fixed seed"""
+    payloads = []
+    for path in CORPORA:
+        if not os.path.exists(path):
+            continue
+        rows = read_csv_rows(path)
+        # Payload column: "Sentence" (index 0, or 1 when the file has an unnamed index column)
+        header = rows[0] if rows else []
+        column = header.index('Sentence') if 'Sentence' in header else 0
+        taken = [row[column] for row in rows[1:] if len(row) > column and row[column].strip()]
+        payloads.extend(taken[:per_file])
+    if not payloads:
+        raise SystemExit("No corpus found: run from the repository root")
+    random.Random(SEED).shuffle(payloads)
+    return payloads
+
+
+def _event(i, payload):
+    kinds = ('SQLi', 'XSS', 'Benign')
+    return {
+        'ip_address': f"203.0.113.{i % 250}",
+        'input_payload': payload,
+        'attack_type': kinds[i % 3],
+        'confidence': 0.5 + (i % 50) / 100,
+        'deception_strategy': f"strategy-{i % 4}",
+        'timestamp': '2026-01-01T00:00:00+00:00',
+        'user_agent': 'bench',
+        'headers': {},
+        'actions': [{'type': 'keystroke', 'ts': 1000.0 + i, 'payload': payload[:1]}],
+    }
+
+
+def measure(fn, ops, repeat):
+    """Run fn once to warm up, then `repeat` timed calls of `ops` operations each"""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - started) / ops)
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        'ops_per_sample': ops,
+        'samples': repeat,
+        'median_ns': round(median, 1),
+        'p95_ns': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+        'min_ns': round(samples[0], 1),
+        'ops_per_sec': round(1e9 / median, 1) if median else None,
+    }
+
+
+def bench_model(payloads, quick):
+    from backend.model import MLModel
+    model = MLModel()
+    if model.model is None:
+        raise Skip("backend/model.pkl not found (python backend/train_model.py)")
+    texts = payloads[:100 if quick else 500]
+    yield 'model.predict', (lambda: [model.predict(text) for text in texts]), len(texts)
+    yield f'model.predict_batch[n={len(texts)}]', (lambda: model.predict_batch(texts)), len(texts)
+
+
+def bench_merkle(payloads, quick):
+    from backend.blockchain import MerkleTree
+    from backend.utils.hash import compute_merkle_root, sha256
+    adds = 20
+    for size in ((1000, 10000) if quick else (1000, 10000, 50000)):
+        tree = MerkleTree()
+        tree.add_leaves([payloads[i % len(payloads)] for i in range(size)])
+        base = len(tree.leaves)
+
+        def add_leaf(tree=tree, base=base):
+            # add_leaf rebuilds the root, so keep the tree at `size` leaves between samples
+            del tree.leaves[base:]
+            for i in range(adds):
+                tree.add_leaf(payloads[i])
+        yield f'merkle.add_leaf[n={size}]', add_leaf, adds
+    for size in ((1000, 10000) if quick else (1000, 10000, 100000)):
+        hashes = [sha256(payloads[i % len(payloads)] + str(i)) for i in range(size)]
+        yield f'hash.compute_merkle_root[n={size}]', (lambda hashes=hashes: compute_merkle_root(hashes)), 1
+
+
+def bench_hash_event(payloads, quick):
+    from backend.utils.hash import hash_event, hash_event_v1, hash_event_v2
+    from backend.benchmarks.event_hash import session_event
+    events = [_event(i, payload) for i, payload in enumerate(payloads[:500 if quick else 2000])]
+    yield 'hash.hash_event', (lambda: [hash_event(event) for event in events]), len(events)
+    session = session_event(10000 if quick else 100000)
+    actions = len(session['actions'])
+    yield f'hash.hash_event_v1[actions={actions}]', (lambda: hash_event_v1(session)), 1
+    yield f'hash.hash_event_v2[actions={actions}]', (lambda: hash_event_v2(session)), 1
+
+
+def bench_rules(payloads, quick):
+    from backend.services.fallbackRules import explain_attack
+    events = [_event(i, payload) for i, payload in enumerate(payloads[:500 if quick else 2000])]
+    yield 'rules.explain_attack', (lambda: [explain_attack(event) for event in events]), len(events)
+
+
+def bench_database(payloads, quick, tmp):
+    from backend.database import Database
+    db = Database(os.path.join(tmp, 'components.db'), write_behind=False, migrate=False)
+    rows = 2000 if quick else 20000
+    events = [(f"203.0.113.{i % 250}", payloads[i % len(payloads)], ('SQLi', 'XSS', 'Benign')[i % 3],
+               0.9, 'strategy', 'hash', None) for i in range(rows)]
+    for start in range(0, rows, 1000):
+        db.log_attacks(events[start:start + 1000])
+    singles = 50
+    yield 'db.log_attack', (lambda: [db.log_attack(*events[i][:6]) for i in range(singles)]), singles
+    yield 'db.log_attacks[batch=500]', (lambda: db.log_attacks(events[:500])), 500
+    yield f'db.get_logs[rows>={rows}]', db.get_logs, 1
+    ids = [random.Random(SEED + i).randint(1, rows) for i in range(200)]
+    yield 'db.get_log', (lambda: [db.get_log(event_id) for event_id in ids]), len(ids)
+
+
+def bench_report(payloads, quick, tmp):
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, 'report.db')
+    from backend.routes import report
+    if not report.REPORTLAB_AVAILABLE:
+        raise Skip("reportlab is not installed")
+    count = 200 if quick else 2000
+    report.db.log_attacks([("198.51.100.7", payloads[i % len(payloads)], ('SQLi', 'XSS', 'Benign')[i % 3],
+                            0.9, 'strategy', 'hash', None) for i in range(count)])
+    yield f'report.generate_pdf_report[events={count}]', (lambda: report.generate_pdf_report("198.51.100.7")), 1
+
+
+SUITES = {
+    'model': bench_model,
+    'merkle': bench_merkle,
+    'hash': bench_hash_event,
+    'rules': bench_rules,
+    'db': bench_database,
+    'report': bench_report,
+}
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, quick, repeat):
+    payloads = load_corpus(500 if quick else 2000)
+    tmp = tempfile.mkdtemp(prefix="chameleon-bench-")
+    results, skipped = {}, {}
+    for name in names:
+        suite = SUITES[name]
+        args = (payloads, quick, tmp) if name in ('db', 'report') else (payloads, quick)
+        try:
+            for label, fn, ops in suite(*args):
+                results[label] = measure(fn, ops, repeat)
+                r = results[label]
+                print(f"{label:<42} {r['median_ns'] / 1e3:12.2f} us/op  p95 {r['p95_ns'] / 1e3:10.2f} us", flush=True)
+        except Skip as e:
+            skipped[name] = str(e)
+            print(f"{name:<42} skipped: {e}", flush=True)
+    return {
+        'meta': {
+            'commit': _commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'quick': quick,
+            'repeat': repeat,
+            'corpus_payloads': len(payloads),
+        },
+        'results': results,
+        'skipped': skipped,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print median ratios against a baseline run; returns the labels that regressed"""
+    regressions = []
+    print(f"\nAgainst {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')}):")
+    for label, result in current['results'].items():
+        old = baseline['results'].get(label)
+        if old is None:
+            continue
+        ratio = result['median_ns'] / old['median_ns'] if old['median_ns'] else float('inf')
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions.append(label)
+        print(f"{label:<42} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='smaller inputs and fewer samples')
+    parser.add_argument('--only', nargs='+', choices=sorted(SUITES), help='run only these suites')
+    parser.add_argument('--repeat', type=int, help='timed samples per benchmark (default 7, quick 3)')
+    parser.add_argument('--output', help='results file (default components-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare medians against')
+    parser.add_argument('--threshold', type=float, default=1.10, help='slowdown ratio reported as a regression')
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_MIGRATE_ON_START", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    repeat = args.repeat or (3 if args.quick else 7)
+    current = run(args.only or list(SUITES), args.quick, repeat)
+
+    output = args.output or f"components-{current['meta']['commit'] or 'local'}.json"
+    with open(output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
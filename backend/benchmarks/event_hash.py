@@ -0,0 +1,90 @@
+"""
+Event hashing: version 1 (sorted-keys JSON) against version 2 (streamed binary).
+
+Hashes submit-shaped events with growing action arrays and reports, per
+version, the median time and the peak memory allocated while hashing
+(tracemalloc), plus a check that both versions give the same digest on
+repeated runs and that version 2 matches the README_MERKLE.md test vector.
+
+Usage:
+    python -m backend.benchmarks.event_hash [--sizes 0 1000 100000] [--repeat 5]
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+
+from backend.utils.hash import hash_event_v1, hash_event_v2
+
+TEST_VECTOR = (
+    {'attack_type': 'SQLi', 'confidence': 0.95, 'user_agent': None,
+     'actions': [{'type': 'keystroke', 'ts': 1000, 'payload': "'"}]},
+    '7fca1937f970bae6dbdd030fb390200c49a54c6134ab576dbe4047a515a7e3c0',
+)
+
+
+def session_event(actions):
+    """An event as /api/submit hashes it, with `actions` recorded actions"""
+    kinds = ('keystroke', 'keystroke', 'keystroke', 'focus', 'click')
+    return {
+        'ip_address': '203.0.113.9',
+        'input_payload': "admin' OR '1'='1' --",
+        'attack_type': 'SQLi',
+        'confidence': 0.97,
+        'deception_strategy': 'fake_database_error',
+        'timestamp': '2026-01-01T00:00:00+00:00',
+        'user_agent': 'Mozilla/5.0 (bench)',
+        'headers': {'accept': '*/*'},
+        'actions': [{
+            'type': kinds[i % len(kinds)],
+            'ts': 1700000000000.0 + i * 37.5,
+            'payload': "admin' OR '1'='1' --"[i % 20],
+            'x': None,
+            'y': None,
+            'target': '#username',
+            'value': None,
+        } for i in range(actions)],
+    }
+
+
+def measure(fn, event, repeat):
+    fn(event)
+    tracemalloc.start()
+    fn(event)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(event)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 100, 1000, 10000, 100000],
+                        help='actions per event')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    event, expected = TEST_VECTOR
+    if hash_event_v2(event) != expected:
+        print("version 2 does not match the README_MERKLE.md test vector")
+        sys.exit(1)
+
+    print(f"{'actions':>8} {'v1 ms':>10} {'v2 ms':>10} {'v2/v1':>6} {'v1 peak KiB':>12} {'v2 peak KiB':>12}")
+    for size in args.sizes:
+        event = session_event(size)
+        if hash_event_v1(event) != hash_event_v1(event) or hash_event_v2(event) != hash_event_v2(event):
+            print(f"unstable digest at {size} actions")
+            sys.exit(1)
+        v1_time, v1_peak = measure(hash_event_v1, event, args.repeat)
+        v2_time, v2_peak = measure(hash_event_v2, event, args.repeat)
+        print(f"{size:>8} {v1_time * 1e3:>10.3f} {v2_time * 1e3:>10.3f} {v2_time / v1_time:>6.2f} "
+              f"{v1_peak / 1024:>12.1f} {v2_peak / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Geo-IP lookup throughput.
+
+Writes a synthetic range CSV the size of a real IPv4 country database
+(contiguous ranges over the whole address space), compiles it, and measures
+lookups per second without the LRU cache (pure binary search over the
+memory-mapped table) and with it, on attacker-like traffic where a few
+thousand addresses repeat.
+
+Usage:
+    python -m backend.benchmarks.geoip [--ranges N] [--lookups N] [--distinct N]
+"""
+import argparse
+import os
+import random
+import socket
+import struct
+import tempfile
+import time
+from backend.geoip import GeoIPResolver
+
+COUNTRIES = [('US', 'United States'), ('CN', 'China'), ('RU', 'Russia'), ('DE', 'Germany'),
+             ('GB', 'United Kingdom'), ('FR', 'France'), ('JP', 'Japan'), ('BR', 'Brazil'),
+             ('IN', 'India'), ('NL', 'Netherlands')]
+
+
+def _ip(number):
+    return socket.inet_ntoa(struct.pack('!I', number))
+
+
+def write_ranges(path, ranges, seed=7):
+    rng = random.Random(seed)
+    bounds = sorted(rng.sample(range(1, 2 ** 32), ranges - 1))
+    with open(path, 'w', encoding='utf-8') as f:
+        start = 0
+        for end in bounds + [2 ** 32]:
+            code, name = rng.choice(COUNTRIES)
+            f.write(f"{_ip(start)},{_ip(end - 1)},{code},{name}\n")
+            start = end
+
+
+def _rate(func, ips):
+    started = time.perf_counter()
+    for ip in ips:
+        func(ip)
+    return len(ips) / (time.perf_counter() - started)
+
+
+def measure(ranges, lookups, distinct):
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory(prefix="chameleon-geoip-") as tmp:
+        path = os.path.join(tmp, "ranges.csv")
+        write_ranges(path, ranges)
+        started = time.perf_counter()
+        resolver = GeoIPResolver(path)
+        compile_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        GeoIPResolver(path + ".bin")
+        open_seconds = time.perf_counter() - started
+
+        random_ips = [_ip(rng.getrandbits(32)) for _ in range(min(lookups, 1000000))]
+        attackers = [_ip(rng.getrandbits(32)) for _ in range(distinct)]
+        repeated = [attackers[min(int(rng.paretovariate(1.2)) - 1, distinct - 1)] for _ in range(lookups)]
+        return {
+            'ranges': len(resolver),
+            'compile_seconds': compile_seconds,
+            'open_ms': open_seconds * 1e3,
+            'table_bytes': os.path.getsize(resolver.path),
+            'uncached_per_second': _rate(resolver.lookup_uncached, random_ips),
+            'cached_per_second': _rate(resolver.lookup, repeated),
+            'cache': resolver.cache_info(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ranges', type=int, default=300000)
+    parser.add_argument('--lookups', type=int, default=2000000)
+    parser.add_argument('--distinct', type=int, default=5000)
+    args = parser.parse_args()
+    result = measure(args.ranges, args.lookups, args.distinct)
+    print(f"{result['ranges']} ranges: compiled in {result['compile_seconds']:.2f}s, "
+          f"table {result['table_bytes'] / 1e6:.1f} MB, reopened (mmap) in {result['open_ms']:.2f} ms")
+    print(f"binary search only  {result['uncached_per_second'] / 1e6:>6.2f} M lookups/s")
+    print(f"with LRU cache      {result['cached_per_second'] / 1e6:>6.2f} M lookups/s  ({result['cache']})")
+
+
+if __name__ == "__main__":
+    main()
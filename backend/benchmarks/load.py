@@ -0,0 +1,208 @@
+"""
+End-to-end load generator replaying the attack corpora against /api/analyze and /api/submit.
+
+Drives the FastAPI app in-process through httpx's ASGI transport (against a
+throwaway database), or a running server with --url. Payloads come from
+SQLiV3.csv, sqliv2.csv, XSS/XSS_dataset.csv (their Label column marks attacks)
+and, when present, the titles and bodies of requests.jsonl as benign text.
+
+Without --rate the generator is closed-loop: --concurrency clients send
+back to back. With --rate requests are scheduled at that many per second
+(--poisson for exponential gaps) and at most --concurrency are in flight;
+latency is measured from the scheduled send time, so a backed-up server is
+not hidden by the generator slowing down (no coordinated omission).
+
+Reports throughput and p50/p95/p99 latency per endpoint and corpus attack
+type (SQLi / XSS / Benign), plus how often the detected type agreed.
+In-process runs disable the tarpit delays unless --tarpit is given.
+
+Usage:
+    python -m backend.benchmarks.load [--requests N | --duration S]
+        [--concurrency C] [--rate R [--poisson]] [--endpoints analyze submit]
+        [--url http://127.0.0.1:5000] [--tarpit] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+from backend.benchmarks.components import read_csv_rows
+
+SEED = 47
+# (path, attack type of rows labelled 1)
+CORPORA = (('SQLiV3.csv', 'SQLi'), ('sqliv2.csv', 'SQLi'), ('XSS/XSS_dataset.csv', 'XSS'))
+
+
+def load_payloads():
+    """[(payload, expected attack type)] from the corpora, shuffled with a fixed seed"""
+    payloads = []
+    for path, attack_type in CORPORA:
+        if not os.path.exists(path):
+            continue
+        rows = read_csv_rows(path)
+        header = rows[0] if rows else []
+        column = header.index('Sentence') if 'Sentence' in header else 0
+        label = header.index('Label') if 'Label' in header else column + 1
+        for row in rows[1:]:
+            if len(row) > label and row[column].strip():
+                payloads.append((row[column], attack_type if row[label].strip() == '1' else 'Benign'))
+    if os.path.exists('requests.jsonl'):
+        with open('requests.jsonl', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    request = json.loads(line)
+                    payloads.extend((text, 'Benign') for text in (request.get('title'), request.get('body')) if text)
+    if not payloads:
+        raise SystemExit("No corpus found: run from the repository root")
+    random.Random(SEED).shuffle(payloads)
+    return payloads
+
+
+def _body(endpoint, payload, i):
+    ip = f"10.{i // 62500 % 250}.{i // 250 % 250}.{i % 250}"
+    if endpoint == 'analyze':
+        return {"input_text": payload, "ip_address": ip}
+    return {"input": payload, "ip_address": ip, "ua": "chameleon-load"}
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+async def run(client, payloads, endpoints, total, duration, concurrency, rate, poisson):
+    """Send the requests; returns per-request records (endpoint, expected, detected, status, seconds)"""
+    records = []
+    limit = asyncio.Semaphore(concurrency)
+    rng = random.Random(SEED)
+    started = time.perf_counter()
+
+    async def one(i, scheduled):
+        payload, expected = payloads[i % len(payloads)]
+        endpoint = endpoints[i % len(endpoints)]
+        async with limit:
+            try:
+                response = await client.post(f"/api/{endpoint}", json=_body(endpoint, payload, i))
+                status = response.status_code
+                detected = response.json().get('forensics', {}).get('detected_type') if status == 200 else None
+            except Exception as e:
+                status, detected = type(e).__name__, None
+        records.append((endpoint, expected, detected, status, time.perf_counter() - scheduled))
+
+    def more(i):
+        if total is not None:
+            return i < total
+        return time.perf_counter() - started < duration
+
+    if rate is None:
+        # Closed loop: each worker sends its next request when the previous one returns
+        counter = iter(range(10 ** 12))
+
+        async def worker():
+            while True:
+                i = next(counter)
+                if not more(i):
+                    return
+                await one(i, time.perf_counter())
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    else:
+        tasks = []
+        next_send = started
+        i = 0
+        while more(i):
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(i, next_send)))
+            next_send += rng.expovariate(rate) if poisson else 1 / rate
+            i += 1
+        await asyncio.gather(*tasks)
+    return records, time.perf_counter() - started
+
+
+def summarize(records, elapsed):
+    groups = defaultdict(list)
+    for endpoint, expected, detected, status, seconds in records:
+        groups[(endpoint, expected)].append((detected, status, seconds))
+        groups[(endpoint, 'all')].append((detected, status, seconds))
+    summary = {'requests': len(records), 'seconds': round(elapsed, 3),
+               'throughput_rps': round(len(records) / elapsed, 1) if elapsed else None, 'groups': {}}
+    for (endpoint, expected), items in sorted(groups.items()):
+        latencies = sorted(seconds for _, status, seconds in items if status == 200)
+        ok = len(latencies)
+        summary['groups'][f"{endpoint}/{expected}"] = {
+            'requests': len(items),
+            'errors': len(items) - ok,
+            'throughput_rps': round(len(items) / elapsed, 1) if elapsed else None,
+            'p50_ms': round(_percentile(latencies, 50) * 1e3, 2) if ok else None,
+            'p95_ms': round(_percentile(latencies, 95) * 1e3, 2) if ok else None,
+            'p99_ms': round(_percentile(latencies, 99) * 1e3, 2) if ok else None,
+            'max_ms': round(latencies[-1] * 1e3, 2) if ok else None,
+            'detected_as_expected': (round(sum(1 for detected, status, _ in items if detected == expected) / ok, 3)
+                                     if ok and expected != 'all' else None),
+        }
+    return summary
+
+
+async def main_async(args):
+    import httpx
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        from backend.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load",
+                                   timeout=args.timeout)
+    async with client:
+        return await run(client, load_payloads(), args.endpoints, args.requests, args.duration,
+                         args.concurrency, args.rate, args.poisson)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, help='stop after this many requests (default 1000)')
+    parser.add_argument('--duration', type=float, help='stop after this many seconds instead')
+    parser.add_argument('--concurrency', type=int, default=10, help='max requests in flight')
+    parser.add_argument('--rate', type=float, help='open-loop arrival rate in requests per second')
+    parser.add_argument('--poisson', action='store_true', help='exponential inter-arrival gaps at --rate')
+    parser.add_argument('--endpoints', nargs='+', choices=('analyze', 'submit'), default=['analyze', 'submit'])
+    parser.add_argument('--url', help='target a running server instead of the in-process app')
+    parser.add_argument('--tarpit', action='store_true', help='keep deception delays (in-process runs)')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output', help='also write the summary as JSON')
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.requests = 1000
+
+    if not args.url:
+        tmp = tempfile.mkdtemp(prefix="chameleon-load-")
+        os.environ["DATABASE_PATH"] = os.path.join(tmp, "load.db")
+        os.environ["DB_MIGRATE_ON_START"] = "0"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        if not args.tarpit:
+            os.environ["DECEPTION_TARPIT"] = "0"
+
+    records, elapsed = asyncio.run(main_async(args))
+    summary = summarize(records, elapsed)
+    summary['config'] = {key: getattr(args, key) for key in
+                         ('concurrency', 'rate', 'poisson', 'endpoints', 'url', 'tarpit')}
+
+    mode = f"rate {args.rate:g}/s" if args.rate else f"closed loop x{args.concurrency}"
+    print(f"{summary['requests']} requests in {summary['seconds']:.1f}s ({mode}): "
+          f"{summary['throughput_rps']:.1f} req/s")
+    print(f"{'endpoint/type':<18} {'reqs':>6} {'errs':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'match':>6}")
+    for name, group in summary['groups'].items():
+        cells = [f"{group[key]:9.2f}" if group[key] is not None else f"{'-':>9}" for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+        match = f"{group['detected_as_expected']:6.0%}" if group['detected_as_expected'] is not None else f"{'':>6}"
+        print(f"{name:<18} {group['requests']:>6} {group['errors']:>5} {group['throughput_rps']:>8.1f} {' '.join(cells)} {match}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cost of hot-path logging: print() against the queued logger, debug on and off.
+
+First times single calls (a synchronous print of a formatted line, a debug
+call below the level, a debug call that is queued), then /api/submit
+throughput with LOG_LEVEL=DEBUG and INFO. Log output goes to os.devnull, so
+the numbers leave out terminal speed; a slow or blocked stdout only makes the
+print() path worse.
+
+Usage:
+    python -m backend.benchmarks.logging_overhead [--calls N] [--requests N]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from backend import logger
+
+
+def time_calls(fn, calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def micro(calls, devnull):
+    log = logger.get_logger('bench')
+    payload = "' OR 1=1 -- " * 4
+    results = {}
+    with redirect_stdout(devnull):
+        results['print'] = time_calls(lambda i: print(f"[DEBUG] Input: {payload} Detected: SQLi, Confidence: {0.9}"), calls)
+    logger.configure(level='INFO', stream=devnull, queue_size=calls + 1)
+    results['debug disabled'] = time_calls(lambda i: log.debug("Detected", input=payload, confidence=0.9), calls)
+    logger.configure(level='DEBUG', stream=devnull, queue_size=calls + 1)
+    results['debug enabled'] = time_calls(lambda i: log.debug("Detected", input=payload, confidence=0.9), calls)
+    results['debug every=100'] = time_calls(lambda i: log.debug("Sampled", every=100, input=payload), calls)
+    logger.shutdown()
+    return results
+
+
+async def submit_throughput(requests, level, devnull):
+    logger.configure(level=level, stream=devnull)
+    import httpx
+    from backend.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for i in range(requests):
+            response = await client.post("/api/submit", json={"input": f"' OR {i}={i} --", "ip_address": f"10.0.0.{i % 250}"})
+            response.raise_for_status()
+        seconds = time.perf_counter() - started
+    dropped = logger.stats()['dropped']
+    logger.shutdown()
+    return requests / seconds, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="chameleon-bench-")
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["DECEPTION_TARPIT"] = "0"
+    os.environ["DB_MIGRATE_ON_START"] = "0"
+
+    with open(os.devnull, 'w') as devnull:
+        for name, micros in micro(args.calls, devnull).items():
+            print(f"{name:<16} {micros:7.2f} us/call")
+        for level in ('INFO', 'DEBUG'):
+            per_second, dropped = asyncio.run(submit_throughput(args.requests, level, devnull))
+            print(f"/api/submit LOG_LEVEL={level:<5} {per_second:7.0f} requests/s ({dropped} records dropped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Incident report latency: first download, cached repeat, and invalidation.
+
+Fills a throwaway database with events spread over many IPs, then downloads
+one IP's report twice (generated, then cached), logs a new event for that IP
+and checks that only its report is regenerated.
+
+Usage:
+    python -m backend.benchmarks.report_cache [--events N] [--ips N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def run(events, ips):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from backend.routes.report import db
+    from backend.benchmarks.storage_backends import _event
+
+    batch = []
+    for i in range(events):
+        event = _event(i)
+        batch.append((f"198.51.{i % ips // 250}.{i % ips % 250}", *event[1:]))
+        if len(batch) == 1000:
+            db.log_attacks(batch)
+            batch = []
+    db.log_attacks(batch)
+
+    client = TestClient(app)
+    target, other = "198.51.0.1", "198.51.0.2"
+    timings = {}
+
+    def download(ip, label):
+        started = time.perf_counter()
+        response = client.get(f"/api/report/{ip}")
+        response.raise_for_status()
+        timings[label] = ((time.perf_counter() - started) * 1e3, response.headers.get('X-Report-Cache'))
+
+    download(target, 'first')
+    download(target, 'repeat')
+    download(other, 'other_first')
+    db.log_attack(target, "' OR 1=1 --", 'SQLi', 0.99, 'Fake Database Error', "f" * 64)
+    download(target, 'after_new_event')
+    download(other, 'other_after_new_event')
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--ips', type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="chameleon-bench-")
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["DB_MIGRATE_ON_START"] = "0"
+
+    for label, (ms, cache) in run(args.events, args.ips).items():
+        print(f"{label:<22} {ms:>9.1f} ms  cache {cache}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Reports per minute: one Node process per report vs the report worker pool.
+
+Renders the same synthetic incident report repeatedly, first the old way
+(write a temp JSON file, run `node scripts/generateReport.js`, read the PDF
+back) and then on a NodeReportPool, with the same number of reports in flight
+for both. Needs the npm packages from backend/package.json.
+
+Usage:
+    python -m backend.benchmarks.report_workers [--reports N] [--concurrency N] [--events N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from backend.benchmarks.storage_backends import _event
+from backend.services.report_pool import NodeReportPool
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'generateReport.js')
+
+
+def _report_data(events):
+    rows = []
+    for i in range(events):
+        ip, payload, attack_type, confidence, strategy, merkle_hash = _event(i)[:6]
+        rows.append({
+            'id': i + 1, 'timestamp': f"2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}",
+            'ip_address': '203.0.113.7', 'input_payload': payload, 'attack_type': attack_type,
+            'confidence': confidence, 'deception_strategy': strategy, 'merkle_hash': merkle_hash,
+        })
+    strategies = {}
+    for row in rows:
+        strategies[row['deception_strategy']] = strategies.get(row['deception_strategy'], 0) + 1
+    return {
+        'ipAddress': '203.0.113.7',
+        'events': rows,
+        'merkleRoot': 'f' * 64,
+        'stats': {
+            'topIPs': [{'ip': '203.0.113.7', 'count': events}],
+            'strategies': [{'strategy': k, 'count': v} for k, v in strategies.items()],
+            'geographic': [],
+        },
+    }
+
+
+async def _per_process(data):
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as data_file:
+        json.dump(data, data_file)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'node', SCRIPT, data_file.name,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(stderr.decode(errors='replace'))
+        pdf_path = data_file.name.replace('.json', '.pdf')
+        with open(pdf_path, 'rb') as f:
+            pdf = f.read()
+        os.unlink(pdf_path)
+        return pdf
+    finally:
+        os.unlink(data_file.name)
+
+
+async def _rate(render, reports, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with limit:
+            pdf = await render()
+            assert pdf.startswith(b'%PDF')
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(reports)))
+    return reports / (time.perf_counter() - started) * 60
+
+
+async def measure(reports, concurrency, events):
+    data = _report_data(events)
+    results = {'per_process': await _rate(lambda: _per_process(data), reports, concurrency)}
+    pool = NodeReportPool(size=concurrency, health_interval=0)
+    try:
+        await pool.render(data)  # start and warm the workers outside the timing
+        results['pool'] = await _rate(lambda: pool.render(data), reports, concurrency)
+    finally:
+        await pool.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reports', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=2)
+    parser.add_argument('--events', type=int, default=200)
+    args = parser.parse_args()
+    results = asyncio.run(measure(args.reports, args.concurrency, args.events))
+    print(f"{args.reports} reports of {args.events} events, {args.concurrency} at a time")
+    print(f"process per report {results['per_process']:>8.1f} reports/min")
+    print(f"worker pool        {results['pool']:>8.1f} reports/min  "
+          f"({results['pool'] / results['per_process']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
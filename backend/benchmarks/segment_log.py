@@ -0,0 +1,80 @@
+"""
+Write and scan cost of the forensic segment log.
+
+Loads the same events into a throwaway SQLite database and a segment log, then
+compares what the Merkle and report code do against each: collecting every
+merkle_hash, collecting one IP's events, and a point lookup by id.
+
+Usage:
+    python -m backend.benchmarks.segment_log [--events N] [--batch-size N]
+"""
+import argparse
+import os
+import tempfile
+import time
+from backend.benchmarks.storage_backends import _event
+from backend.database import Database, now_ms
+from backend.segment_log import SegmentLog
+
+
+def _time(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def measure(events, batch_size, repeat=5):
+    with tempfile.TemporaryDirectory(prefix="chameleon-segments-") as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), write_behind=False, migrate=False)
+        log = SegmentLog(os.path.join(tmp, "segments"))
+        batches = [[_event(i) for i in range(start, min(start + batch_size, events))]
+                   for start in range(0, events, batch_size)]
+
+        started = time.perf_counter()
+        all_ids = [db._append_events(batch, now_ms()) for batch in batches]
+        sqlite_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        for ids, batch in zip(all_ids, batches):
+            log.append(ids, now_ms(), batch)
+        segment_seconds = time.perf_counter() - started
+
+        ip = _event(3)[0]
+        middle = events // 2
+        results = {
+            'events': events,
+            'sqlite_appends_per_second': events / sqlite_seconds,
+            'segment_appends_per_second': events / segment_seconds,
+        }
+        for name, sqlite_func, segment_func in (
+            ('hashes', lambda: [row['merkle_hash'] for row in db.get_logs()],
+             lambda: list(log.iter_field('merkle_hash'))),
+            ('ip', lambda: [row for row in db.get_logs() if row['ip_address'] == ip],
+             lambda: list(log.find(ip))),
+            ('lookup', lambda: db.get_log(middle), lambda: log.get(middle)),
+        ):
+            sqlite_time, sqlite_result = _time(sqlite_func, repeat)
+            segment_time, segment_result = _time(segment_func, repeat)
+            if name != 'lookup':
+                assert len(sqlite_result) == len(segment_result)
+            results[f'{name}_sqlite_ms'] = sqlite_time * 1e3
+            results[f'{name}_segment_ms'] = segment_time * 1e3
+        log.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+    result = measure(args.events, args.batch_size)
+    print(f"{result['events']} events: append sqlite {result['sqlite_appends_per_second']:.0f}/s, "
+          f"segment log {result['segment_appends_per_second']:.0f}/s")
+    for name, label in (('hashes', 'all merkle hashes'), ('ip', 'one IP\'s events'), ('lookup', 'lookup by id')):
+        print(f"{label:<18} sqlite {result[f'{name}_sqlite_ms']:>9.2f} ms   "
+              f"segment log {result[f'{name}_segment_ms']:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
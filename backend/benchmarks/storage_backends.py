@@ -0,0 +1,102 @@
+"""
+Benchmarks for the storage backends.
+
+Every backend in backend.storage.BACKENDS is timed on identical workloads:
+insert rate one event per call and in batches, point lookups by id and
+time-range scans. Their behaviour is checked by tests/test_storage_backends.py.
+
+Usage:
+    python -m backend.benchmarks.storage_backends [--events N] [--batch-size N] [--backend NAME]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from backend.database import now_ms
+
+
+def _event(i, actions=None):
+    attack_type = ('SQLi', 'XSS', 'Benign')[i % 3]
+    return (f"10.0.{i % 5}.{i % 5}", f"payload {i}", attack_type, 0.5 + (i % 50) / 100,
+            f"strategy-{i % 4}", f"{i:064x}", actions)
+
+
+def _open(name, tmp, **kwargs):
+    from backend.storage import create_database
+    if name == 'sqlite':
+        kwargs.update(db_name=os.path.join(tmp, "bench.db"), migrate=False)
+    elif name == 'segment':
+        kwargs.update(path=os.path.join(tmp, "segments"))
+    return create_database(name, write_behind=False, **kwargs)
+
+
+def _percentile(samples, q):
+    return statistics.quantiles(samples, n=100)[q - 1] if len(samples) > 1 else samples[0]
+
+
+def benchmark(db, events, batch_size, lookups=1000, scans=20):
+    """Insert `events` events (half singly, half batched), then time lookups and scans"""
+    singles = events // 2
+    started = time.perf_counter()
+    for i in range(singles):
+        db.log_attack(*_event(i))
+    single_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for start in range(singles, events, batch_size):
+        db.log_attacks([_event(i) for i in range(start, min(start + batch_size, events))])
+    batch_seconds = time.perf_counter() - started
+
+    last_id = db.get_logs(since_ms=now_ms() - 3600000)[0]['id']
+    rng = random.Random(42)
+    lookup_us = []
+    for _ in range(lookups):
+        event_id = rng.randint(1, last_id)
+        started = time.perf_counter()
+        db.get_log(event_id)
+        lookup_us.append((time.perf_counter() - started) * 1e6)
+
+    # Scan the newest ~10% of events by time
+    newest = db.get_log(last_id)['ts_ms']
+    oldest = db.get_log(max(1, last_id - events // 10))['ts_ms']
+    scan_ms = []
+    rows = 0
+    for _ in range(scans):
+        started = time.perf_counter()
+        rows = len(db.get_logs(since_ms=oldest, until_ms=newest + 1))
+        scan_ms.append((time.perf_counter() - started) * 1e3)
+
+    return {
+        'single_inserts_per_second': singles / single_seconds if single_seconds else 0.0,
+        'batch_inserts_per_second': (events - singles) / batch_seconds if batch_seconds else 0.0,
+        'lookup_p50_us': _percentile(lookup_us, 50),
+        'lookup_p99_us': _percentile(lookup_us, 99),
+        'scan_rows': rows,
+        'scan_p50_ms': _percentile(scan_ms, 50),
+    }
+
+
+def main():
+    from backend.storage import BACKENDS
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), action='append')
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'single/s':>10} {'batch/s':>10} {'get p50':>10} {'get p99':>10} {'scan p50':>10}")
+    for name in args.backend or list(BACKENDS):
+        with tempfile.TemporaryDirectory(prefix="chameleon-storage-") as tmp:
+            db = _open(name, tmp)
+            result = benchmark(db, args.events, args.batch_size)
+            db.close()
+        print(f"{name:<8} {result['single_inserts_per_second']:>10.0f} {result['batch_inserts_per_second']:>10.0f} "
+              f"{result['lookup_p50_us']:>8.1f}us {result['lookup_p99_us']:>8.1f}us "
+              f"{result['scan_p50_ms']:>8.2f}ms  ({result['scan_rows']} rows/scan)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+/api/submit session actions: row format (List[Action]) against action_columns.
+
+For sessions of growing length, times each step a submission's actions go
+through in the request: JSON decoding of the body, Pydantic validation of
+SubmitRequest, conversion to the stored form (Action.dict() per action, or an
+ActionColumns over the validated lists), event hashing and the compact blob
+encoding. Both forms must produce the same hash and blob.
+
+Usage:
+    python -m backend.benchmarks.submit_actions [--sizes 100 1000 10000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from backend.utils.action_codec import encode_actions
+from backend.utils.hash import hash_event
+
+PAYLOAD = "admin' OR '1'='1' --"
+
+
+def row_body(count):
+    kinds = ('keystroke', 'keystroke', 'keystroke', 'mousemove', 'click')
+    actions = []
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        action = {'type': kind, 'ts': i * 37}
+        if kind == 'keystroke':
+            action.update(payload=PAYLOAD[i % len(PAYLOAD)], target='#username')
+        else:
+            action.update(x=(i * 7) % 1280, y=(i * 3) % 720, target='#username' if kind == 'click' else None)
+        actions.append(action)
+    return {'input': PAYLOAD, 'ip_address': '203.0.113.9', 'actions': actions}
+
+
+def columnar_body(count):
+    """The same session as row_body, column by column"""
+    body = row_body(count)
+    actions = body.pop('actions')
+    body['action_columns'] = {name: [action.get(name) for action in actions]
+                              for name in ('type', 'ts', 'payload', 'x', 'y', 'target')}
+    return body
+
+
+def steps(raw):
+    """(step name, fn) pairs run in order on a request body, each fed the previous result"""
+    # Imported once main() set DATABASE_PATH: the route module opens the store on import
+    from backend.routes.submit import SubmitRequest, session_actions
+    return [
+        ('json', lambda _: json.loads(raw)),
+        ('validate', lambda data: SubmitRequest(**data)),
+        ('convert', lambda request: session_actions(request.actions, request.action_columns)),
+        ('hash', lambda actions: (actions, hash_event({'input_payload': PAYLOAD, 'actions': actions}))),
+        ('encode', lambda hashed: (hashed[1], encode_actions(hashed[0]))),
+    ]
+
+
+def run(raw, repeat):
+    """Median seconds per step, and the final (hash, blob)"""
+    timings = {}
+    result = None
+    for name, fn in steps(raw):
+        samples = []
+        for _ in range(repeat + 1):
+            started = time.perf_counter()
+            output = fn(result)
+            samples.append(time.perf_counter() - started)
+        timings[name] = statistics.median(samples[1:])
+        result = output
+    return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000], help='actions per session')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="chameleon-bench-")
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["DB_MIGRATE_ON_START"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    names = [name for name, _ in steps(b'')]
+    print(f"{'actions':>8} {'format':<8} {'bytes':>9} " + ' '.join(f"{name + ' ms':>11}" for name in names)
+          + f" {'total ms':>10}")
+    for size in args.sizes:
+        outputs = {}
+        for label, body in (('rows', row_body(size)), ('columns', columnar_body(size))):
+            raw = json.dumps(body, separators=(',', ':')).encode('utf-8')
+            timings, outputs[label] = run(raw, args.repeat)
+            print(f"{size:>8} {label:<8} {len(raw):>9} " + ' '.join(f"{timings[name] * 1e3:>11.3f}" for name in names)
+                  + f" {sum(timings.values()) * 1e3:>10.3f}")
+        if outputs['rows'] != outputs['columns']:
+            print(f"row and columnar sessions of {size} actions hash or encode differently")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Ingest throughput of /api/submit/batch against the single-event /api/submit.
+
+Drives the FastAPI app in-process against a throwaway database with tarpit
+delays disabled, so only classification, hashing and storage are measured.
+
+Usage:
+    python -m backend.benchmarks.submit_batch [--events N] [--batch-size N]
+"""
+import argparse
+import asyncio
+import csv
+import os
+import tempfile
+import time
+
+
+def load_payloads(limit, path='SQLiV3.csv'):
+    """First `limit` non-empty payloads from a corpus CSV (cycled if shorter)"""
+    payloads = []
+    with open(path, encoding='utf-8', errors='ignore', newline='') as f:
+        for row in csv.reader(f):
+            if row and row[0] and row[0] != 'Sentence':
+                payloads.append(row[0])
+            if len(payloads) >= limit:
+                break
+    return [payloads[i % len(payloads)] for i in range(limit)]
+
+
+async def run(events, batch_size):
+    import httpx
+    from backend.main import app
+
+    payloads = load_payloads(events)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for i, text in enumerate(payloads):
+            response = await client.post("/api/submit", json={"input": text, "ip_address": f"10.0.0.{i % 250}"})
+            response.raise_for_status()
+        single_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for start in range(0, len(payloads), batch_size):
+            chunk = payloads[start:start + batch_size]
+            body = {"events": [{"input": text, "ip_address": f"10.0.1.{i % 250}"} for i, text in enumerate(chunk)]}
+            response = await client.post("/api/submit/batch", json=body)
+            response.raise_for_status()
+        batch_seconds = time.perf_counter() - started
+
+    return {
+        'events': events,
+        'batch_size': batch_size,
+        'single_events_per_second': events / single_seconds,
+        'batch_events_per_second': events / batch_seconds,
+        'speedup': single_seconds / batch_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="chameleon-bench-")
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["DECEPTION_TARPIT"] = "0"
+    os.environ["DB_MIGRATE_ON_START"] = "0"
+
+    result = asyncio.run(run(args.events, args.batch_size))
+    print(f"{result['events']} events: single {result['single_events_per_second']:.0f} events/s, "
+          f"batch({result['batch_size']}) {result['batch_events_per_second']:.0f} events/s "
+          f"({result['speedup']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
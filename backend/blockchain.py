@@ -1,15 +1,26 @@
 import hashlib
+import threading
 
 class MerkleTree:
     def __init__(self):
         self.leaves = []
         self.root = None
+        self._lock = threading.Lock()
 
     def add_leaf(self, data):
         # Hash the data (string)
         hashed_data = hashlib.sha256(data.encode('utf-8')).hexdigest()
-        self.leaves.append(hashed_data)
-        self.recalculate_root()
+        with self._lock:
+            self.leaves.append(hashed_data)
+            self.recalculate_root()
+
+    def add_leaves(self, items):
+        # Append a whole batch, then rebuild the root once
+        hashed = [hashlib.sha256(data.encode('utf-8')).hexdigest() for data in items]
+        with self._lock:
+            self.leaves.extend(hashed)
+            self.recalculate_root()
+            return self.root
 
     def recalculate_root(self):
         if not self.leaves:
@@ -35,3 +46,16 @@ class MerkleTree:
 
     def get_root(self):
         return self.root
+
+
+_shared_tree = None
+_shared_lock = threading.Lock()
+
+
+def get_merkle_tree():
+    """The process-wide tree /api/analyze and /api/submit/batch append to"""
+    global _shared_tree
+    with _shared_lock:
+        if _shared_tree is None:
+            _shared_tree = MerkleTree()
+        return _shared_tree
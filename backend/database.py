@@ -1,20 +1,414 @@
 import sqlite3
 import datetime
+import atexit
+import gzip
+import json
 import os
+import threading
+from concurrent.futures import Future
 from datetime import timezone
+from backend.write_behind import WriteBehindWriter
+from backend.migrations import start_background_migrations
+from backend.segment_log import get_event_log
+from backend.utils.action_codec import (encode_actions, decode_actions, decode_action_columns, action_dicts,
+                                       ActionColumns, UnsupportedActions)
+from backend.utils.hash import EVENT_HASH_VERSION
+from backend.logger import get_logger
 
-class Database:
-    def __init__(self, db_name=None):
+log = get_logger('storage')
+
+# Keys of a log dict, in logs table order
+LOG_COLUMNS = ('id', 'timestamp', 'ip_address', 'input_payload', 'attack_type',
+               'confidence', 'deception_strategy', 'merkle_hash', 'ts_ms', 'hash_version')
+
+# Columns the time-series engine can group by
+TIME_SERIES_GROUPS = {
+    'attack_type': 'attack_type',
+    'strategy': 'deception_strategy',
+}
+
+DAY_MS = 86400000
+
+# Supported time-partition sizes for log storage (see backend/archive.py)
+LOG_PARTITIONS = ('day', 'week')
+
+
+def partition_bounds(ts_ms, partition='week'):
+    """(start_ms, end_ms) of the UTC day or ISO week (Monday 00:00 UTC) containing ts_ms"""
+    day = ts_ms // DAY_MS
+    if partition == 'day':
+        return day * DAY_MS, (day + 1) * DAY_MS
+    # Epoch day 0 (1970-01-01) was a Thursday
+    start_day = day - (day + 3) % 7
+    return start_day * DAY_MS, (start_day + 7) * DAY_MS
+
+
+def now_ms():
+    """Current UTC time as epoch milliseconds"""
+    return int(datetime.datetime.now(timezone.utc).timestamp() * 1000)
+
+
+def format_ms(ts_ms):
+    """Epoch milliseconds -> ISO-8601 UTC string (serialization only)"""
+    return datetime.datetime.fromtimestamp(ts_ms / 1000, timezone.utc).isoformat(timespec='milliseconds')
+
+
+def row_to_log(row):
+    """Convert a logs row to the API dict, formatting the epoch-ms time as ISO"""
+    log = dict(row)
+    if log.get('ts_ms') is not None:
+        log['timestamp'] = format_ms(log['ts_ms'])
+    return log
+
+
+def _limit_clause(limit):
+    return f" LIMIT {int(limit)}" if limit is not None else ""
+
+
+def _limit_reached(rows, limit):
+    return limit is not None and len(rows) >= limit
+
+
+def _time_range_clause(since_ms=None, until_ms=None):
+    """WHERE clause (and params) restricting logs.ts_ms to [since_ms, until_ms)"""
+    conditions, params = [], []
+    if since_ms is not None:
+        conditions.append("ts_ms >= ?")
+        params.append(since_ms)
+    if until_ms is not None:
+        conditions.append("ts_ms < ?")
+        params.append(until_ms)
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def event_hash_version(event):
+    """hash_version stored with an event: the hash_event version its merkle_hash was made with, None without one"""
+    return EVENT_HASH_VERSION if event[5] else None
+
+
+def encode_actions_row(actions):
+    """
+    Encode actions for storage.
+
+    Returns:
+        (actions_json, actions_blob) - exactly one of them is set
+    """
+    if os.getenv("ACTIONS_ENCODING", "compact") == "compact":
+        try:
+            return None, encode_actions(actions, compress=os.getenv("ACTIONS_ZLIB", "1") == "1")
+        except UnsupportedActions:
+            pass
+    return json.dumps(actions, default=action_dicts), None
+
+
+def decode_actions_row(actions_json, actions_blob, start=0, stop=None):
+    """Inverse of encode_actions_row, returning actions[start:stop]"""
+    if actions_blob is not None:
+        return decode_actions(actions_blob, start, stop)
+    return json.loads(actions_json)[start:stop]
+
+
+def decode_action_columns_row(actions_json, actions_blob):
+    """Inverse of encode_actions_row, returning an ActionColumns"""
+    if actions_blob is not None:
+        return decode_action_columns(actions_blob)
+    return ActionColumns.from_dicts(json.loads(actions_json))
+
+
+def action_chunk_status(seq, size, session, max_actions=None):
+    """
+    What append_action_chunk does with chunk `seq` of `size` actions.
+
+    Args:
+        session: The session as returned by get_action_session, or None if it is new
+
+    Returns:
+        'stored' if seq is the next chunk; 'duplicate' if it was stored already
+        (a retry); 'closed' once the session was submitted; 'gap' if earlier
+        chunks are missing; 'full' if it would take the session past max_actions
+    """
+    next_seq = session['chunks'] if session else 0
+    if seq < next_seq:
+        return 'duplicate'
+    if session and session['closed']:
+        return 'closed'
+    if seq > next_seq:
+        return 'gap'
+    if max_actions is not None and (session['actions'] if session else 0) + size > max_actions:
+        return 'full'
+    return 'stored'
+
+
+def new_action_session(session_id, ts_ms):
+    return {'session_id': session_id, 'chunks': 0, 'actions': 0, 'closed': False, 'event_id': None,
+            'created_ms': ts_ms, 'updated_ms': ts_ms}
+
+
+class ActionSessionConflict(Exception):
+    """log_session_attack found the session already linked to an event (event_id) or expired (event_id None)"""
+
+    def __init__(self, session_id, event_id=None):
+        self.session_id = session_id
+        self.event_id = event_id
+        super().__init__(f"Session {session_id} already submitted as event {event_id}" if event_id is not None
+                         else f"Session {session_id} expired")
+
+
+class StorageBackend:
+    """
+    Interface shared by every event store (see backend/storage/).
+
+    Subclasses implement _append_events and the read methods. Logging events,
+    queueing them for the write-behind writer and mirroring them to the
+    forensic segment log (EVENT_SEGMENT_DIR, see backend/segment_log.py) are
+    provided here on top of _append_events.
+
+    Events are (ip, payload, attack_type, confidence, strategy, merkle_hash,
+    actions) tuples; logs are returned as dicts keyed by LOG_COLUMNS.
+    """
+    name = None
+
+    def __init__(self, write_behind=None):
+        # Optional group-commit writer (see backend/write_behind.py)
+        if write_behind is None:
+            write_behind = os.getenv("DB_WRITE_BEHIND", "0") == "1"
+        self.write_behind = write_behind
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        # Optional append-only secondary sink
+        self.event_log = get_event_log()
+        # Callbacks run with (ids, events) after every stored batch
+        self._ingest_listeners = []
+
+    def _append_events(self, events, ts_ms, session_id=None):
+        """
+        Store a non-empty batch of events atomically at ts_ms and return their ids, in order.
+
+        With session_id (a single event), the closed live session is linked to
+        the event in the same transaction; ActionSessionConflict is raised, and
+        nothing stored, if it is already linked or no longer exists.
+        """
+        raise NotImplementedError
+
+    def log_attacks(self, events, session_id=None):
+        """Store a batch of events in one transaction and return their ids"""
+        if not events:
+            return []
+        ts_ms = now_ms()
+        log_ids = self._append_events(events, ts_ms, session_id)
+        if self.event_log is not None:
+            try:
+                self.event_log.append(log_ids, ts_ms, events)
+            except Exception as e:
+                # The primary store has the events; the verify CLI reports the gap
+                log.error("Failed to append events to the segment log", first_id=log_ids[0], last_id=log_ids[-1],
+                          error=str(e))
+        for listener in self._ingest_listeners:
+            try:
+                listener(log_ids, events)
+            except Exception as e:
+                log.error("Ingest listener failed", first_id=log_ids[0], last_id=log_ids[-1], error=str(e))
+        return log_ids
+
+    def add_ingest_listener(self, listener):
+        """Call listener(ids, events) after each stored batch; it should hand work off, not block"""
+        self._ingest_listeners.append(listener)
+
+    def complete_event_log(self):
+        """The segment log if it holds every stored event (so readers can stream from it), else None"""
+        if self.event_log is None or self.event_log.count != self.get_confidence_stats()['total']:
+            return None
+        return self.event_log
+
+    def get_logs(self, since_ms=None, until_ms=None, hot_only=False, limit=None):
+        """Logs in [since_ms, until_ms), newest first, at most limit; hot_only skips archived partitions"""
+        raise NotImplementedError
+
+    def get_archive_roots(self):
+        """(merkle_root, row_count) of each archived partition, newest first ([] without archival)"""
+        return []
+
+    def get_log(self, event_id):
+        """A single log by id, or None"""
+        raise NotImplementedError
+
+    def get_logs_by_ids(self, event_ids):
+        """Logs of the given ids in that order, skipping ids that do not exist"""
+        return [log for log in map(self.get_log, event_ids) if log is not None]
+
+    def get_logs_for_ip(self, ip_address, since_ms=None, until_ms=None, limit=None):
+        """Logs of one IP in [since_ms, until_ms) (default all), newest first, at most limit"""
+        raise NotImplementedError
+
+    def get_ip_last_event_id(self, ip_address):
+        """Highest event id logged for an IP, or None if it has no events"""
+        raise NotImplementedError
+
+    def iter_logs_for_ip(self, ip_address, chunk_size=1000):
+        """Logs of one IP oldest first, as lists of up to chunk_size (for reports on huge IPs)"""
+        logs = self.get_logs_for_ip(ip_address)
+        logs.reverse()
+        for start in range(0, len(logs), chunk_size):
+            yield logs[start:start + chunk_size]
+
+    def save_actions(self, event_id, actions):
+        """Store session actions for an event (the latest save wins)"""
+        raise NotImplementedError
+
+    def get_actions(self, event_id, start=0, stop=None):
+        """Session actions[start:stop] of an event, [] if it has none"""
+        raise NotImplementedError
+
+    def append_action_chunk(self, session_id, seq, actions, max_actions=None):
+        """
+        Append chunk `seq` (0, 1, 2, ...) of a live session's actions, atomically.
+
+        Returns:
+            (status, next_seq), status as in action_chunk_status; only 'stored'
+            writes anything
+        """
+        raise NotImplementedError
+
+    def get_action_session(self, session_id):
+        """
+        A live session's state, or None if nothing was ever appended or closed.
+
+        Returns:
+            {'session_id', 'chunks', 'actions', 'closed', 'event_id', 'created_ms', 'updated_ms'}
+        """
+        raise NotImplementedError
+
+    def get_action_chunks(self, session_id):
+        """The session's stored chunks as ActionColumns, in seq order ([] once linked)"""
+        raise NotImplementedError
+
+    def close_action_session(self, session_id):
+        """Refuse further chunks for a session (creating it if needed) and return its state"""
+        raise NotImplementedError
+
+    def log_session_attack(self, session_id, ip, payload, attack_type, confidence, strategy, merkle_hash, actions=None):
+        """
+        Store an event built from a closed live session, link the session to it
+        and drop its chunks, all in one transaction (bypasses write-behind).
+
+        Raises:
+            ActionSessionConflict: the session was linked meanwhile (a retried
+                submit) or has expired; nothing is stored
+        """
+        return self.log_attacks([(ip, payload, attack_type, confidence, strategy, merkle_hash, actions)], session_id)[0]
+
+    def expire_action_sessions(self, before_ms):
+        """Delete sessions (and their chunks) last updated before before_ms; returns how many"""
+        raise NotImplementedError
+
+    def save_explanations(self, items):
+        """Store (event_id, rules_version, explanation dict) tuples, replacing earlier ones"""
+        raise NotImplementedError
+
+    def get_explanations(self, event_ids):
+        """{event_id: (rules_version, explanation dict)} for the ids that have one"""
+        raise NotImplementedError
+
+    def get_top_ips(self, limit=10):
+        """Most active IPs as [{'ip', 'total', 'sqli', 'xss', 'benign'}]; limit=None returns every IP"""
+        raise NotImplementedError
+
+    def get_strategy_counts(self):
+        """[{'strategy', 'count'}], most used first"""
+        raise NotImplementedError
+
+    def get_confidence_stats(self):
+        """{'average', 'min', 'max', 'total'} over all events"""
+        raise NotImplementedError
+
+    def get_bucket_counts(self, start_ms, end_ms, bucket_ms, group_by='attack_type'):
+        """(epoch_ms // bucket_ms, group_key, count) tuples for events in [start_ms, end_ms)"""
+        raise NotImplementedError
+
+    def log_attack(self, ip, payload, attack_type, confidence, strategy, merkle_hash, actions=None):
+        if self.write_behind:
+            return self.queue_attack(ip, payload, attack_type, confidence, strategy, merkle_hash, actions).result()
+        return self.log_attacks([(ip, payload, attack_type, confidence, strategy, merkle_hash, actions)])[0]
+
+    def queue_attack(self, ip, payload, attack_type, confidence, strategy, merkle_hash, actions=None):
+        """
+        Log an attack (and optional session actions) without waiting for the commit.
+
+        With write-behind enabled the event is group-committed by the writer
+        thread; otherwise it is written immediately.
+
+        Returns:
+            concurrent.futures.Future resolving to the new log id
+        """
+        event = (ip, payload, attack_type, confidence, strategy, merkle_hash, actions)
+        if self.write_behind:
+            return self._get_writer().submit(event)
+        future = Future()
+        try:
+            future.set_result(self.log_attacks([event])[0])
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _get_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = WriteBehindWriter(
+                    self.log_attacks,
+                    max_queue=int(os.getenv("DB_WRITE_QUEUE_SIZE", 10000)),
+                    max_batch=int(os.getenv("DB_WRITE_BATCH_SIZE", 500)),
+                    enqueue_timeout=float(os.getenv("DB_WRITE_ENQUEUE_TIMEOUT", 0.5)),
+                )
+                atexit.register(self.close)
+            return self._writer
+
+    def flush(self):
+        """Wait until all queued writes are committed"""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        """Flush queued writes and stop the write-behind thread"""
+        if self._writer is not None:
+            self._writer.close()
+
+    def write_stats(self):
+        """Write-behind statistics (batch sizes, flush latency, drops)"""
+        if self._writer is None:
+            return {'enabled': self.write_behind, 'started': False}
+        return {'enabled': True, 'started': True, **self._writer.stats()}
+
+
+class Database(StorageBackend):
+    """SQLite event store (the default backend)"""
+    name = 'sqlite'
+
+    def __init__(self, db_name=None, write_behind=None, migrate=None):
         # Use environment variable or default path
         if db_name is None:
             # For Render, use absolute path in /tmp or current directory
             db_name = os.getenv("DATABASE_PATH", "logs.db")
+        super().__init__(write_behind)
         self.db_name = db_name
+        # Time partitioning: the logs table holds recent partitions, older ones are
+        # compacted into gzip NDJSON files under archive_dir by backend/archive.py
+        self.partition = os.getenv("LOG_PARTITION", "week")
+        if self.partition not in LOG_PARTITIONS:
+            raise ValueError(f"LOG_PARTITION must be one of: {', '.join(LOG_PARTITIONS)}")
+        self.archive_dir = os.getenv("LOG_ARCHIVE_DIR") or os.path.join(
+            os.path.dirname(os.path.abspath(self.db_name)), "archive")
         self.init_db()
+        # Backfill epoch-ms columns of pre-existing rows in the background
+        if migrate is None:
+            migrate = os.getenv("DB_MIGRATE_ON_START", "1") == "1"
+        if migrate:
+            start_background_migrations(self.db_name)
 
     def init_db(self):
-        conn = sqlite3.connect(self.db_name)
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
         c = conn.cursor()
+        # Serialize schema setup (and the one-off rollup backfill) across workers
+        c.execute("BEGIN IMMEDIATE")
         c.execute('''CREATE TABLE IF NOT EXISTS logs
                      (id INTEGER PRIMARY KEY AUTOINCREMENT,
                       timestamp TEXT,
@@ -31,53 +425,591 @@ class Database:
                       actions_json TEXT,
                       created_at TEXT,
                       FOREIGN KEY (event_id) REFERENCES logs(id) ON DELETE CASCADE)''')
-        conn.commit()
+        # Event times are stored as UTC epoch milliseconds; the legacy ISO TEXT columns
+        # are only read for rows that backend/migrations.py has not backfilled yet
+        columns = [row[1] for row in c.execute("PRAGMA table_info(logs)")]
+        if 'ts_ms' not in columns:
+            c.execute("ALTER TABLE logs ADD COLUMN ts_ms INTEGER")
+        if 'hash_version' not in columns:
+            # hash_event version of merkle_hash; NULL for rows stored before it was recorded (version 1)
+            c.execute("ALTER TABLE logs ADD COLUMN hash_version INTEGER")
+        columns = [row[1] for row in c.execute("PRAGMA table_info(session_actions)")]
+        if 'created_ms' not in columns:
+            c.execute("ALTER TABLE session_actions ADD COLUMN created_ms INTEGER")
+        if 'actions_blob' not in columns:
+            # Compact columnar encoding (backend/utils/action_codec.py); actions_json is the fallback
+            c.execute("ALTER TABLE session_actions ADD COLUMN actions_blob BLOB")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_session_actions_event ON session_actions(event_id, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_session_actions_created ON session_actions(created_ms)")
+        # Covering indexes for the time-series engine (see backend/timeseries.py)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts_attack_type ON logs(ts_ms, attack_type)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts_strategy ON logs(ts_ms, deception_strategy)")
+        # Per-IP reads (incident reports)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_logs_ip_id ON logs(ip_address, id)")
+        # Manifest of archived (cold) partitions, used to prune them by time range
+        c.execute('''CREATE TABLE IF NOT EXISTS log_archives
+                     (path TEXT PRIMARY KEY,
+                      partition_start_ms INTEGER NOT NULL,
+                      partition_end_ms INTEGER NOT NULL,
+                      min_ts_ms INTEGER,
+                      max_ts_ms INTEGER,
+                      min_id INTEGER,
+                      max_id INTEGER,
+                      row_count INTEGER NOT NULL,
+                      archived_ms INTEGER)''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_log_archives_range ON log_archives(min_ts_ms, max_ts_ms)")
+        if 'merkle_root' not in [row[1] for row in c.execute("PRAGMA table_info(log_archives)")]:
+            # Root over the archived rows' leaves, newest first as /api/merkle orders them
+            c.execute("ALTER TABLE log_archives ADD COLUMN merkle_root TEXT")
+        # Actions of live sessions, uploaded in chunks until the event is submitted
+        c.execute('''CREATE TABLE IF NOT EXISTS action_sessions
+                     (session_id TEXT PRIMARY KEY,
+                      chunks INTEGER NOT NULL DEFAULT 0,
+                      actions INTEGER NOT NULL DEFAULT 0,
+                      closed INTEGER NOT NULL DEFAULT 0,
+                      event_id INTEGER,
+                      created_ms INTEGER,
+                      updated_ms INTEGER)''')
+        c.execute('''CREATE TABLE IF NOT EXISTS action_chunks
+                     (session_id TEXT NOT NULL,
+                      seq INTEGER NOT NULL,
+                      actions_json TEXT,
+                      actions_blob BLOB,
+                      PRIMARY KEY (session_id, seq)) WITHOUT ROWID''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_action_sessions_updated ON action_sessions(updated_ms)")
+        # Rule-based explanations, precomputed after ingest (backend/services/explanations.py)
+        c.execute('''CREATE TABLE IF NOT EXISTS explanations
+                     (event_id INTEGER PRIMARY KEY,
+                      rules_version INTEGER NOT NULL,
+                      explanation_json TEXT NOT NULL,
+                      created_ms INTEGER)''')
+        self._init_rollups(c)
+        c.execute("COMMIT")
         conn.close()
 
-    def log_attack(self, ip, payload, attack_type, confidence, strategy, merkle_hash):
+    def _init_rollups(self, c):
+        """
+        Create the rollup tables behind /api/stats and keep them current with an
+        insert trigger, so the stats endpoints never have to scan logs.
+        """
+        c.execute('''CREATE TABLE IF NOT EXISTS stats_ip
+                     (ip_address TEXT PRIMARY KEY,
+                      total INTEGER NOT NULL DEFAULT 0,
+                      sqli INTEGER NOT NULL DEFAULT 0,
+                      xss INTEGER NOT NULL DEFAULT 0,
+                      benign INTEGER NOT NULL DEFAULT 0,
+                      last_id INTEGER)''')
+        if 'last_id' not in [row[1] for row in c.execute("PRAGMA table_info(stats_ip)")]:
+            # Highest event id per IP, the version key of cached reports
+            c.execute("ALTER TABLE stats_ip ADD COLUMN last_id INTEGER")
+            c.execute("UPDATE stats_ip SET last_id = (SELECT MAX(id) FROM logs WHERE ip_address = stats_ip.ip_address)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_stats_ip_total ON stats_ip(total DESC)")
+        c.execute('''CREATE TABLE IF NOT EXISTS stats_strategy
+                     (deception_strategy TEXT PRIMARY KEY,
+                      count INTEGER NOT NULL DEFAULT 0)''')
+        # Hour buckets are UTC epoch hours (epoch seconds // 3600)
+        c.execute('''CREATE TABLE IF NOT EXISTS stats_hourly
+                     (hour INTEGER NOT NULL,
+                      attack_type TEXT NOT NULL,
+                      deception_strategy TEXT NOT NULL,
+                      count INTEGER NOT NULL DEFAULT 0,
+                      PRIMARY KEY (hour, attack_type, deception_strategy))''')
+        c.execute('''CREATE TABLE IF NOT EXISTS stats_confidence
+                     (id INTEGER PRIMARY KEY CHECK (id = 1),
+                      total INTEGER NOT NULL,
+                      count INTEGER NOT NULL,
+                      sum REAL NOT NULL,
+                      min REAL,
+                      max REAL)''')
+        c.execute("DROP TRIGGER IF EXISTS logs_rollup_insert")
+        c.execute('''CREATE TRIGGER logs_rollup_insert AFTER INSERT ON logs
+                     BEGIN
+                         INSERT INTO stats_ip (ip_address, total, sqli, xss, benign, last_id)
+                         VALUES (COALESCE(NEW.ip_address, 'unknown'), 1,
+                                 COALESCE(NEW.attack_type, '') = 'SQLi',
+                                 COALESCE(NEW.attack_type, '') = 'XSS',
+                                 COALESCE(NEW.attack_type, '') NOT IN ('SQLi', 'XSS'),
+                                 NEW.id)
+                         ON CONFLICT(ip_address) DO UPDATE SET
+                             total = total + 1,
+                             last_id = excluded.last_id,
+                             sqli = sqli + excluded.sqli,
+                             xss = xss + excluded.xss,
+                             benign = benign + excluded.benign;
+                         INSERT INTO stats_strategy (deception_strategy, count)
+                         VALUES (COALESCE(NEW.deception_strategy, 'Unknown'), 1)
+                         ON CONFLICT(deception_strategy) DO UPDATE SET count = count + 1;
+                         INSERT INTO stats_hourly (hour, attack_type, deception_strategy, count)
+                         SELECT COALESCE(NEW.ts_ms / 3600000, CAST(strftime('%s', NEW.timestamp) AS INTEGER) / 3600),
+                                COALESCE(NEW.attack_type, 'Benign'),
+                                COALESCE(NEW.deception_strategy, 'Unknown'), 1
+                         WHERE NEW.ts_ms IS NOT NULL OR strftime('%s', NEW.timestamp) IS NOT NULL
+                         ON CONFLICT(hour, attack_type, deception_strategy) DO UPDATE SET count = count + 1;
+                         UPDATE stats_confidence SET
+                             total = total + 1,
+                             count = count + (NEW.confidence IS NOT NULL),
+                             sum = sum + COALESCE(NEW.confidence, 0),
+                             min = CASE WHEN NEW.confidence IS NOT NULL AND (min IS NULL OR NEW.confidence < min)
+                                        THEN NEW.confidence ELSE min END,
+                             max = CASE WHEN NEW.confidence IS NOT NULL AND (max IS NULL OR NEW.confidence > max)
+                                        THEN NEW.confidence ELSE max END
+                         WHERE id = 1;
+                     END''')
+        # First run against an existing database: build the rollups from history once
+        if c.execute("SELECT COUNT(*) FROM stats_confidence").fetchone()[0] == 0:
+            c.execute('''INSERT INTO stats_ip (ip_address, total, sqli, xss, benign, last_id)
+                         SELECT COALESCE(ip_address, 'unknown'), COUNT(*),
+                                SUM(COALESCE(attack_type, '') = 'SQLi'),
+                                SUM(COALESCE(attack_type, '') = 'XSS'),
+                                SUM(COALESCE(attack_type, '') NOT IN ('SQLi', 'XSS')),
+                                MAX(id)
+                         FROM logs GROUP BY 1''')
+            c.execute('''INSERT INTO stats_strategy (deception_strategy, count)
+                         SELECT COALESCE(deception_strategy, 'Unknown'), COUNT(*) FROM logs GROUP BY 1''')
+            c.execute('''INSERT INTO stats_hourly (hour, attack_type, deception_strategy, count)
+                         SELECT COALESCE(ts_ms / 3600000, CAST(strftime('%s', timestamp) AS INTEGER) / 3600),
+                                COALESCE(attack_type, 'Benign'), COALESCE(deception_strategy, 'Unknown'), COUNT(*)
+                         FROM logs WHERE ts_ms IS NOT NULL OR strftime('%s', timestamp) IS NOT NULL
+                         GROUP BY 1, 2, 3''')
+            c.execute('''INSERT INTO stats_confidence (id, total, count, sum, min, max)
+                         SELECT 1, COUNT(*), COUNT(confidence), COALESCE(SUM(confidence), 0),
+                                MIN(confidence), MAX(confidence)
+                         FROM logs''')
+
+    def _insert_events(self, conn, events, ts_ms):
+        """
+        Insert events (and their session actions) on an open connection.
+
+        Args:
+            conn: Connection with no pending transaction; the caller commits
+            events: List of (ip, payload, attack_type, confidence, strategy, merkle_hash, actions)
+            ts_ms: Event time, UTC epoch milliseconds
+
+        Returns:
+            List of new log ids, in the same order as events
+        """
+        c = conn.cursor()
+        c.executemany("INSERT INTO logs (ts_ms, ip_address, input_payload, attack_type, confidence, deception_strategy, merkle_hash, hash_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                      [(ts_ms, *event[:6], event_hash_version(event)) for event in events])
+        # The whole batch runs in one write transaction, so AUTOINCREMENT hands out consecutive ids
+        last_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+        log_ids = list(range(last_id - len(events) + 1, last_id + 1))
+        action_rows = [(log_id, *encode_actions_row(event[6]), ts_ms)
+                       for log_id, event in zip(log_ids, events) if event[6]]
+        if action_rows:
+            c.executemany("INSERT INTO session_actions (event_id, actions_json, actions_blob, created_ms) VALUES (?, ?, ?, ?)",
+                          action_rows)
+        return log_ids
+
+    def _append_events(self, events, ts_ms, session_id=None):
         conn = sqlite3.connect(self.db_name)
+        try:
+            log_ids = self._insert_events(conn, events, ts_ms)
+            if session_id is not None:
+                # The insert holds the write lock, so no other submit can link the session in between
+                linked = conn.execute("UPDATE action_sessions SET event_id = ?, updated_ms = ? "
+                                      "WHERE session_id = ? AND event_id IS NULL",
+                                      (log_ids[0], ts_ms, session_id)).rowcount
+                if not linked:
+                    row = conn.execute("SELECT event_id FROM action_sessions WHERE session_id = ?",
+                                       (session_id,)).fetchone()
+                    conn.rollback()
+                    raise ActionSessionConflict(session_id, row[0] if row else None)
+                conn.execute("DELETE FROM action_chunks WHERE session_id = ?", (session_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        return log_ids
+
+    def get_logs(self, since_ms=None, until_ms=None, hot_only=False, limit=None):
+        """
+        Get logs, newest first.
+
+        Args:
+            since_ms: Only events at or after this UTC epoch-ms time
+            until_ms: Only events before this UTC epoch-ms time
+            hot_only: Read only the logs table, never the archived partitions
+            limit: Return at most this many (the newest)
+
+        Archived partitions outside the range are never opened, nor are any
+        once limit rows were found in the hot table.
+        """
+        conn = sqlite3.connect(self.db_name)
+        conn.row_factory = sqlite3.Row
         c = conn.cursor()
-        # Use UTC timezone for consistent timestamps across timezones
-        timestamp = datetime.datetime.now(timezone.utc).isoformat()
-        c.execute("INSERT INTO logs (timestamp, ip_address, input_payload, attack_type, confidence, deception_strategy, merkle_hash) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                  (timestamp, ip, payload, attack_type, confidence, strategy, merkle_hash))
-        log_id = c.lastrowid
-        conn.commit()
+        where, params = _time_range_clause(since_ms, until_ms)
+        c.execute(f"SELECT * FROM logs {where} ORDER BY id DESC{_limit_clause(limit)}", params)
+        rows = c.fetchall()
+        archives = [] if hot_only or _limit_reached(rows, limit) else self._archives_for_range(c, since_ms, until_ms)
+        conn.close()
+        logs = [row_to_log(row) for row in rows]
+        return self._add_archived(logs, archives, limit, since_ms, until_ms)
+
+    def _add_archived(self, logs, archives, limit, since_ms=None, until_ms=None, ip_address=None):
+        """Extend hot logs with archived ones (archives newest first) until limit, newest first"""
+        if not archives:
+            return logs
+        for path in archives:
+            if _limit_reached(logs, limit):
+                break
+            # Archived partitions are older than every hot row and than each later archive
+            archived = [row_to_log(row) for row in self._read_archive(path, since_ms, until_ms)
+                        if ip_address is None or row.get('ip_address') == ip_address]
+            archived.sort(key=lambda log: log['id'], reverse=True)
+            logs.extend(archived)
+        logs.sort(key=lambda log: log['id'], reverse=True)
+        return logs if limit is None else logs[:limit]
+
+    def get_archive_roots(self):
+        conn = sqlite3.connect(self.db_name)
+        rows = conn.execute("SELECT merkle_root, row_count FROM log_archives ORDER BY max_id DESC").fetchall()
         conn.close()
-        return log_id
+        return rows
 
-    def get_logs(self):
+    def get_log(self, event_id):
+        """Get a single event by id, or None (falls back to the archived partition holding it)"""
         conn = sqlite3.connect(self.db_name)
         conn.row_factory = sqlite3.Row
         c = conn.cursor()
-        c.execute("SELECT * FROM logs ORDER BY id DESC")
+        c.execute("SELECT * FROM logs WHERE id = ?", (event_id,))
+        row = c.fetchone()
+        archives = []
+        if row is None:
+            c.execute("SELECT path FROM log_archives WHERE min_id <= ? AND max_id >= ?", (event_id, event_id))
+            archives = [r[0] for r in c.fetchall()]
+        conn.close()
+        if row is not None:
+            return row_to_log(row)
+        for path in archives:
+            for archived in self._read_archive(path):
+                if archived['id'] == event_id:
+                    return row_to_log(archived)
+        return None
+
+    def get_logs_by_ids(self, event_ids):
+        """
+        Several events by id: one primary-key IN query per 500 ids, then one
+        pass over the archived partitions that could hold the ids not found.
+        """
+        event_ids = list(event_ids)
+        found = {}
+        conn = sqlite3.connect(self.db_name)
+        conn.row_factory = sqlite3.Row
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(event_ids), 500):
+            chunk = event_ids[start:start + 500]
+            for row in conn.execute(f"SELECT * FROM logs WHERE id IN ({','.join('?' * len(chunk))})", chunk):
+                found[row['id']] = row_to_log(row)
+        missing = {event_id for event_id in event_ids if event_id not in found}
+        archives = []
+        if missing:
+            archives = [r[0] for r in conn.execute("SELECT path FROM log_archives WHERE min_id <= ? AND max_id >= ? "
+                                                   "ORDER BY min_id", (max(missing), min(missing)))]
+        conn.close()
+        for path in archives:
+            for archived in self._read_archive(path):
+                if archived['id'] in missing:
+                    found[archived['id']] = row_to_log(archived)
+        return [found[event_id] for event_id in event_ids if event_id in found]
+
+    def get_logs_for_ip(self, ip_address, since_ms=None, until_ms=None, limit=None):
+        """
+        Logs of one IP, newest first, read through idx_logs_ip_id.
+
+        The time range and limit are applied in the query. Archives are only
+        opened when fewer than limit rows were found and the IP's rollup total
+        shows that some of its events have been archived.
+        """
+        conn = sqlite3.connect(self.db_name)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        where, params = _time_range_clause(since_ms, until_ms)
+        where = f"{where} AND ip_address = ?" if where else "WHERE ip_address = ?"
+        c.execute(f"SELECT * FROM logs {where} ORDER BY id DESC{_limit_clause(limit)}", (*params, ip_address))
         rows = c.fetchall()
+        archives = []
+        if not _limit_reached(rows, limit):
+            c.execute("SELECT total FROM stats_ip WHERE ip_address = ?", (ip_address,))
+            total = c.fetchone()
+            hot = c.execute("SELECT COUNT(*) FROM logs WHERE ip_address = ?", (ip_address,)).fetchone()[0]
+            if total and total[0] > hot:
+                archives = self._archives_for_range(c, since_ms, until_ms)
         conn.close()
-        return [dict(row) for row in rows]
-    
+        logs = [row_to_log(row) for row in rows]
+        return self._add_archived(logs, archives, limit, since_ms, until_ms, ip_address)
+
+    def get_ip_last_event_id(self, ip_address):
+        """Highest event id of an IP, from the stats_ip rollup"""
+        conn = sqlite3.connect(self.db_name)
+        row = conn.execute("SELECT last_id FROM stats_ip WHERE ip_address = ?", (ip_address,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def iter_logs_for_ip(self, ip_address, chunk_size=1000):
+        """
+        Logs of one IP oldest first, chunk by chunk.
+
+        Archived events (only opened when the rollup shows some exist) come
+        first, then hot rows are paged through idx_logs_ip_id by id, so only
+        one chunk is held in memory at a time.
+        """
+        conn = sqlite3.connect(self.db_name)
+        conn.row_factory = sqlite3.Row
+        try:
+            c = conn.cursor()
+            c.execute("SELECT total FROM stats_ip WHERE ip_address = ?", (ip_address,))
+            total = c.fetchone()
+            c.execute("SELECT COUNT(*) FROM logs WHERE ip_address = ?", (ip_address,))
+            hot = c.fetchone()[0]
+            last_id = 0
+            if total and total[0] > hot:
+                c.execute("SELECT path FROM log_archives ORDER BY min_id")
+                chunk = []
+                for (path,) in c.fetchall():
+                    for row in self._read_archive(path):
+                        if row.get('ip_address') != ip_address:
+                            continue
+                        chunk.append(row_to_log(row))
+                        last_id = max(last_id, row['id'])
+                        if len(chunk) == chunk_size:
+                            yield chunk
+                            chunk = []
+                if chunk:
+                    yield chunk
+            while True:
+                c.execute("SELECT * FROM logs WHERE ip_address = ? AND id > ? ORDER BY id LIMIT ?",
+                          (ip_address, last_id, chunk_size))
+                rows = c.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                yield [row_to_log(row) for row in rows]
+        finally:
+            conn.close()
+
+    def _archives_for_range(self, c, since_ms=None, until_ms=None):
+        """Archive files whose events overlap [since_ms, until_ms) - the partition router"""
+        c.execute("SELECT path FROM log_archives WHERE max_ts_ms >= ? AND min_ts_ms < ? ORDER BY max_id DESC",
+                  (since_ms if since_ms is not None else -2 ** 63, until_ms if until_ms is not None else 2 ** 63 - 1))
+        return [row[0] for row in c.fetchall()]
+
+    def _read_archive(self, path, since_ms=None, until_ms=None):
+        """Stream rows from one archived partition, optionally filtered by time range"""
+        with gzip.open(os.path.join(self.archive_dir, path), 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                ts_ms = row.get('ts_ms')
+                if since_ms is not None and ts_ms < since_ms:
+                    continue
+                if until_ms is not None and ts_ms >= until_ms:
+                    continue
+                yield row
+
     def save_actions(self, event_id, actions):
         """Save session actions for an event"""
-        import json
-        from datetime import timezone
         conn = sqlite3.connect(self.db_name)
         c = conn.cursor()
-        timestamp = datetime.datetime.now(timezone.utc).isoformat()
-        actions_json = json.dumps(actions)
-        c.execute("INSERT INTO session_actions (event_id, actions_json, created_at) VALUES (?, ?, ?)",
-                  (event_id, actions_json, timestamp))
+        c.execute("INSERT INTO session_actions (event_id, actions_json, actions_blob, created_ms) VALUES (?, ?, ?, ?)",
+                  (event_id, *encode_actions_row(actions), now_ms()))
         conn.commit()
         conn.close()
-    
-    def get_actions(self, event_id):
-        """Get session actions for an event"""
-        import json
+
+    def append_action_chunk(self, session_id, seq, actions, max_actions=None):
+        """Append a session chunk; the check and the insert share one write transaction across workers"""
+        row = encode_actions_row(actions)
+        ts_ms = now_ms()
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            session = self._action_session(conn, session_id)
+            status = action_chunk_status(seq, len(actions), session, max_actions)
+            next_seq = session['chunks'] if session else 0
+            if status == 'stored':
+                conn.execute("INSERT INTO action_chunks (session_id, seq, actions_json, actions_blob) VALUES (?, ?, ?, ?)",
+                             (session_id, seq, *row))
+                conn.execute("INSERT INTO action_sessions (session_id, chunks, actions, created_ms, updated_ms) "
+                             "VALUES (?, 1, ?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET "
+                             "chunks = chunks + 1, actions = actions + excluded.actions, updated_ms = excluded.updated_ms",
+                             (session_id, len(actions), ts_ms, ts_ms))
+                next_seq += 1
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return status, next_seq
+
+    @staticmethod
+    def _action_session(conn, session_id):
+        row = conn.execute("SELECT session_id, chunks, actions, closed, event_id, created_ms, updated_ms "
+                           "FROM action_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        session = dict(zip(('session_id', 'chunks', 'actions', 'closed', 'event_id', 'created_ms', 'updated_ms'), row))
+        session['closed'] = bool(session['closed'])
+        return session
+
+    def get_action_session(self, session_id):
+        conn = sqlite3.connect(self.db_name)
+        session = self._action_session(conn, session_id)
+        conn.close()
+        return session
+
+    def get_action_chunks(self, session_id):
+        conn = sqlite3.connect(self.db_name)
+        rows = conn.execute("SELECT actions_json, actions_blob FROM action_chunks WHERE session_id = ? ORDER BY seq",
+                            (session_id,)).fetchall()
+        conn.close()
+        return [decode_action_columns_row(*row) for row in rows]
+
+    def close_action_session(self, session_id):
+        ts_ms = now_ms()
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO action_sessions (session_id, closed, created_ms, updated_ms) VALUES (?, 1, ?, ?) "
+                         "ON CONFLICT(session_id) DO UPDATE SET closed = 1, updated_ms = excluded.updated_ms",
+                         (session_id, ts_ms, ts_ms))
+            session = self._action_session(conn, session_id)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return session
+
+    def expire_action_sessions(self, before_ms):
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM action_chunks WHERE session_id IN "
+                         "(SELECT session_id FROM action_sessions WHERE updated_ms < ?)", (before_ms,))
+            expired = conn.execute("DELETE FROM action_sessions WHERE updated_ms < ?", (before_ms,)).rowcount
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return expired
+
+    def save_explanations(self, items):
+        """Store explanations for events (one transaction; the newest per event wins)"""
+        if not items:
+            return
+        created_ms = now_ms()
+        conn = sqlite3.connect(self.db_name)
+        conn.executemany("INSERT OR REPLACE INTO explanations (event_id, rules_version, explanation_json, created_ms) "
+                         "VALUES (?, ?, ?, ?)",
+                         [(event_id, version, json.dumps(explanation), created_ms)
+                          for event_id, version, explanation in items])
+        conn.commit()
+        conn.close()
+
+    def get_explanations(self, event_ids):
+        """Stored explanations by event id, read through the primary key"""
+        event_ids = list(event_ids)
+        found = {}
+        conn = sqlite3.connect(self.db_name)
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(event_ids), 500):
+            chunk = event_ids[start:start + 500]
+            rows = conn.execute(f"SELECT event_id, rules_version, explanation_json FROM explanations "
+                                f"WHERE event_id IN ({','.join('?' * len(chunk))})", chunk)
+            for event_id, version, explanation_json in rows:
+                found[event_id] = (version, json.loads(explanation_json))
+        conn.close()
+        return found
+
+    def get_actions(self, event_id, start=0, stop=None):
+        """
+        Get session actions for an event.
+
+        Args:
+            event_id: Event id
+            start: Index of the first action to return
+            stop: Index after the last action to return (None = until the end)
+        """
         conn = sqlite3.connect(self.db_name)
         conn.row_factory = sqlite3.Row
         c = conn.cursor()
-        c.execute("SELECT actions_json FROM session_actions WHERE event_id = ? ORDER BY id DESC LIMIT 1",
+        c.execute("SELECT actions_json, actions_blob FROM session_actions WHERE event_id = ? ORDER BY id DESC LIMIT 1",
                   (event_id,))
         row = c.fetchone()
         conn.close()
-        if row:
-            return json.loads(row['actions_json'])
-        return []
+        if not row:
+            return []
+        return decode_actions_row(row['actions_json'], row['actions_blob'], start, stop)
+
+    def get_top_ips(self, limit=10):
+        """Top attacking IPs by total events, read from the stats_ip rollup"""
+        conn = sqlite3.connect(self.db_name)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute("SELECT ip_address AS ip, total, sqli, xss, benign FROM stats_ip ORDER BY total DESC LIMIT ?",
+                  (limit if limit is not None else -1,))
+        rows = c.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def get_strategy_counts(self):
+        """Event counts per deception strategy, most used first"""
+        conn = sqlite3.connect(self.db_name)
+        c = conn.cursor()
+        c.execute("SELECT deception_strategy, count FROM stats_strategy ORDER BY count DESC")
+        rows = c.fetchall()
+        conn.close()
+        return [{'strategy': strategy, 'count': count} for strategy, count in rows]
+
+    def get_confidence_stats(self):
+        """Average/min/max confidence over all events"""
+        conn = sqlite3.connect(self.db_name)
+        c = conn.cursor()
+        c.execute("SELECT total, count, sum, min, max FROM stats_confidence WHERE id = 1")
+        row = c.fetchone()
+        conn.close()
+        total, count, total_confidence, min_confidence, max_confidence = row or (0, 0, 0, None, None)
+        if not count:
+            return {'average': 0, 'min': 0, 'max': 0, 'total': total}
+        return {
+            'average': total_confidence / count,
+            'min': min_confidence,
+            'max': max_confidence,
+            'total': total
+        }
+
+    def get_bucket_counts(self, start_ms, end_ms, bucket_ms, group_by='attack_type'):
+        """
+        Count events per time bucket and group inside SQLite.
+
+        Hour-aligned queries are answered from the stats_hourly rollup; anything
+        finer scans the (ts_ms, column) covering index for the requested range.
+
+        Args:
+            start_ms: Range start, UTC epoch milliseconds (inclusive)
+            end_ms: Range end, UTC epoch milliseconds (exclusive)
+            bucket_ms: Bucket width in milliseconds; buckets are aligned to multiples of it
+            group_by: 'attack_type' or 'strategy'
+
+        Returns:
+            List of (bucket_index, group_key, count) tuples, where bucket_index is
+            epoch_ms // bucket_ms
+        """
+        column = TIME_SERIES_GROUPS[group_by]
+        conn = sqlite3.connect(self.db_name)
+        c = conn.cursor()
+        if bucket_ms % 3600000 == 0 and start_ms % 3600000 == 0 and end_ms % 3600000 == 0:
+            c.execute(f"SELECT hour / ?, {column}, SUM(count) FROM stats_hourly WHERE hour >= ? AND hour < ? GROUP BY 1, 2",
+                      (bucket_ms // 3600000, start_ms // 3600000, end_ms // 3600000))
+            rows = c.fetchall()
+            conn.close()
+            return rows
+
+        default = 'Benign' if group_by == 'attack_type' else 'Unknown'
+        c.execute(f"SELECT ts_ms / ?, COALESCE({column}, ?), COUNT(*) FROM logs WHERE ts_ms >= ? AND ts_ms < ? GROUP BY 1, 2",
+                  (bucket_ms, default, start_ms, end_ms))
+        rows = c.fetchall()
+        archives = self._archives_for_range(c, start_ms, end_ms)
+        conn.close()
+        if archives:
+            # Windows reaching past the hot partitions: fold in the archived ones they overlap
+            counts = {(index, key): count for index, key, count in rows}
+            for path in archives:
+                for row in self._read_archive(path, start_ms, end_ms):
+                    key = (row['ts_ms'] // bucket_ms, row.get(column) or default)
+                    counts[key] = counts.get(key, 0) + 1
+            rows = [(index, key, count) for (index, key), count in counts.items()]
+        return rows
@@ -1,8 +1,14 @@
 import time
 import random
+import os
 
 class DeceptionEngine:
-    def __init__(self):
+    def __init__(self, tarpit=None):
+        # Tarpit delays waste an interactive attacker's time; batch ingestion
+        # (and load tests) disable them with tarpit=False / DECEPTION_TARPIT=0
+        if tarpit is None:
+            tarpit = os.getenv("DECEPTION_TARPIT", "1") == "1"
+        self.tarpit = tarpit
         self.strategies = {
             'SQLi': [
                 self.slow_loading_with_fake_dashboard  # Always use slow loading + fake dashboard for SQLi
@@ -29,8 +35,12 @@ class DeceptionEngine:
             "deception": "Fake Database Error"
         }
 
+    def _delay(self, seconds):
+        if self.tarpit:
+            time.sleep(seconds)
+
     def network_lag(self):
-        time.sleep(2) # Artificial delay
+        self._delay(2) # Artificial delay
         return {
             "status": 408,
             "error": "Request Timeout",
@@ -67,7 +77,7 @@ class DeceptionEngine:
         }
 
     def slow_loading(self):
-        time.sleep(5)  # 5 second delay to waste attacker's time
+        self._delay(5)  # 5 second delay to waste attacker's time
         return {
             "status": 200,
             "message": "Login Successful",
@@ -89,7 +99,7 @@ class DeceptionEngine:
         then redirect to fake dashboard. This wastes attacker's time and fools them
         into thinking they've successfully breached the system.
         """
-        time.sleep(3)  # 3 second delay to simulate slow authentication
+        self._delay(3)  # 3 second delay to simulate slow authentication
         return {
             "status": 200,
             "message": "Authentication Successful",
@@ -0,0 +1,220 @@
+"""
+Offline geo-IP resolution (IPv4 address -> country).
+
+GEOIP_DB points at an IP-range CSV with one range per line:
+`start,end,country_code[,country_name]`, where start/end are dotted IPv4
+addresses (DB-IP "IP to Country Lite") or integers (IP2Location LITE DB1).
+Header lines, IPv6 ranges and malformed lines are skipped.
+
+The CSV is compiled once into a binary table beside it (`<csv>.bin`, rebuilt
+whenever the CSV is newer): sorted uint32 range starts, uint32 range ends and
+a uint16 country index per range, a /16 prefix index, and the country table.
+Every worker memory-maps that file, so the ranges live once in the OS page
+cache instead of being parsed into each process. A lookup reads the prefix
+index to narrow the binary search over the starts array to the ranges of
+that /16, and sits behind an LRU cache of GEOIP_CACHE_SIZE addresses
+(default 65536).
+
+Usage:
+    python -m backend.geoip <ranges.csv> [ip ...]
+"""
+import csv
+import functools
+import json
+import mmap
+import os
+import socket
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from backend.logger import get_logger
+
+log = get_logger('geoip')
+
+MAGIC = b'CHGEOIP2'
+HEADER = struct.Struct('<8sII')  # magic, range count, country table bytes
+UNKNOWN = ('XX', 'Unknown')
+# Prefix index entries, one per /16 plus the end of the address space
+PREFIXES = 2 ** 16 + 1
+
+_inet_pton = socket.inet_pton
+_AF_INET = socket.AF_INET
+
+
+def ip_to_int(ip_address):
+    """IPv4 address as an unsigned 32-bit int, or None (IPv6, hostnames, garbage)"""
+    try:
+        return int.from_bytes(_inet_pton(_AF_INET, ip_address), 'big')
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def _parse_bound(value):
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return number if number < 2 ** 32 else None
+    return ip_to_int(value)
+
+
+def compile_ranges(csv_path, bin_path):
+    """
+    Compile a range CSV into the memory-mappable table.
+
+    Returns:
+        Number of ranges written
+    """
+    ranges = []
+    names = {}
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            start, end = _parse_bound(row[0]), _parse_bound(row[1])
+            if start is None or end is None or end < start:
+                continue
+            code = row[2].strip().upper()
+            if not code or code == '-':
+                continue
+            name = row[3].strip() if len(row) > 3 and row[3].strip() else code
+            names.setdefault(code, name)
+            ranges.append((start, end, code))
+    ranges.sort()
+    starts = array('I', (start for start, _, _ in ranges))
+    # prefix[p]: number of ranges starting at or before p.0.0, so an address in
+    # that /16 is covered by one of ranges[prefix[p] - 1:prefix[p + 1]] or none
+    prefix = array('I', (bisect_right(starts, p << 16) for p in range(PREFIXES)))
+
+    codes = sorted(names)
+    index = {code: i for i, code in enumerate(codes)}
+    table = json.dumps([[code, names[code]] for code in codes]).encode('utf-8')
+    tmp_path = f"{bin_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(ranges), len(table)))
+        f.write(starts.tobytes())
+        f.write(array('I', (end for _, end, _ in ranges)).tobytes())
+        f.write(array('H', (index[code] for _, _, code in ranges)).tobytes())
+        f.write(prefix.tobytes())
+        f.write(table)
+    # Atomic, so workers compiling at the same time never see a partial table
+    os.replace(tmp_path, bin_path)
+    return len(ranges)
+
+
+class GeoIPResolver:
+    def __init__(self, path, cache_size=None):
+        """
+        Args:
+            path: Range CSV (compiled to `<path>.bin` when needed) or a compiled .bin table
+            cache_size: LRU entries (default GEOIP_CACHE_SIZE or 65536)
+        """
+        if cache_size is None:
+            cache_size = int(os.getenv("GEOIP_CACHE_SIZE", 65536))
+        if path.endswith('.bin'):
+            bin_path = path
+        else:
+            bin_path = path + '.bin'
+            if not os.path.exists(bin_path) or os.path.getmtime(bin_path) < os.path.getmtime(path):
+                count = compile_ranges(path, bin_path)
+                log.info("Compiled ranges", count=count, path=path)
+        self.path = bin_path
+
+        with open(bin_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, table_bytes = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{bin_path} is not a compiled geo-IP table")
+        view = memoryview(self._map)
+        offset = HEADER.size
+        self._starts = view[offset:offset + 4 * count].cast('I')
+        offset += 4 * count
+        self._ends = view[offset:offset + 4 * count].cast('I')
+        offset += 4 * count
+        self._countries = view[offset:offset + 2 * count].cast('H')
+        offset += 2 * count
+        self._prefix = view[offset:offset + 4 * PREFIXES].cast('I')
+        offset += 4 * PREFIXES
+        self.countries = [tuple(entry) for entry in json.loads(bytes(view[offset:offset + table_bytes]))]
+        self.lookup = functools.lru_cache(maxsize=cache_size)(self.lookup_uncached)
+
+    def lookup_uncached(self, ip_address):
+        """(country_code, country_name) for an address; UNKNOWN outside every range"""
+        number = ip_to_int(ip_address)
+        if number is None:
+            return UNKNOWN
+        prefix = number >> 16
+        lo = self._prefix[prefix]
+        i = bisect_right(self._starts, number, lo - 1 if lo else 0, self._prefix[prefix + 1]) - 1
+        if i < 0 or number > self._ends[i]:
+            return UNKNOWN
+        return self.countries[self._countries[i]]
+
+    def __len__(self):
+        return len(self._starts)
+
+    def cache_info(self):
+        return self.lookup.cache_info()
+
+
+_resolver = None
+_resolver_loaded = False
+
+
+def get_geoip():
+    """Shared resolver for GEOIP_DB, or None if no range file is configured"""
+    global _resolver, _resolver_loaded
+    if not _resolver_loaded:
+        _resolver_loaded = True
+        path = os.getenv("GEOIP_DB")
+        if not path:
+            log.warning("GEOIP_DB not set, countries will be reported as Unknown")
+        elif not os.path.exists(path):
+            log.warning("Range file not found, countries will be reported as Unknown", path=path)
+        else:
+            try:
+                _resolver = GeoIPResolver(path)
+                log.info("Loaded IPv4 ranges", count=len(_resolver), path=_resolver.path)
+            except (OSError, ValueError) as e:
+                log.error("Could not load range file", path=path, error=str(e))
+    return _resolver
+
+
+def lookup_country(ip_address):
+    """(country_code, country_name) for an address, UNKNOWN without a resolver"""
+    resolver = get_geoip()
+    return resolver.lookup(ip_address) if resolver else UNKNOWN
+
+
+def country_counts(db, limit=None):
+    """
+    Per-country attack totals, from the per-IP rollup (one lookup per distinct IP).
+
+    Returns:
+        [{'country', 'code', 'count', 'ips', 'sqli', 'xss', 'benign'}], most events first
+    """
+    countries = {}
+    for row in db.get_top_ips(None):
+        code, name = lookup_country(row['ip'])
+        entry = countries.get(code)
+        if entry is None:
+            entry = countries[code] = {'country': name, 'code': code, 'count': 0, 'ips': 0,
+                                       'sqli': 0, 'xss': 0, 'benign': 0}
+        entry['count'] += row['total']
+        entry['ips'] += 1
+        entry['sqli'] += row['sqli']
+        entry['xss'] += row['xss']
+        entry['benign'] += row['benign']
+    ranked = sorted(countries.values(), key=lambda entry: entry['count'], reverse=True)
+    return ranked[:limit] if limit else ranked
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    resolver = GeoIPResolver(sys.argv[1])
+    print(f"{len(resolver)} ranges, {len(resolver.countries)} countries ({resolver.path})")
+    for ip in sys.argv[2:]:
+        code, name = resolver.lookup(ip)
+        print(f"{ip:<16} {code}  {name}")
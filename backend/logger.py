@@ -0,0 +1,184 @@
+"""
+Structured, level-gated logging that never blocks request threads on output.
+
+    log = get_logger('submit')
+    log.debug("Detected", attack_type=attack_type, confidence=confidence)
+    log.info("Report cache hit", every=100, ip=ip_address)
+
+- Calls below LOG_LEVEL (default INFO) return after one level check, before
+  any formatting; [DEBUG]-style detail is debug level.
+- every=N logs only every Nth call of that message (per-message sampling for
+  lines that would otherwise fire on every request).
+- Records go through a bounded queue (LOG_QUEUE_SIZE, default 10000) to a
+  listener thread that formats and writes them to stdout. When the queue is
+  full records are dropped and counted rather than making the caller wait.
+- LOG_FORMAT=text (default) keeps the "[TAG] message key=value" lines the
+  console already shows; LOG_FORMAT=json writes one JSON object per line.
+
+Field values are formatted on the listener thread, so pass values that are not
+mutated afterwards (strings, numbers, fresh dicts).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT = 'chameleon'
+
+_lock = threading.Lock()
+_listener = None
+_handler = None
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        tag = record.name.rsplit('.', 1)[-1].replace('_', ' ').upper()
+        line = f"[{tag}] {record.getMessage()}"
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value!r}" if isinstance(value, str) else f"{key}={value}"
+                                   for key, value in fields.items())
+        if record.levelno >= logging.WARNING:
+            line = f"{record.levelname} {line}"
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of waiting on a full queue"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only tracebacks must be rendered here (they reference live frames);
+        # message and fields are formatted on the listener thread
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure(level=None, fmt=None, stream=None, queue_size=None):
+    """(Re)start the logging pipeline; defaults come from LOG_LEVEL, LOG_FORMAT and LOG_QUEUE_SIZE"""
+    global _listener, _handler
+    if level is None:
+        level = os.getenv("LOG_LEVEL", "INFO")
+    if fmt is None:
+        fmt = os.getenv("LOG_FORMAT", "text")
+    if queue_size is None:
+        queue_size = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+    shutdown()
+    with _lock:
+        root = logging.getLogger(ROOT)
+        output = logging.StreamHandler(stream if stream is not None else sys.stdout)
+        output.setFormatter(_JSONFormatter() if fmt == 'json' else _TextFormatter())
+        log_queue = queue.Queue(maxsize=queue_size)
+        _handler = _NonBlockingQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, output)
+        root.addHandler(_handler)
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        # Uvicorn configures the root logger; do not print chameleon records twice
+        root.propagate = False
+        _listener.start()
+
+
+def shutdown():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            logging.getLogger(ROOT).removeHandler(_handler)
+            _listener = None
+
+
+def stats():
+    with _lock:
+        if _listener is None:
+            return {'configured': False}
+        return {
+            'configured': True,
+            'level': logging.getLogger(ROOT).level,
+            'queued': _handler.queue.qsize(),
+            'dropped': _handler.dropped,
+        }
+
+
+class Logger:
+    """Thin wrapper over a stdlib logger taking key=value fields and every=N sampling"""
+    __slots__ = ('_logger', '_counts')
+
+    def __init__(self, name):
+        self._logger = logging.getLogger(f"{ROOT}.{name}")
+        self._counts = {}  # message -> calls so far (for every=N)
+
+    def enabled(self, level=logging.DEBUG):
+        return self._logger.isEnabledFor(level)
+
+    def _log(self, level, msg, every, fields, exc_info=False):
+        if not self._logger.isEnabledFor(level):
+            return
+        if every > 1:
+            # Unsynchronised on purpose: a lost increment only shifts the sample
+            count = self._counts.get(msg, 0)
+            self._counts[msg] = count + 1
+            if count % every:
+                return
+            fields['sampled_every'] = every
+        self._logger.log(level, msg, extra={'fields': fields}, exc_info=exc_info)
+
+    def debug(self, msg, every=1, **fields):
+        self._log(logging.DEBUG, msg, every, fields)
+
+    def info(self, msg, every=1, **fields):
+        self._log(logging.INFO, msg, every, fields)
+
+    def warning(self, msg, every=1, **fields):
+        self._log(logging.WARNING, msg, every, fields)
+
+    def error(self, msg, every=1, **fields):
+        self._log(logging.ERROR, msg, every, fields)
+
+    def exception(self, msg, **fields):
+        """Error with the current exception's traceback"""
+        self._log(logging.ERROR, msg, 1, fields, exc_info=True)
+
+
+def get_logger(name):
+    """Logger whose text lines are tagged [NAME]; configures the pipeline on first use"""
+    if _listener is None:
+        with _lock:
+            needs_setup = _listener is None
+        if needs_setup:
+            configure()
+    return Logger(name)
+
+
+atexit.register(shutdown)
@@ -1,64 +1,165 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
-from backend.model import MLModel
+from backend.model import MLModel, apply_pattern_overrides
 from backend.deception import DeceptionEngine
-from backend.blockchain import MerkleTree
+from backend.blockchain import get_merkle_tree
 from backend.database import Database
+from backend.storage import get_database, get_async_database
+from backend.timeseries import query_time_series
+from backend.geoip import country_counts
+from backend import metrics
+from backend.metrics import span
+from backend import logger
+from backend.logger import get_logger
+from backend.archive import start_archiver
 from backend.routes.merkle import router as merkle_router
-from backend.routes.report import router as report_router
-from backend.routes.submit import router as submit_router
+from backend.routes.report import router as report_router, report_pool
+from backend.routes.submit import router as submit_router, start_session_expiry
+from backend.routes.admin import router as admin_router, RequestProfilerMiddleware
 import uvicorn
 
 # AI router (Python implementation)
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-from backend.database import Database
+from typing import Optional, Dict, Any, List
 from backend.services.fallbackRules import explain_attack as explain_attack_python
+from backend.services.explanations import ExplanationService
+import asyncio
+import json
 import os
 
 ai_router = APIRouter()
-db_ai = Database()
+db_ai = get_async_database()
+# Precomputed/cached explanations of stored events (ad-hoc events are explained directly)
+explanations = ExplanationService(get_database())
+
+async def get_explanation(event_id: int):
+    """Explanation of a stored event via the cache (a keyed read), 404 if the event does not exist"""
+    explanation = await db_ai.run(explanations.get, event_id)
+    if explanation is None:
+        raise HTTPException(status_code=404, detail=f"Event {event_id} not found")
+    return explanation
 
 class ExplainRequest(BaseModel):
     event_id: Optional[int] = None
     event: Optional[Dict[str, Any]] = None
 
+# Most events one batch request may explain
+EXPLAIN_BATCH_MAX = int(os.getenv("EXPLAIN_BATCH_MAX", 1000))
+# Events explained per streamed chunk (also the per-query id chunk of the SQLite backend)
+EXPLAIN_STREAM_CHUNK = 500
+
+class ExplainBatchRequest(BaseModel):
+    event_ids: Optional[List[int]] = None
+    ip: Optional[str] = None
+    since_ms: Optional[int] = None
+    until_ms: Optional[int] = None
+    limit: int = 500
+    stream: bool = False
+
+def select_logs(ip, since_ms, until_ms, limit):
+    """Newest logs of an IP and/or time range, through the per-IP index or the ts_ms range"""
+    db_store = db_ai.db
+    if ip:
+        return db_store.get_logs_for_ip(ip, since_ms, until_ms, limit)
+    return db_store.get_logs(since_ms, until_ms, limit=limit)
+
+def explain_batch(event_ids=None, logs=None):
+    """[(event_id, explanation or None)] in request order, from one fetch and one rules pass"""
+    if logs is not None:
+        found = explanations.explain_logs(logs)
+        return [(log['id'], found.get(log['id'])) for log in logs]
+    found = explanations.get_many(event_ids)
+    return [(event_id, found.get(event_id)) for event_id in event_ids]
+
+def stream_explanations(event_ids=None, logs=None):
+    """NDJSON lines, one per event, explaining EXPLAIN_STREAM_CHUNK events at a time"""
+    items = logs if logs is not None else event_ids
+    for start in range(0, len(items), EXPLAIN_STREAM_CHUNK):
+        chunk = items[start:start + EXPLAIN_STREAM_CHUNK]
+        results = explain_batch(logs=chunk) if logs is not None else explain_batch(event_ids=chunk)
+        for event_id, explanation in results:
+            line = {"event_id": event_id, "explanation": explanation}
+            if explanation is None:
+                line["error"] = "not found"
+            yield json.dumps(line) + "\n"
+
 @ai_router.post("/api/ai/explain")
 async def explain_attack_endpoint(request: Request, payload: ExplainRequest):
+    with span('explain'):
+        return await _explain_attack(payload)
+
+async def _explain_attack(payload: ExplainRequest):
     try:
-        event = None
         if payload.event_id:
-            logs = db_ai.get_logs()
-            event = next((log for log in logs if log.get('id') == payload.event_id), None)
-            if not event:
-                raise HTTPException(status_code=404, detail=f"Event {payload.event_id} not found")
+            with span('explain', 'lookup'):
+                # Explanations are stored without the event, so its time is a keyed read alongside
+                explanation, event = await asyncio.gather(get_explanation(payload.event_id),
+                                                          db_ai.get_log(payload.event_id))
+            timestamp = event['timestamp'] if event else None
         elif payload.event:
-            event = payload.event
+            with span('explain', 'rules'):
+                explanation = explain_attack_python(payload.event)
+            timestamp = explanation.get('timestamp') or payload.event.get('timestamp')
         else:
             raise HTTPException(status_code=400, detail="Either event_id or event must be provided")
-        
-        explanation = explain_attack_python(event)
+
         return {
             "success": True,
             "explanation": explanation,
             "event_id": payload.event_id,
-            "timestamp": explanation.get('timestamp') or event.get('timestamp')
+            "timestamp": timestamp
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating explanation: {str(e)}")
 
+@ai_router.post("/api/ai/explain/batch")
+async def explain_attack_batch(payload: ExplainBatchRequest):
+    """
+    Explain many stored events at once: either event_ids, or the newest `limit`
+    events of an IP and/or [since_ms, until_ms) range. With stream=true the
+    explanations are sent as NDJSON lines while later chunks are computed.
+    """
+    logs = None
+    event_ids = None
+    if payload.event_ids is not None:
+        # Repeated ids are explained once
+        event_ids = list(dict.fromkeys(payload.event_ids))
+        if len(event_ids) > EXPLAIN_BATCH_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {EXPLAIN_BATCH_MAX} event ids per batch")
+    elif payload.ip or payload.since_ms is not None or payload.until_ms is not None:
+        if payload.limit < 1:
+            raise HTTPException(status_code=400, detail="limit must be positive")
+        with span('explain_batch', 'select'):
+            logs = await db_ai.run(select_logs, payload.ip, payload.since_ms, payload.until_ms,
+                                   min(payload.limit, EXPLAIN_BATCH_MAX))
+    else:
+        raise HTTPException(status_code=400, detail="Provide event_ids, ip, since_ms or until_ms")
+
+    if payload.stream:
+        return StreamingResponse(stream_explanations(event_ids, logs), media_type="application/x-ndjson")
+    try:
+        with span('explain_batch', 'explain'):
+            results = await db_ai.run(explain_batch, event_ids, logs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating explanations: {str(e)}")
+    return {
+        "success": True,
+        "count": sum(1 for _, explanation in results if explanation is not None),
+        "explanations": [{"event_id": event_id, "explanation": explanation}
+                         for event_id, explanation in results if explanation is not None],
+        "missing": [event_id for event_id, explanation in results if explanation is None]
+    }
+
 @ai_router.get("/api/ai/explain/{event_id}")
 async def explain_attack_by_id(event_id: int, request: Request):
     try:
-        logs = db_ai.get_logs()
-        event = next((log for log in logs if log.get('id') == event_id), None)
-        if not event:
-            raise HTTPException(status_code=404, detail=f"Event {event_id} not found")
-        explanation = explain_attack_python(event)
+        with span('explain_by_id'):
+            explanation = await get_explanation(event_id)
         return {
             "success": True,
             "explanation": explanation,
@@ -79,18 +180,26 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Admin-only per-request cProfile (X-Profile: 1 + X-Admin-Token)
+app.add_middleware(RequestProfilerMiddleware)
 
 # Include routers
 app.include_router(merkle_router)
 app.include_router(report_router)
 app.include_router(submit_router)
 app.include_router(ai_router)
+app.include_router(admin_router)
 
 # Initialize Components
+log = get_logger('analyze')
 model = MLModel()
 deception = DeceptionEngine()
-merkle = MerkleTree()
-db = Database()
+merkle = get_merkle_tree()
+db = get_database()
+adb = get_async_database()
+metrics.REGISTRY.register_stats('chameleon_ingest', 'Write-behind ingest statistics', db.write_stats)
+metrics.REGISTRY.register_stats('chameleon_explanations', 'Explanation cache statistics', explanations.stats)
+metrics.REGISTRY.register_stats('chameleon_logging', 'Log queue statistics', logger.stats)
 
 class AnalyzeRequest(BaseModel):
     input_text: str
@@ -114,57 +223,42 @@ async def analyze(request: AnalyzeRequest):
             }
         }
 
+    with span('analyze'):
+        return await _analyze(request)
+
+async def _analyze(request: AnalyzeRequest):
     # 1. Detect
-    attack_type, confidence = model.predict(request.input_text)
-    print(f"[DEBUG] Input: {request.input_text}")
-    print(f"[DEBUG] Detected: {attack_type}, Confidence: {confidence}")
-    
-    # Fallback: Check for common SQLi/XSS patterns if model doesn't detect them
-    # Only override if model is uncertain AND patterns are clearly malicious
-    input_lower = request.input_text.lower()
-    sqli_patterns = ["' or", "or 1=1", "union select", "drop table", "'; --", "or '1'='1", "admin' --", "union all select"]
-    xss_patterns = ["<script", "javascript:", "onerror=", "onload=", "<img src", "<svg", "onclick=", "alert("]
+    with span('analyze', 'predict'):
+        attack_type, confidence = model.predict(request.input_text)
+    log.debug("Detected", input=request.input_text, attack_type=attack_type, confidence=confidence)
     
-    # Only apply pattern detection if:
-    # 1. Model says Benign but confidence is low (< 0.6), OR
-    # 2. Model prediction is uncertain (confidence < 0.7)
-    # This prevents normal inputs from being misclassified
-    if (attack_type == "Benign" and confidence < 0.6) or (confidence < 0.7 and attack_type != "Benign"):
-        # Check for clear SQLi patterns
-        if any(pattern in input_lower for pattern in sqli_patterns):
-            print(f"[DEBUG] Pattern-based detection: SQLi pattern found, overriding model")
-            attack_type = "SQLi"
-            confidence = 0.9
-        # Check for clear XSS patterns
-        elif any(pattern in input_lower for pattern in xss_patterns):
-            print(f"[DEBUG] Pattern-based detection: XSS pattern found, overriding model")
-            attack_type = "XSS"
-            confidence = 0.9
-        # If no clear patterns found and model says Benign, keep it as Benign
-        elif attack_type == "Benign":
-            print(f"[DEBUG] Keeping Benign classification for normal input")
-            attack_type = "Benign"
-            confidence = max(confidence, 0.7)  # Boost confidence for normal inputs
+    # Fallback: pattern-based override when the model is uncertain
+    with span('analyze', 'overrides'):
+        attack_type, confidence = apply_pattern_overrides(request.input_text, attack_type, confidence)
+    metrics.count_detection('analyze', attack_type)
     
-    # 2. Deceive
-    strategy_func = deception.decide_strategy(attack_type)
-    response = strategy_func()
-    print(f"[DEBUG] Response action: {response.get('action', 'NO ACTION')}")
+    # 2. Deceive (includes the tarpit delay)
+    with span('analyze', 'deception'):
+        strategy_func = deception.decide_strategy(attack_type)
+        response = strategy_func()
+    log.debug("Response", deception=response['deception'], action=response.get('action', 'NO ACTION'))
     
     # 3. Log & Blockchain
-    log_entry = f"{request.ip_address}|{request.input_text}|{attack_type}|{response['deception']}"
-    merkle.add_leaf(log_entry)
-    merkle_root = merkle.get_root()
+    with span('analyze', 'merkle'):
+        log_entry = f"{request.ip_address}|{request.input_text}|{attack_type}|{response['deception']}"
+        merkle.add_leaf(log_entry)
+        merkle_root = merkle.get_root()
     
     # Save to DB with hash
-    log_id = db.log_attack(
-        request.ip_address, 
-        request.input_text, 
-        attack_type, 
-        confidence, 
-        response['deception'],
-        merkle_root
-    )
+    with span('analyze', 'store'):
+        log_id = await adb.queue_attack(
+            request.ip_address, 
+            request.input_text, 
+            attack_type, 
+            confidence, 
+            response['deception'],
+            merkle_root
+        )
     
     # Update the event hash in database (if your DB supports it)
     # For now, the hash is computed on-the-fly in merkle route
@@ -179,8 +273,9 @@ async def analyze(request: AnalyzeRequest):
     }
 
 @app.get("/api/logs")
-def get_logs():
-    logs = db.get_logs()
+def get_logs(since_ms: Optional[int] = None, until_ms: Optional[int] = None):
+    # Without a range only the hot partitions are read; a range reaches the archives it overlaps
+    logs = db.get_logs(since_ms, until_ms, hot_only=since_ms is None and until_ms is None)
     return {
         "logs": logs,
         "merkle_root": merkle.get_root()
@@ -215,111 +310,75 @@ async def test_predict(request: AnalyzeRequest):
         "confidence": confidence
     }
 
+@app.on_event("startup")
+def start_log_archiver():
+    """Periodically move old partitions out of the hot logs table (opt-in)"""
+    if os.getenv("LOG_ARCHIVE_ENABLED", "0") == "1":
+        if isinstance(db, Database):
+            start_archiver(db)
+        else:
+            get_logger('archive').warning("Archiving is not supported by this backend", backend=db.name)
+
+@app.on_event("startup")
+def start_action_session_expiry():
+    """Periodically delete live sessions idle longer than ACTION_SESSION_TTL"""
+    start_session_expiry(db)
+
+@app.on_event("shutdown")
+def flush_pending_writes():
+    """Flush the write-behind queue before the worker exits"""
+    db.close()
+
+@app.on_event("shutdown")
+def flush_logs():
+    """Write out log records still queued for the listener thread"""
+    logger.shutdown()
+
+@app.on_event("shutdown")
+async def stop_report_workers():
+    """Let pooled Node report workers exit"""
+    await report_pool.close()
+
+@app.get("/api/stats/ingest")
+def get_ingest_stats():
+    """Get write-behind ingest statistics (batch sizes, flush latency, drops)"""
+    return {
+        "backend": db.name,
+        "write_behind": db.write_stats()
+    }
+
+@app.get("/api/metrics")
+def get_metrics():
+    """Per-stage latency histograms, counters and component stats in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/api/stats/top-ips")
 def get_top_ips():
     """Get top 10 attacking IPs"""
-    logs = db.get_logs()
-    ip_stats = {}
-    
-    for log in logs:
-        ip = log['ip_address']
-        if ip not in ip_stats:
-            ip_stats[ip] = {'total': 0, 'sqli': 0, 'xss': 0, 'benign': 0}
-        ip_stats[ip]['total'] += 1
-        if log['attack_type'] == 'SQLi':
-            ip_stats[ip]['sqli'] += 1
-        elif log['attack_type'] == 'XSS':
-            ip_stats[ip]['xss'] += 1
-        else:
-            ip_stats[ip]['benign'] += 1
-    
-    # Sort by total requests and get top 10
-    top_ips = sorted(ip_stats.items(), key=lambda x: x[1]['total'], reverse=True)[:10]
-    return [{'ip': ip, **stats} for ip, stats in top_ips]
+    return db.get_top_ips(10)
+
+@app.get("/api/stats/countries")
+def get_country_stats(limit: int = 20):
+    """Get attack counts per source country (offline geo-IP from GEOIP_DB)"""
+    return country_counts(db, limit)
 
 @app.get("/api/stats/time-series")
-def get_time_series():
-    """Get time-series data for last 24 hours"""
-    import datetime
-    from datetime import timezone
-    logs = db.get_logs()
-    
-    # Get last 24 hours (UTC)
-    now = datetime.datetime.now(timezone.utc)
-    hours = []
-    for i in range(24):
-        hour_time = now - datetime.timedelta(hours=23-i)
-        hours.append({
-            'hour': hour_time.strftime('%H:00'),
-            'timestamp': hour_time.isoformat(),
-            'sqli': 0,
-            'xss': 0,
-            'benign': 0,
-            'total': 0
-        })
-    
-    # Count attacks per hour
-    for log in logs:
-        try:
-            log_time = datetime.datetime.fromisoformat(log['timestamp'])
-            hours_ago = (now - log_time).total_seconds() / 3600
-            
-            if 0 <= hours_ago < 24:
-                hour_idx = int(hours_ago)
-                if 0 <= hour_idx < 24:
-                    if log['attack_type'] == 'SQLi':
-                        hours[hour_idx]['sqli'] += 1
-                    elif log['attack_type'] == 'XSS':
-                        hours[hour_idx]['xss'] += 1
-                    else:
-                        hours[hour_idx]['benign'] += 1
-                    hours[hour_idx]['total'] += 1
-        except:
-            continue
-    
-    return hours
+def get_time_series(window: str = "24h", bucket: str = "1h", group_by: str = "attack_type"):
+    """Get attack counts per time bucket (default: last 24 hours, hourly)"""
+    try:
+        return query_time_series(db, window=window, bucket=bucket, group_by=group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/stats/strategies")
 def get_strategy_stats():
     """Get deception strategy statistics"""
-    logs = db.get_logs()
-    strategy_counts = {}
-    
-    for log in logs:
-        strategy = log['deception_strategy']
-        strategy_counts[strategy] = strategy_counts.get(strategy, 0) + 1
-    
-    return [{'strategy': k, 'count': v} for k, v in sorted(strategy_counts.items(), key=lambda x: x[1], reverse=True)]
+    return db.get_strategy_counts()
 
 @app.get("/api/stats/confidence")
 def get_confidence_stats():
     """Get confidence score statistics"""
-    logs = db.get_logs()
-    
-    if not logs:
-        return {
-            'average': 0,
-            'min': 0,
-            'max': 0,
-            'total': 0
-        }
-    
-    confidences = [log['confidence'] for log in logs if log.get('confidence') is not None]
-    
-    if not confidences:
-        return {
-            'average': 0,
-            'min': 0,
-            'max': 0,
-            'total': len(logs)
-        }
-    
-    return {
-        'average': sum(confidences) / len(confidences),
-        'min': min(confidences),
-        'max': max(confidences),
-        'total': len(logs)
-    }
+    return db.get_confidence_stats()
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
@@ -0,0 +1,187 @@
+"""
+In-process request metrics in the Prometheus text format (served on /api/metrics).
+
+Route handlers wrap each pipeline stage in a timing span:
+
+    with span('analyze', 'predict'):
+        attack_type, confidence = model.predict(text)
+
+which records the stage's duration in the chameleon_stage_duration_seconds
+histogram (labels route, stage; stage "total" is the whole request). Counters
+count detections and failures, and the stats() of other components (ingest
+writer, explanation cache, report queue) are exported as gauges at scrape time.
+
+Observing a value is a perf_counter pair, a bisect and a few additions under a
+lock, so it stays on in production; METRICS_ENABLED=0 turns spans into no-ops.
+Each worker process keeps its own numbers.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Upper bounds (seconds) of the latency buckets: 0.5 ms .. 30 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                     for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, count in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(count)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (+ overflow), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labelvalues, list(counts), total) for labelvalues, (counts, total) in self._series.items())
+        names = self.labelnames + ('le',)
+        for labelvalues, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, labelvalues + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []  # (prefix, help, stats function)
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix, help_text, stats):
+        """Export the numeric fields of stats() as gauges named <prefix>_<field> on every scrape"""
+        self._collectors.append((prefix, help_text, stats))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, help_text, stats in self._collectors:
+            try:
+                values = stats()
+            except Exception as e:
+                print(f"[METRICS] Failed to collect {prefix}: {e}")
+                continue
+            for field, value in sorted(values.items()):
+                if isinstance(value, bool):
+                    value = int(value)
+                elif not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{field}"
+                lines.extend([f"# HELP {name} {help_text} ({field})", f"# TYPE {name} gauge", f"{name} {_number(value)}"])
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('chameleon_stage_duration_seconds',
+                                   'Time spent in each stage of a request pipeline', ('route', 'stage'))
+DETECTIONS = REGISTRY.counter('chameleon_detections_total', 'Analyzed inputs by detected attack type',
+                              ('route', 'attack_type'))
+ERRORS = REGISTRY.counter('chameleon_request_errors_total', 'Instrumented requests that raised', ('route',))
+
+
+class _Span:
+    __slots__ = ('route', 'stage', 'start')
+
+    def __init__(self, route, stage):
+        self.route = route
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.route, self.stage)
+        if exc_type is not None and self.stage == 'total':
+            ERRORS.inc(self.route)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(route, stage='total'):
+    """Context manager timing one stage of a route (stage 'total' also counts errors)"""
+    return _Span(route, stage) if ENABLED else _NO_SPAN
+
+
+def count_detection(route, attack_type):
+    if ENABLED:
+        DETECTIONS.inc(route, attack_type)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    return REGISTRY.render()
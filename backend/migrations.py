@@ -0,0 +1,124 @@
+"""
+Online, resumable data migrations.
+
+Each migration backfills a column in small id-ordered batches, committing its
+progress together with every batch, so it can run next to live traffic and
+pick up where it left off after a restart.
+
+Usage:
+    python -m backend.migrations [db_path]
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# ISO-8601 TEXT -> UTC epoch milliseconds
+_EPOCH_MS_SQL = "CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+
+# name -> (table, target column, source column)
+MIGRATIONS = {
+    'logs_ts_ms': ('logs', 'ts_ms', 'timestamp'),
+    'session_actions_created_ms': ('session_actions', 'created_ms', 'created_at'),
+}
+
+_started = set()
+_started_lock = threading.Lock()
+
+
+def _ensure_progress_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_migrations
+                    (name TEXT PRIMARY KEY,
+                     last_id INTEGER NOT NULL DEFAULT 0,
+                     rows INTEGER NOT NULL DEFAULT 0,
+                     done INTEGER NOT NULL DEFAULT 0,
+                     updated_ms INTEGER)''')
+    conn.commit()
+
+
+def run_migration(db_name, name, batch_size=5000, pause=0.01):
+    """
+    Backfill one epoch-millisecond column in batches.
+
+    Args:
+        db_name: SQLite database path
+        name: Key of MIGRATIONS
+        batch_size: Rows per transaction
+        pause: Seconds to sleep between batches so request writers get the lock
+
+    Returns:
+        Dict with rows migrated in this run, elapsed seconds and rows/second
+    """
+    table, target, source = MIGRATIONS[name]
+    conn = sqlite3.connect(db_name, timeout=30)
+    _ensure_progress_table(conn)
+    row = conn.execute("SELECT last_id, done FROM schema_migrations WHERE name = ?", (name,)).fetchone()
+    last_id, done = row if row else (0, 0)
+    if done:
+        conn.close()
+        return {'name': name, 'rows': 0, 'seconds': 0.0, 'rows_per_second': 0.0, 'done': True}
+
+    started = time.perf_counter()
+    migrated = 0
+    expression = _EPOCH_MS_SQL.format(column=source)
+    while True:
+        upper = conn.execute(f"SELECT MAX(id) FROM (SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?)",
+                             (last_id, batch_size)).fetchone()[0]
+        if upper is None:
+            break
+        cursor = conn.execute(f"UPDATE {table} SET {target} = {expression} "
+                              f"WHERE id > ? AND id <= ? AND {target} IS NULL AND {source} IS NOT NULL",
+                              (last_id, upper))
+        migrated += cursor.rowcount
+        last_id = upper
+        conn.execute('''INSERT INTO schema_migrations (name, last_id, rows, updated_ms) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id,
+                            rows = rows + excluded.rows, updated_ms = excluded.updated_ms''',
+                     (name, last_id, cursor.rowcount, int(time.time() * 1000)))
+        conn.commit()
+        if pause:
+            time.sleep(pause)
+
+    # Rows inserted from now on carry the column already, so the backfill is complete
+    conn.execute('''INSERT INTO schema_migrations (name, last_id, done, updated_ms) VALUES (?, ?, 1, ?)
+                    ON CONFLICT(name) DO UPDATE SET done = 1, updated_ms = excluded.updated_ms''',
+                 (name, last_id, int(time.time() * 1000)))
+    conn.commit()
+    conn.close()
+    elapsed = time.perf_counter() - started
+    rate = migrated / elapsed if elapsed > 0 else 0.0
+    print(f"[MIGRATION] {name}: {migrated} rows in {elapsed:.2f}s ({rate:.0f} rows/s)")
+    return {'name': name, 'rows': migrated, 'seconds': elapsed, 'rows_per_second': rate, 'done': True}
+
+
+def run_all(db_name, batch_size=5000, pause=0.01):
+    """Run every pending migration and return their reports"""
+    return [run_migration(db_name, name, batch_size, pause) for name in MIGRATIONS]
+
+
+def start_background_migrations(db_name):
+    """Run pending migrations on a daemon thread, once per database per process"""
+    with _started_lock:
+        if db_name in _started:
+            return
+        _started.add(db_name)
+
+    def worker():
+        try:
+            run_all(db_name,
+                    batch_size=int(os.getenv("DB_MIGRATION_BATCH_SIZE", 5000)),
+                    pause=float(os.getenv("DB_MIGRATION_PAUSE", 0.01)))
+        except Exception as e:
+            print(f"[MIGRATION] Failed (will resume on next start): {e}")
+
+    threading.Thread(target=worker, name="db-migrations", daemon=True).start()
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.getenv("DATABASE_PATH", "logs.db")
+    # Make sure the target columns exist before backfilling
+    from backend.database import Database
+    Database(path, migrate=False)
+    for report in run_all(path, pause=0):
+        print(report)
@@ -1,5 +1,8 @@
 import joblib
 import os
+from backend.logger import get_logger
+
+log = get_logger('model')
 
 class MLModel:
     def __init__(self, model_path='backend/model.pkl'):
@@ -7,7 +10,8 @@ class MLModel:
             self.model = joblib.load(model_path)
         else:
             self.model = None
-            print(f"Warning: Model not found at {model_path}")
+            # /api/submit builds a model per request: keep this to one line in 1000
+            log.warning("Model not found", every=1000, path=model_path)
 
     def predict(self, text, confidence_threshold=0.6):
         """
@@ -21,35 +25,98 @@ class MLModel:
         # Get prediction probabilities
         try:
             proba_array = self.model.predict_proba([text])[0]
-            # For Pipeline, access classes from the classifier step
-            if hasattr(self.model, 'named_steps') and 'classifier' in self.model.named_steps:
-                classes = self.model.named_steps['classifier'].classes_
-            elif hasattr(self.model, 'classes_'):
-                classes = self.model.classes_
-            else:
+            classes = self._classes()
+            if classes is None:
                 # Fallback: get classes from predict
                 prediction = self.model.predict([text])[0]
                 return prediction, 0.8  # Assume high confidence if we can't get probabilities
-            
-            max_proba = proba_array.max()
-            max_index = proba_array.argmax()
-            prediction = classes[max_index]
-            
-            # If confidence is too low, default to Benign to reduce false positives
-            if max_proba < confidence_threshold:
-                # Check if Benign class exists
-                if 'Benign' in classes:
-                    benign_index = list(classes).index('Benign')
-                    benign_proba = proba_array[benign_index]
-                    # If Benign probability is reasonable, use it
-                    if benign_proba > 0.3:
-                        return "Benign", benign_proba
-                # Otherwise, still return Benign but with lower confidence
-                return "Benign", max_proba
-            
-            return prediction, max_proba
+            return self._decide(proba_array, classes, confidence_threshold)
         except Exception as e:
-            print(f"Error in prediction: {e}")
+            log.error("Error in prediction", error=str(e))
             # Fallback to simple prediction if predict_proba fails
             prediction = self.model.predict([text])[0]
             return prediction, 0.5  # Low confidence fallback
+
+    def predict_batch(self, texts, confidence_threshold=0.6):
+        """
+        Predict many inputs with a single vectorized model call.
+
+        Returns:
+            List of (attack_type, confidence) tuples, same rules as predict()
+        """
+        if not self.model:
+            return [("Benign", 1.0) for _ in texts]
+        if not texts:
+            return []
+        try:
+            proba_matrix = self.model.predict_proba(list(texts))
+            classes = self._classes()
+            if classes is None:
+                return [(prediction, 0.8) for prediction in self.model.predict(list(texts))]
+            return [self._decide(proba_array, classes, confidence_threshold) for proba_array in proba_matrix]
+        except Exception as e:
+            log.error("Error in batch prediction", error=str(e))
+            return [(prediction, 0.5) for prediction in self.model.predict(list(texts))]
+
+    def _classes(self):
+        # For Pipeline, access classes from the classifier step
+        if hasattr(self.model, 'named_steps') and 'classifier' in self.model.named_steps:
+            return self.model.named_steps['classifier'].classes_
+        if hasattr(self.model, 'classes_'):
+            return self.model.classes_
+        return None
+
+    def _decide(self, proba_array, classes, confidence_threshold):
+        max_proba = proba_array.max()
+        max_index = proba_array.argmax()
+        prediction = classes[max_index]
+        
+        # If confidence is too low, default to Benign to reduce false positives
+        if max_proba < confidence_threshold:
+            # Check if Benign class exists
+            if 'Benign' in classes:
+                benign_index = list(classes).index('Benign')
+                benign_proba = proba_array[benign_index]
+                # If Benign probability is reasonable, use it
+                if benign_proba > 0.3:
+                    return "Benign", benign_proba
+            # Otherwise, still return Benign but with lower confidence
+            return "Benign", max_proba
+        
+        return prediction, max_proba
+
+
+SQLI_PATTERNS = ["' or", "or 1=1", "union select", "drop table", "'; --", "or '1'='1", "admin' --", "union all select"]
+XSS_PATTERNS = ["<script", "javascript:", "onerror=", "onload=", "<img src", "<svg", "onclick=", "alert("]
+
+
+def apply_pattern_overrides(text, attack_type, confidence, verbose=True):
+    """
+    Fallback: check for common SQLi/XSS patterns if the model doesn't detect them.
+
+    Only overrides if the model is uncertain AND patterns are clearly malicious:
+    1. Model says Benign but confidence is low (< 0.6), OR
+    2. Model prediction is uncertain (confidence < 0.7)
+    This prevents normal inputs from being misclassified.
+
+    Returns:
+        (attack_type, confidence)
+    """
+    if (attack_type == "Benign" and confidence < 0.6) or (confidence < 0.7 and attack_type != "Benign"):
+        input_lower = text.lower()
+        # Check for clear SQLi patterns
+        if any(pattern in input_lower for pattern in SQLI_PATTERNS):
+            if verbose:
+                log.debug("Pattern-based detection: SQLi pattern found, overriding model")
+            return "SQLi", 0.9
+        # Check for clear XSS patterns
+        if any(pattern in input_lower for pattern in XSS_PATTERNS):
+            if verbose:
+                log.debug("Pattern-based detection: XSS pattern found, overriding model")
+            return "XSS", 0.9
+        # If no clear patterns found and model says Benign, keep it as Benign
+        if attack_type == "Benign":
+            if verbose:
+                log.debug("Keeping Benign classification for normal input")
+            return "Benign", max(confidence, 0.7)  # Boost confidence for normal inputs
+    return attack_type, confidence
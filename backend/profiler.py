@@ -0,0 +1,121 @@
+"""
+On-demand profiling of a live worker (served by backend/routes/admin.py).
+
+SamplingProfiler snapshots every thread's Python stack with
+sys._current_frames() at a fixed interval from a background thread, so the
+profiled code runs unmodified; at the default 200 Hz it costs a few percent of
+one core while running and nothing otherwise. The samples are written in the
+collapsed-stack format read by flamegraph.pl, speedscope and inferno:
+
+    MainThread;run (uvicorn/server.py:60);predict (backend/model.py:12) 42
+
+RequestProfiles keeps the last few cProfile results of single requests
+profiled through the X-Profile header.
+"""
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Leaf frames in these files are threads parked on a lock, queue or selector
+IDLE_FILES = ('threading.py', 'queue.py', 'selectors.py')
+
+
+def _frame_name(code):
+    path = code.co_filename
+    parts = path.replace('\\', '/').split('/')
+    # Keep the last two path components: backend/model.py, uvicorn/server.py
+    short = '/'.join(parts[-2:])
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, include_idle=False):
+        """
+        Args:
+            interval: Seconds between stack snapshots
+            include_idle: Keep samples of threads waiting on locks, queues or the selector
+        """
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples = 0
+        self.counts = Counter()  # collapsed stack -> samples
+
+    def run(self, seconds):
+        """Sample the other threads of this process for `seconds` (blocks the calling thread)"""
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        names = {}
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if len(names) != len(frames):
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                if not self.include_idle and os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.counts[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+        return self
+
+    def collapsed(self):
+        """The samples as collapsed-stack text, hottest stacks first"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class RequestProfiles:
+    """The last `keep` single-request cProfile results, by id"""
+
+    def __init__(self, keep=10):
+        self.keep = keep
+        self._profiles = OrderedDict()  # id -> (label, pstats.Stats)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start profiling the current thread; returns (profile id, profile)"""
+        profile = cProfile.Profile()
+        with self._lock:
+            profile_id = next(self._ids)
+        profile.enable()
+        return profile_id, profile
+
+    def finish(self, profile_id, profile, label):
+        """Stop a profile from start() and keep it under its id"""
+        profile.disable()
+        stats = pstats.Stats(profile)
+        with self._lock:
+            self._profiles[profile_id] = (label, stats)
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def list(self):
+        with self._lock:
+            return [{'id': profile_id, 'request': label, 'total_seconds': round(stats.total_tt, 6)}
+                    for profile_id, (label, stats) in self._profiles.items()]
+
+    def report(self, profile_id, sort='cumulative', limit=50):
+        """pstats text of a kept profile, or None if it has been evicted"""
+        out = io.StringIO()
+        # Stats objects are sorted in place, so render under the lock
+        with self._lock:
+            entry = self._profiles.get(profile_id)
+            if entry is None:
+                return None
+            label, stats = entry
+            stats.stream = out
+            out.write(f"{label}\n")
+            stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
@@ -0,0 +1,127 @@
+"""
+Admin-only diagnostics for a live worker: sampling profiles and per-request cProfile.
+
+Every endpoint needs the X-Admin-Token header to match ADMIN_TOKEN; without
+ADMIN_TOKEN set they answer 404. Each worker process profiles only itself, so
+with several workers repeat the call until the slow one is hit.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from backend.profiler import SamplingProfiler, RequestProfiles
+from backend.logger import get_logger
+import asyncio
+import hmac
+import os
+import threading
+import time
+
+router = APIRouter()
+log = get_logger('admin')
+
+# Longest sampling run one request may ask for
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 60))
+
+request_profiles = RequestProfiles(keep=int(os.getenv("PROFILE_KEEP_REQUESTS", 10)))
+_sampling = threading.Lock()
+# cProfile profiles a whole thread, and requests share the event loop thread: one at a time
+_request_profiling = threading.Lock()
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    expected = os.getenv("ADMIN_TOKEN")
+    return bool(expected) and token is not None and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not os.getenv("ADMIN_TOKEN"):
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def sample_profile(seconds: float = 10, interval_ms: float = 5, include_idle: bool = False):
+    """
+    Sample every thread of this worker for `seconds` and download the stacks.
+
+    Returns a collapsed-stack file (flamegraph.pl, speedscope, inferno).
+    Threads parked on locks, queues or the event loop selector are left out
+    unless include_idle is set.
+    """
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS:g}]")
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+    if not _sampling.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    try:
+        log.info("Sampling profile started", seconds=seconds, interval_ms=interval_ms)
+        profiler = SamplingProfiler(interval_ms / 1000, include_idle)
+        # The sampler sleeps between snapshots on its own thread; the event loop keeps serving
+        await asyncio.get_running_loop().run_in_executor(None, profiler.run, seconds)
+    finally:
+        _sampling.release()
+    filename = f"profile-{os.getpid()}-{int(time.time())}.collapsed"
+    return PlainTextResponse(profiler.collapsed(), headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Profile-Samples": str(profiler.samples),
+    })
+
+
+@router.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+def list_request_profiles():
+    """Kept single-request profiles (send X-Profile: 1 with the admin token to add one)"""
+    return request_profiles.list()
+
+
+@router.get("/api/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def get_request_profile(profile_id: int, sort: str = "cumulative", limit: int = 50):
+    """pstats report of one profiled request"""
+    try:
+        report = request_profiles.report(profile_id, sort, limit)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found or evicted")
+    return PlainTextResponse(report)
+
+
+class RequestProfilerMiddleware:
+    """
+    ASGI middleware running cProfile around requests sent with X-Profile: 1
+    and a valid X-Admin-Token; the response carries X-Profile-Id.
+
+    Only the event loop thread is profiled: work handed to thread pools shows
+    up as time spent awaiting it, and other requests served concurrently are
+    included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        wanted = token = None
+        for name, value in scope['headers']:
+            if name == b'x-profile':
+                wanted = value
+            elif name == b'x-admin-token':
+                token = value.decode('latin-1')
+        if wanted != b'1' or not is_admin_token(token) or not _request_profiling.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        profile_id, profile = request_profiles.start()
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': [*message.get('headers', []),
+                                                  (b'x-profile-id', str(profile_id).encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_profiles.finish(profile_id, profile, f"{scope['method']} {scope['path']}")
+            _request_profiling.release()
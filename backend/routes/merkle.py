@@ -2,13 +2,11 @@
 Merkle root API endpoints for tamper-evidence verification.
 """
 from fastapi import APIRouter
-from backend.database import Database
-from backend.blockchain import MerkleTree
+from backend.storage import get_database
 from datetime import datetime, timezone
 
 router = APIRouter()
-db = Database()
-merkle = MerkleTree()
+db = get_database()
 
 
 @router.get("/api/merkle")
@@ -24,47 +22,48 @@ def get_merkle_root():
             "updatedAt": "ISO_timestamp"
         }
     """
-    logs = db.get_logs()
-    
-    if not logs:
+    from backend.utils.hash import compute_merkle_root, log_leaf_hash
+    archives = db.get_archive_roots()
+    event_log = db.complete_event_log() if not archives else None
+    if event_log is not None:
+        # Stream just the hashes out of the segment log, no row dicts
+        hashes = list(event_log.iter_field('merkle_hash'))
+        if hashes and all(hashes):
+            hashes.reverse()  # same leaf order as get_logs (newest first)
+            return _root_response(compute_merkle_root(hashes), len(hashes))
+
+    # Hot rows, then each archived partition's stored root (see fold_archive_roots)
+    logs = db.get_logs(hot_only=True)
+    hot_root = compute_merkle_root([log_leaf_hash(log) for log in logs]) if logs else None
+    count = len(logs) + sum(row_count for _, row_count in archives)
+    if not count:
         return {
             "merkleRoot": None,
             "count": 0,
             "batchId": "batch-0",
             "updatedAt": datetime.now(timezone.utc).isoformat()
         }
-    
-    # Recompute Merkle root from all log hashes
-    # Each log entry should have a hash field
-    log_hashes = []
-    for log in logs:
-        # Create a hash from log data if not already present
-        if 'merkle_hash' in log and log['merkle_hash']:
-            log_hashes.append(log['merkle_hash'])
-        else:
-            # Generate hash from log entry
-            from backend.utils.hash import hash_event
-            log_hash = hash_event({
-                'id': log.get('id'),
-                'timestamp': log.get('timestamp'),
-                'ip_address': log.get('ip_address'),
-                'input_payload': log.get('input_payload'),
-                'attack_type': log.get('attack_type'),
-                'confidence': log.get('confidence'),
-                'deception_strategy': log.get('deception_strategy')
-            })
-            log_hashes.append(log_hash)
-    
-    # Compute Merkle root
+    return _root_response(fold_archive_roots(hot_root, [root for root, _ in archives]), count)
+
+
+def fold_archive_roots(hot_root, archive_roots):
+    """
+    Root over every event: the hot rows' root followed by each archived
+    partition's root, newest first, combined as Merkle leaves.
+
+    Without archives this is just the hot root, i.e. the root over all event
+    hashes, so it is the same value whichever path computed it; editing an
+    archive's stored root in log_archives changes it too.
+    """
     from backend.utils.hash import compute_merkle_root
-    root = compute_merkle_root(log_hashes) if log_hashes else ""
-    
+    leaves = ([hot_root] if hot_root else []) + [root for root in archive_roots if root]
+    return compute_merkle_root(leaves)
+
+
+def _root_response(root, count):
     return {
         "merkleRoot": root,
-        "count": len(logs),
-        "batchId": f"batch-{len(logs)}",
+        "count": count,
+        "batchId": f"batch-{count}",
         "updatedAt": datetime.now().isoformat()
     }
-
-
-
@@ -3,17 +3,34 @@ PDF Incident Report generation endpoints.
 Enhanced with professional multi-page PDF generation.
 """
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from backend.database import Database
+from fastapi.responses import Response, StreamingResponse
+from backend.storage import get_database, get_async_database
 from backend.routes.merkle import get_merkle_root
+from backend.geoip import get_geoip, lookup_country, country_counts
+from backend.services.report_cache import ReportCache
+from backend.services.report_pool import NodeReportPool, ReportWorkerError
+from backend.services.report_jobs import ReportJobQueue, ReportQueueFull
+from backend.services.report_spool import SpooledPDF
+from backend.metrics import REGISTRY, span
+from backend.logger import get_logger
 from datetime import datetime
 from io import BytesIO
-import json
-import subprocess
+from xml.sax.saxutils import escape
+import asyncio
 import os
 
 router = APIRouter()
-db = Database()
+db = get_database()
+adb = get_async_database()
+report_cache = ReportCache()
+log = get_logger('pdf_report')
+report_pool = NodeReportPool()
+
+# Timeline rows listed individually in ReportLab reports; later events are summarised
+REPORT_MAX_DETAIL_ROWS = int(os.getenv("REPORT_MAX_DETAIL_ROWS", 5000))
+# Events fetched per storage round trip, and rows per timeline table
+REPORT_CHUNK_ROWS = 1000
+TIMELINE_TABLE_ROWS = 200
 
 # Check if Node.js report generator is available
 NODE_REPORT_GENERATOR_AVAILABLE = os.path.exists('backend/services/reportGenerator.js')
@@ -36,8 +53,7 @@ def generate_minimal_pdf(ip_address: str) -> BytesIO:
     This is a fallback when ReportLab is not available.
     """
     # Get logs for this IP
-    all_logs = db.get_logs()
-    ip_logs = [log for log in all_logs if log.get('ip_address') == ip_address]
+    ip_logs = db.get_logs_for_ip(ip_address)
     
     if not ip_logs:
         raise HTTPException(status_code=404, detail=f"No events found for IP: {ip_address}")
@@ -144,41 +160,148 @@ ET
     return buffer
 
 
-def generate_pdf_report(ip_address: str) -> BytesIO:
+def summarize_ip_events(ip_address: str, max_detail_rows: int = None, progress=None) -> dict:
+    """
+    Collect everything the ReportLab report needs in one pass over an IP's events.
+    
+    Events are pulled oldest first from db.iter_logs_for_ip in chunks. Only the
+    first max_detail_rows events are kept (as short timeline rows); the rest
+    are folded into per-day and per-strategy counts, so memory stays bounded
+    however many events the IP has.
+    
+    Returns:
+        Summary dict, or None if the IP has no events
+    """
+    if max_detail_rows is None:
+        max_detail_rows = REPORT_MAX_DETAIL_ROWS
+    summary = {
+        'total': 0,
+        'counts': {'SQLi': 0, 'XSS': 0, 'Benign': 0},
+        'first_seen': 'N/A',
+        'last_seen': 'N/A',
+        'samples': [],
+        'timeline': [],
+        'overflow': 0,
+        'overflow_days': {},
+        'overflow_strategies': {}
+    }
+    for chunk in db.iter_logs_for_ip(ip_address, REPORT_CHUNK_ROWS):
+        for log in chunk:
+            summary['total'] += 1
+            attack_type = log.get('attack_type', 'Unknown')
+            if attack_type in summary['counts']:
+                summary['counts'][attack_type] += 1
+            timestamp = log.get('timestamp') or 'N/A'
+            if summary['total'] == 1:
+                summary['first_seen'] = timestamp
+            summary['last_seen'] = timestamp
+            payload = log.get('input_payload') or 'N/A'
+            strategy = log.get('deception_strategy') or 'N/A'
+            
+            if len(summary['samples']) < 5:
+                summary['samples'].append((attack_type, payload[:100]))
+            
+            if len(summary['timeline']) < max_detail_rows:
+                if len(payload) > 40:
+                    payload = payload[:37] + "..."
+                if len(strategy) > 30:
+                    strategy = strategy[:27] + "..."
+                summary['timeline'].append([timestamp[:19], attack_type, payload, strategy])
+                continue
+            
+            summary['overflow'] += 1
+            day = summary['overflow_days'].setdefault(timestamp[:10], {'total': 0, 'SQLi': 0, 'XSS': 0, 'Benign': 0})
+            day['total'] += 1
+            if attack_type in day:
+                day[attack_type] += 1
+            summary['overflow_strategies'][strategy] = summary['overflow_strategies'].get(strategy, 0) + 1
+        if progress:
+            progress(min(25, 10 + summary['total'] // 10000), f"loading events ({summary['total']})")
+    return summary if summary['total'] else None
+
+
+def load_ip_events(ip_address: str, max_events: int = None):
+    """
+    An IP's events newest first for the Node.js report, read chunk by chunk.
+
+    Returns:
+        List of logs, or None as soon as the IP has more than max_events
+        (those reports go to the streaming ReportLab renderer instead)
+    """
+    if max_events is None:
+        max_events = REPORT_MAX_DETAIL_ROWS
+    events = []
+    chunks = db.iter_logs_for_ip(ip_address, REPORT_CHUNK_ROWS)
+    try:
+        for chunk in chunks:
+            events.extend(chunk)
+            if len(events) > max_events:
+                return None
+    finally:
+        chunks.close()
+    events.reverse()
+    return events
+
+
+def _table_style(font_size=8, padding=6):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), padding),
+        ('TOPPADDING', (0, 0), (-1, -1), padding),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
+    ])
+
+
+def generate_pdf_report(ip_address: str, progress=None, summary=None, merkle_data=None) -> SpooledPDF:
     """
     Generate a professional PDF incident report for an IP address.
     
+    Memory stays bounded for IPs with very many events: events are read in
+    chunks, the timeline lists at most REPORT_MAX_DETAIL_ROWS of them (the rest
+    are summarised by day), and the PDF is written to a spooled temp file.
+    
     Args:
         ip_address: IP address to generate report for
+        progress: Optional callback(percent, stage)
+        summary: summarize_ip_events result, if already read (else read here)
+        merkle_data: get_merkle_root result, if already computed (else computed here)
         
     Returns:
-        BytesIO buffer containing PDF data
+        SpooledPDF containing PDF data
     """
-    print(f"[PDF REPORT] generate_pdf_report called for IP: {ip_address}")
-    print(f"[PDF REPORT] REPORTLAB_AVAILABLE: {REPORTLAB_AVAILABLE}")
+    log.debug("generate_pdf_report called", ip=ip_address, reportlab=REPORTLAB_AVAILABLE)
     
     if not REPORTLAB_AVAILABLE:
         # Fallback: Generate a minimal valid PDF using raw PDF structure
         # This ensures we always return a valid PDF, even without ReportLab
-        print("[PDF REPORT] ReportLab not available, using minimal PDF generator")
-        return generate_minimal_pdf(ip_address)
-    
-    # Get logs for this IP
-    all_logs = db.get_logs()
-    ip_logs = [log for log in all_logs if log.get('ip_address') == ip_address]
-    
-    if not ip_logs:
+        log.warning("ReportLab not available, using minimal PDF generator")
+        pdf = SpooledPDF()
+        pdf.write(generate_minimal_pdf(ip_address).getvalue())
+        return pdf
+    
+    # Get logs for this IP, oldest first (id order)
+    if summary is None:
+        if progress:
+            progress(10, 'loading events')
+        summary = summarize_ip_events(ip_address, progress=progress)
+    
+    if summary is None:
         raise HTTPException(status_code=404, detail=f"No events found for IP: {ip_address}")
     
-    # Sort by timestamp
-    ip_logs.sort(key=lambda x: x.get('timestamp', ''))
-    
     # Get Merkle root
-    merkle_data = get_merkle_root()
+    if merkle_data is None:
+        if progress:
+            progress(30, 'computing merkle root')
+        merkle_data = get_merkle_root()
     
-    # Create PDF buffer
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    # Create PDF output (memory first, temp file once large)
+    pdf = SpooledPDF()
+    doc = SimpleDocTemplate(pdf, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
     
     # Styles
     styles = getSampleStyleSheet()
@@ -209,27 +332,22 @@ def generate_pdf_report(ip_address: str) -> BytesIO:
     story.append(Spacer(1, 0.2*inch))
     
     # Report metadata
-    story.append(Paragraph(f"<b>IP Address:</b> {ip_address}", styles['Normal']))
+    story.append(Paragraph(f"<b>IP Address:</b> {escape(ip_address)}", styles['Normal']))
     story.append(Paragraph(f"<b>Generated:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}", styles['Normal']))
-    story.append(Paragraph(f"<b>Report ID:</b> INC-{ip_address.replace('.', '-')}-{datetime.now().strftime('%Y%m%d')}", styles['Normal']))
+    story.append(Paragraph(f"<b>Report ID:</b> INC-{escape(ip_address.replace('.', '-'))}-{datetime.now().strftime('%Y%m%d')}", styles['Normal']))
     story.append(Spacer(1, 0.3*inch))
     
     # Summary statistics
-    first_seen = ip_logs[0].get('timestamp', 'N/A')
-    last_seen = ip_logs[-1].get('timestamp', 'N/A')
-    
-    sqli_count = sum(1 for log in ip_logs if log.get('attack_type') == 'SQLi')
-    xss_count = sum(1 for log in ip_logs if log.get('attack_type') == 'XSS')
-    benign_count = sum(1 for log in ip_logs if log.get('attack_type') == 'Benign')
-    
     story.append(Paragraph("Summary", heading_style))
+    country_code, country_name = lookup_country(ip_address)
     summary_data = [
-        ['First Seen', first_seen],
-        ['Last Seen', last_seen],
-        ['Total Events', str(len(ip_logs))],
-        ['SQL Injection', str(sqli_count)],
-        ['XSS Attacks', str(xss_count)],
-        ['Benign Traffic', str(benign_count)]
+        ['First Seen', summary['first_seen']],
+        ['Last Seen', summary['last_seen']],
+        ['Country', f"{country_name} ({country_code})"],
+        ['Total Events', str(summary['total'])],
+        ['SQL Injection', str(summary['counts']['SQLi'])],
+        ['XSS Attacks', str(summary['counts']['XSS'])],
+        ['Benign Traffic', str(summary['counts']['Benign'])]
     ]
     summary_table = Table(summary_data, colWidths=[2*inch, 4*inch])
     summary_table.setStyle(TableStyle([
@@ -245,55 +363,53 @@ def generate_pdf_report(ip_address: str) -> BytesIO:
     story.append(summary_table)
     story.append(Spacer(1, 0.3*inch))
     
-    # Sample payloads
+    # Sample payloads (escaped: payloads are attacker-controlled markup)
     story.append(Paragraph("Sample Payloads", heading_style))
-    sample_payloads = ip_logs[:5]  # First 5 as samples
-    for i, log in enumerate(sample_payloads, 1):
-        payload = log.get('input_payload', 'N/A')[:100]  # Truncate long payloads
-        attack_type = log.get('attack_type', 'Unknown')
-        story.append(Paragraph(f"<b>{i}. [{attack_type}]</b> {payload}", styles['Normal']))
+    for i, (attack_type, payload) in enumerate(summary['samples'], 1):
+        story.append(Paragraph(f"<b>{i}. [{escape(attack_type)}]</b> {escape(payload)}", styles['Normal']))
         story.append(Spacer(1, 0.1*inch))
     
-    if len(ip_logs) > 5:
-        story.append(Paragraph(f"... and {len(ip_logs) - 5} more events", styles['Italic']))
+    if summary['total'] > 5:
+        story.append(Paragraph(f"... and {summary['total'] - 5} more events", styles['Italic']))
     
     story.append(PageBreak())
     
-    # Full chronological timeline
+    # Chronological timeline, as a run of page-sized tables (one huge Table
+    # is slow to split across pages)
     story.append(Paragraph("Chronological Timeline", heading_style))
     
-    timeline_data = [['Timestamp', 'Type', 'Payload', 'Strategy']]
-    for log in ip_logs:
-        timestamp = log.get('timestamp', 'N/A')
-        if len(timestamp) > 19:
-            timestamp = timestamp[:19]  # Truncate to readable format
-        
-        attack_type = log.get('attack_type', 'Unknown')
-        payload = log.get('input_payload', 'N/A')
-        if len(payload) > 40:
-            payload = payload[:37] + "..."
-        
-        strategy = log.get('deception_strategy', 'N/A')
-        if len(strategy) > 30:
-            strategy = strategy[:27] + "..."
-        
-        timeline_data.append([timestamp, attack_type, payload, strategy])
-    
-    timeline_table = Table(timeline_data, colWidths=[1.5*inch, 0.8*inch, 2.5*inch, 1.2*inch], repeatRows=1)
-    timeline_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
-    ]))
-    story.append(timeline_table)
+    timeline = summary['timeline']
+    for start in range(0, len(timeline), TIMELINE_TABLE_ROWS):
+        rows = [['Timestamp', 'Type', 'Payload', 'Strategy']] + timeline[start:start + TIMELINE_TABLE_ROWS]
+        timeline_table = Table(rows, colWidths=[1.5*inch, 0.8*inch, 2.5*inch, 1.2*inch], repeatRows=1)
+        timeline_table.setStyle(_table_style())
+        story.append(timeline_table)
     story.append(Spacer(1, 0.3*inch))
     
+    # Events past the detail cap, aggregated
+    if summary['overflow']:
+        story.append(Paragraph("Further Events (Summarised)", heading_style))
+        story.append(Paragraph(
+            f"The timeline above lists the first {len(timeline)} events. "
+            f"The remaining {summary['overflow']} events are summarised below.",
+            styles['Normal']
+        ))
+        story.append(Spacer(1, 0.1*inch))
+        day_rows = [['Day', 'Events', 'SQLi', 'XSS', 'Benign']]
+        for day, counts in sorted(summary['overflow_days'].items()):
+            day_rows.append([day, str(counts['total']), str(counts['SQLi']), str(counts['XSS']), str(counts['Benign'])])
+        day_table = Table(day_rows, colWidths=[1.5*inch, 1*inch, 1*inch, 1*inch, 1*inch], repeatRows=1)
+        day_table.setStyle(_table_style())
+        story.append(day_table)
+        story.append(Spacer(1, 0.2*inch))
+        strategy_rows = [['Deception Strategy', 'Events']]
+        for strategy, count in sorted(summary['overflow_strategies'].items(), key=lambda x: x[1], reverse=True)[:10]:
+            strategy_rows.append([strategy, str(count)])
+        strategy_table = Table(strategy_rows, colWidths=[4*inch, 1*inch], repeatRows=1)
+        strategy_table.setStyle(_table_style())
+        story.append(strategy_table)
+        story.append(Spacer(1, 0.3*inch))
+    
     # Merkle root for tamper-evidence
     story.append(Paragraph("Tamper-Evidence", heading_style))
     story.append(Paragraph(
@@ -320,110 +436,63 @@ def generate_pdf_report(ip_address: str) -> BytesIO:
     ))
     
     # Build PDF
+    if progress:
+        progress(60, 'rendering pdf')
     doc.build(story)
-    buffer.seek(0)
-    return buffer
+    return pdf
 
 
-async def generate_report_nodejs(ip_address: str):
+async def generate_report_nodejs(ip_address: str, progress=None):
     """
     Generate report using Node.js service (better chart rendering).
     
-    This calls a Node.js script that uses jsPDF and chartjs-node-canvas.
+    Rendering runs on the report worker pool (scripts/reportWorker.js, which
+    uses jsPDF and chartjs-node-canvas). The worker gets every event of the
+    IP, so only IPs with at most REPORT_MAX_DETAIL_ROWS events are sent to it.
+
+    Args:
+        ip_address: IP address to generate report for
+        progress: Optional callback(percent, stage)
+
+    Returns:
+        PDF bytes, or None if the IP has too many events for the Node.js payload
     """
-    # Get events from database
-    all_logs = db.get_logs()
-    ip_logs = [log for log in all_logs if log.get('ip_address') == ip_address]
+    progress = progress or (lambda percent, stage: None)
+    
+    # Get events from database (newest first, stops reading past the cap)
+    progress(10, 'loading events')
+    ip_logs = await adb.run(load_ip_events, ip_address)
+    if ip_logs is None:
+        return None
     
     if not ip_logs:
         raise HTTPException(status_code=404, detail=f"No events found for IP: {ip_address}")
     
-    # Sort by timestamp (newest first)
-    ip_logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-    
-    # Get Merkle root
-    merkle_data = get_merkle_root()
+    # Get Merkle root (recomputed from every log hash, so off the event loop)
+    progress(30, 'computing merkle root')
+    merkle_data = await adb.run(get_merkle_root)
     merkle_root = merkle_data.get('merkleRoot', '')
     
     # Calculate stats
-    stats = calculate_stats_for_report(ip_logs, all_logs)
-    
-    # Prepare data for Node.js script
-    import tempfile
-    
-    data_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json')
-    json.dump({
-        'ipAddress': ip_address,
-        'events': ip_logs,
-        'merkleRoot': merkle_root,
-        'stats': stats
-    }, data_file, default=str)
-    data_file.close()
+    stats = await adb.run(calculate_stats_for_report, ip_logs)
     
+    # Render on a pooled, long-lived Node worker (no per-report process start)
+    progress(50, 'rendering pdf')
     try:
-        # Call Node.js script
-        script_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'generateReport.js')
-        result = subprocess.run(
-            ['node', script_path, data_file.name],
-            capture_output=True,
-            timeout=30,
-            cwd=os.getcwd()
-        )
-        
-        if result.returncode != 0:
-            error_msg = result.stderr.decode() if result.stderr else 'Unknown error'
-            raise Exception(f"Node.js script failed: {error_msg}")
-        
-        # Read generated PDF
-        pdf_path = data_file.name.replace('.json', '.pdf')
-        if os.path.exists(pdf_path):
-            with open(pdf_path, 'rb') as f:
-                pdf_data = f.read()
-            os.unlink(pdf_path)
-            os.unlink(data_file.name)
-            
-            filename = f"securebank-report-{ip_address.replace('.', '-')}-{datetime.now().strftime('%Y-%m-%d')}.pdf"
-            
-            return StreamingResponse(
-                BytesIO(pdf_data),
-                media_type="application/pdf",
-                headers={
-                    "Content-Disposition": f'attachment; filename="{filename}"'
-                }
-            )
-        else:
-            raise Exception("PDF file not generated")
-            
-    except subprocess.TimeoutExpired:
-        if os.path.exists(data_file.name):
-            os.unlink(data_file.name)
-        raise HTTPException(status_code=500, detail="Report generation timeout")
-    except Exception as e:
-        if os.path.exists(data_file.name):
-            os.unlink(data_file.name)
+        return await report_pool.render({
+            'ipAddress': ip_address,
+            'events': ip_logs,
+            'merkleRoot': merkle_root,
+            'stats': stats
+        })
+    except ReportWorkerError as e:
         raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
 
 
-def calculate_stats_for_report(ip_logs, all_logs):
+def calculate_stats_for_report(ip_logs):
     """Calculate statistics for the report"""
-    # Top IPs
-    ip_stats = {}
-    for log in all_logs:
-        ip = log.get('ip_address')
-        if not ip:
-            continue
-        if ip not in ip_stats:
-            ip_stats[ip] = {'ip': ip, 'total': 0, 'sqli': 0, 'xss': 0, 'benign': 0}
-        ip_stats[ip]['total'] += 1
-        attack_type = log.get('attack_type', 'Benign')
-        if attack_type == 'SQLi':
-            ip_stats[ip]['sqli'] += 1
-        elif attack_type == 'XSS':
-            ip_stats[ip]['xss'] += 1
-        else:
-            ip_stats[ip]['benign'] += 1
-    
-    top_ips = sorted(ip_stats.values(), key=lambda x: x['total'], reverse=True)[:10]
+    # Top IPs (from the per-IP rollup, no full-table pass)
+    top_ips = db.get_top_ips(10)
     
     # Strategy distribution
     strategy_counts = {}
@@ -433,90 +502,183 @@ def calculate_stats_for_report(ip_logs, all_logs):
     
     strategies = [{'strategy': k, 'count': v} for k, v in sorted(strategy_counts.items(), key=lambda x: x[1], reverse=True)]
     
-    # Geographic (placeholder - implement with geo lookup)
-    geographic = [
-        {'country': 'United States', 'count': max(1, len(ip_logs) // 3)},
-        {'country': 'China', 'count': max(1, len(ip_logs) // 5)},
-        {'country': 'Russia', 'count': max(1, len(ip_logs) // 7)},
-        {'country': 'Germany', 'count': max(1, len(ip_logs) // 10)},
-        {'country': 'United Kingdom', 'count': max(1, len(ip_logs) // 12)},
-        {'country': 'France', 'count': max(1, len(ip_logs) // 15)},
-        {'country': 'Japan', 'count': max(1, len(ip_logs) // 20)},
-        {'country': 'Brazil', 'count': max(1, len(ip_logs) // 25)}
-    ]
-    geographic = [g for g in geographic if g['count'] > 0]
-    geographic.sort(key=lambda x: x['count'], reverse=True)
+    # Geographic: events per source country across all IPs (offline geo-IP;
+    # left empty without a GEOIP_DB so the chart is skipped)
+    geographic = []
+    if get_geoip() is not None:
+        geographic = [{'country': c['country'], 'count': c['count']} for c in country_counts(db, 8)]
     
     return {
         'topIPs': top_ips,
         'strategies': strategies,
-        'geographic': geographic[:8]
+        'geographic': geographic
     }
 
 
-@router.get("/api/report/{ip_address}")
-async def get_incident_report(ip_address: str):
+def _pdf_response(ip_address: str, pdf_data, cache_status: str) -> Response:
+    """PDF download response; SpooledPDF reports are streamed in chunks"""
+    filename = f"securebank-report-{ip_address.replace('.', '-')}-{datetime.now().strftime('%Y-%m-%d')}.pdf"
+    headers = {
+        "Content-Disposition": f"attachment; filename=\"{filename}\"",
+        "X-Report-Cache": cache_status
+    }
+    if isinstance(pdf_data, SpooledPDF):
+        headers["Content-Length"] = str(len(pdf_data))
+        return StreamingResponse(pdf_data.iter_chunks(), media_type="application/pdf", headers=headers)
+    return Response(content=pdf_data, media_type="application/pdf", headers=headers)
+
+
+async def render_report(job):
     """
-    Generate and download professional multi-page PDF incident report for an IP address.
+    Generate the PDF for a report job and cache it.
     
     Tries Node.js generator first (better charts), falls back to Python ReportLab.
-    
-    Args:
-        ip_address: IP address to generate report for
-        
-    Returns:
-        PDF file stream
     """
-    print(f"[PDF REPORT] Generating report for IP: {ip_address}")
-    print(f"[PDF REPORT] ReportLab available: {REPORTLAB_AVAILABLE}")
-    print(f"[PDF REPORT] Node.js generator available: {NODE_REPORT_GENERATOR_AVAILABLE}")
+    ip_address = job.ip_address
+    log.debug("Generators", reportlab=REPORTLAB_AVAILABLE, node=NODE_REPORT_GENERATOR_AVAILABLE)
     
-    # Try Node.js generator first (if available)
-    if NODE_REPORT_GENERATOR_AVAILABLE:
+    # Try Node.js generator first (if available and its workers start)
+    if NODE_REPORT_GENERATOR_AVAILABLE and report_pool.available:
         try:
-            print("[PDF REPORT] Attempting Node.js generator...")
-            return await generate_report_nodejs(ip_address)
+            log.debug("Attempting Node.js generator")
+            with span('report_render', 'node'):
+                pdf_data = await generate_report_nodejs(ip_address, job.update)
+            if pdf_data is not None:
+                report_cache.put(ip_address, job.last_event_id, pdf_data)
+                return pdf_data
+            log.info("IP over the Node.js event cap, using ReportLab", ip=ip_address, cap=REPORT_MAX_DETAIL_ROWS)
         except Exception as e:
-            print(f"[PDF REPORT] Node.js generator failed: {e}")
+            log.warning("Node.js generator failed", ip=ip_address, error=str(e))
             # Fall through to Python implementation
     
     # Python ReportLab implementation (existing)
     try:
-        print("[PDF REPORT] Using Python ReportLab generator...")
-        pdf_buffer = generate_pdf_report(ip_address)
-        filename = f"securebank-report-{ip_address.replace('.', '-')}-{datetime.now().strftime('%Y-%m-%d')}.pdf"
+        log.debug("Using Python ReportLab generator")
+        # Reads go through the shared storage read pool; the CPU-bound layout
+        # runs on the default executor so it does not hold a storage slot
+        loop = asyncio.get_running_loop()
+        with span('report_render', 'reportlab'):
+            if REPORTLAB_AVAILABLE:
+                job.update(10, 'loading events')
+                summary = await adb.run(summarize_ip_events, ip_address, progress=job.update)
+                if summary is None:
+                    raise HTTPException(status_code=404, detail=f"No events found for IP: {ip_address}")
+                job.update(30, 'computing merkle root')
+                merkle_data = await adb.run(get_merkle_root)
+                pdf_data = await loop.run_in_executor(None, generate_pdf_report, ip_address, job.update,
+                                                      summary, merkle_data)
+            else:
+                pdf_data = await adb.run(generate_pdf_report, ip_address, job.update)
         
-        # Ensure buffer is at the start
-        pdf_buffer.seek(0)
+        # Verify it's a valid PDF (header only; the body may be spooled to disk)
+        header = pdf_data.read(0, 50)
+        log.debug("Generated PDF", bytes=len(pdf_data), header=header[:10])
         
-        # Verify it's a valid PDF
-        pdf_data = pdf_buffer.read()
-        print(f"[PDF REPORT] Generated PDF size: {len(pdf_data)} bytes")
-        print(f"[PDF REPORT] PDF starts with: {pdf_data[:10]}")
-        
-        if not pdf_data.startswith(b'%PDF'):
+        if not header.startswith(b'%PDF'):
             # If not a valid PDF, something went wrong
-            error_msg = f"Generated file is not a valid PDF. First 50 bytes: {pdf_data[:50]}"
-            print(f"[PDF REPORT] ERROR: {error_msg}")
+            error_msg = f"Generated file is not a valid PDF. First 50 bytes: {header}"
+            log.error("Generated file is not a valid PDF", ip=ip_address, header=header)
             raise HTTPException(status_code=500, detail=error_msg)
         
-        pdf_buffer.seek(0)  # Reset for streaming
-        
-        print(f"[PDF REPORT] Returning valid PDF: {len(pdf_data)} bytes")
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=\"{filename}\"",
-                "Content-Length": str(len(pdf_data))
-            }
-        )
+        report_cache.put(ip_address, job.last_event_id, pdf_data)
+        log.info("Generated report", ip=ip_address, bytes=len(pdf_data))
+        return pdf_data
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"[PDF REPORT] Error generating PDF: {e}")
-        print(f"[PDF REPORT] Traceback:\n{error_trace}")
+        log.exception("Error generating PDF", ip=ip_address, error=str(e))
         raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
 
+
+# One job per Node worker by default: fewer job workers would leave pool workers idle
+report_jobs = ReportJobQueue(render_report, workers=int(os.getenv("REPORT_JOB_WORKERS", report_pool.size)))
+REGISTRY.register_stats('chameleon_report_jobs', 'Report job queue statistics', report_jobs.stats)
+REGISTRY.register_stats('chameleon_report_cache', 'Report PDF cache statistics', report_cache.stats)
+REGISTRY.register_stats('chameleon_report_workers', 'Node report worker pool statistics', report_pool.stats)
+
+
+async def _last_event_id(ip_address: str) -> int:
+    last_event_id = await adb.get_ip_last_event_id(ip_address)
+    if last_event_id is None:
+        raise HTTPException(status_code=404, detail=f"No events found for IP: {ip_address}")
+    return last_event_id
+
+
+def _submit_job(ip_address: str, last_event_id: int, result: bytes = None):
+    try:
+        return report_jobs.submit(ip_address, last_event_id, result)
+    except ReportQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Report queue is full: {e}")
+
+
+@router.get("/api/report/{ip_address}")
+async def get_incident_report(ip_address: str):
+    """
+    Generate and download professional multi-page PDF incident report for an IP address.
+    
+    PDFs are cached per IP until a new event arrives for that IP. On a miss the
+    report is generated through the report job queue, so it shares the
+    REPORT_JOB_WORKERS limit with POST /api/report/{ip}/jobs.
+    
+    Args:
+        ip_address: IP address to generate report for
+        
+    Returns:
+        PDF file
+    """
+    log.debug("Generating report", ip=ip_address)
+    
+    with span('report'):
+        with span('report', 'lookup'):
+            last_event_id = await _last_event_id(ip_address)
+        
+        cached = report_cache.get(ip_address, last_event_id)
+        if cached is not None:
+            log.debug("Serving cached report", ip=ip_address, last_event_id=last_event_id)
+            return _pdf_response(ip_address, cached, "hit")
+        
+        # Queue wait plus generation; render_report records the generator's own time
+        with span('report', 'generate'):
+            job = _submit_job(ip_address, last_event_id)
+            pdf_data = await report_jobs.wait(job)
+        return _pdf_response(ip_address, pdf_data, "miss")
+
+
+@router.post("/api/report/{ip_address}/jobs", status_code=202)
+async def submit_report_job(ip_address: str):
+    """
+    Queue an incident report for background generation.
+    
+    Returns at once with a job id; poll GET /api/report/jobs/{job_id} and
+    download from GET /api/report/jobs/{job_id}/result once status is "done".
+    A cached report yields a job that is already done.
+    """
+    last_event_id = await _last_event_id(ip_address)
+    job = _submit_job(ip_address, last_event_id, report_cache.get(ip_address, last_event_id))
+    return {
+        **job.to_dict(),
+        'statusUrl': f"/api/report/jobs/{job.id}",
+        'resultUrl': f"/api/report/jobs/{job.id}/result"
+    }
+
+
+@router.get("/api/report/jobs/{job_id}")
+async def get_report_job(job_id: str):
+    """Get a report job's status (queued, running, done or failed) and progress"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report job {job_id} not found or expired")
+    return job.to_dict()
+
+
+@router.get("/api/report/jobs/{job_id}/result")
+async def get_report_job_result(job_id: str):
+    """Download a finished report job's PDF"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report job {job_id} not found or expired")
+    if job.status == 'failed':
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {job.error}")
+    if job.status != 'done':
+        raise HTTPException(status_code=409, detail=f"Report job is {job.status} ({job.progress}%)")
+    return _pdf_response(job.ip_address, job.result, "job")
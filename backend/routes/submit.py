@@ -1,16 +1,30 @@
 """
 Enhanced submit endpoint that accepts and stores attacker session actions.
 """
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
-from backend.database import Database
-from backend.utils.hash import hash_event
+from backend.storage import get_database, get_async_database
+from backend.database import ActionSessionConflict, now_ms
+from backend.model import MLModel, apply_pattern_overrides
+from backend.deception import DeceptionEngine
+from backend.blockchain import MerkleTree, get_merkle_tree
+from backend.utils.hash import hash_event, EVENT_HASH_VERSION
+from backend.utils.action_codec import ActionColumns, UnsupportedActions
+from backend.metrics import span, count_detection
+from backend.logger import get_logger
+import asyncio
 import json
+import os
+import re
+import threading
+import time
 
 router = APIRouter()
-db = Database()
+log = get_logger('submit')
+db = get_database()
+adb = get_async_database()
 
 
 class Action(BaseModel):
@@ -24,6 +38,22 @@ class Action(BaseModel):
     value: Optional[str] = None  # form value at time of action
 
 
+class ActionColumnsPayload(BaseModel):
+    """
+    Session actions as parallel arrays: index i of every array is action i.
+
+    Validated as whole lists rather than one Action model per action; an
+    omitted column is null for every action.
+    """
+    type: List[str]
+    ts: List[float]
+    payload: Optional[List[Optional[str]]] = None
+    x: Optional[List[Optional[float]]] = None
+    y: Optional[List[Optional[float]]] = None
+    target: Optional[List[Optional[str]]] = None
+    value: Optional[List[Optional[str]]] = None
+
+
 class SubmitRequest(BaseModel):
     """Enhanced submit request with actions"""
     input: str
@@ -32,9 +62,67 @@ class SubmitRequest(BaseModel):
     ua: Optional[str] = None
     headers: Optional[Dict[str, Any]] = None
     actions: Optional[List[Action]] = None  # Session actions array
+    action_columns: Optional[ActionColumnsPayload] = None  # ...or the same actions column by column
+    session_id: Optional[str] = None  # ...or the live session whose chunks were already uploaded
     ip_address: Optional[str] = "127.0.0.1"
 
 
+def session_actions(actions: Optional[List[Action]], action_columns: Optional[ActionColumnsPayload]):
+    """A submission's actions as they are hashed and stored (list of dicts or ActionColumns)"""
+    if action_columns is None:
+        return [action.dict() for action in actions] if actions else []
+    if actions:
+        raise HTTPException(status_code=400, detail="Send either actions or action_columns, not both")
+    try:
+        # The validated lists are used as they are, without a dict per action
+        return ActionColumns(dict(action_columns))
+    except UnsupportedActions as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+# Live sessions: actions uploaded in chunks while the attacker is on the page
+ACTION_CHUNK_MAX = int(os.getenv("ACTION_CHUNK_MAX", 1000))
+ACTION_SESSION_MAX = int(os.getenv("ACTION_SESSION_MAX", 100000))
+_SESSION_ID = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+# Sessions idle this long are deleted with their chunks, submitted or not
+ACTION_SESSION_TTL = float(os.getenv("ACTION_SESSION_TTL", 86400))
+
+
+def start_session_expiry(db, interval=None):
+    """Run db.expire_action_sessions periodically on a daemon thread"""
+    if interval is None:
+        interval = float(os.getenv("ACTION_SESSION_EXPIRE_INTERVAL", 600))
+
+    def worker():
+        while True:
+            try:
+                expired = db.expire_action_sessions(now_ms() - int(ACTION_SESSION_TTL * 1000))
+                if expired:
+                    log.info("Expired idle action sessions", count=expired)
+            except Exception as e:
+                log.error("Session expiry failed", error=str(e))
+            time.sleep(interval)
+
+    thread = threading.Thread(target=worker, name="action-session-expiry", daemon=True)
+    thread.start()
+    return thread
+
+
+def check_session_id(session_id: str):
+    if not _SESSION_ID.match(session_id):
+        raise HTTPException(status_code=400, detail="session_id must be 8-64 letters, digits, '-' or '_'")
+
+
+async def take_session_actions(session_id: str):
+    """Close a live session to further chunks and return its uploaded actions as one ActionColumns"""
+    session = await adb.close_action_session(session_id)
+    if session['event_id'] is not None:
+        raise HTTPException(status_code=409, detail=f"Session already submitted as event {session['event_id']}")
+    return session, ActionColumns.concat(await adb.get_action_chunks(session_id))
+
+
 @router.post("/api/submit")
 async def submit_attack(request: Request, payload: SubmitRequest):
     """
@@ -42,21 +130,23 @@ async def submit_attack(request: Request, payload: SubmitRequest):
     
     Stores the event with computed hash and emits socket.io event.
     """
-    from backend.model import MLModel
-    from backend.deception import DeceptionEngine
-    from backend.blockchain import MerkleTree
-    
-    model = MLModel()
-    deception = DeceptionEngine()
-    merkle = MerkleTree()
+    with span('submit'):
+        return await _submit_attack(request, payload)
+
+
+async def _submit_attack(request: Request, payload: SubmitRequest):
+    if payload.session_id is not None:
+        if payload.actions or payload.action_columns is not None:
+            raise HTTPException(status_code=400, detail="Send either session_id or the actions themselves, not both")
+        check_session_id(payload.session_id)
+    with span('submit', 'setup'):
+        model = MLModel()
+        deception = DeceptionEngine()
+        merkle = MerkleTree()
     
     # 0. Check for Admin Credentials (Backdoor for Analyst) - MUST BE FIRST CHECK
     # The payload format is: "User ID: {userId}, Password: {password}"
     input_text = payload.input
-    print(f"\n[DEBUG] ========== ADMIN CHECK START ==========")
-    print(f"[DEBUG] Raw input text: '{input_text}'")
-    print(f"[DEBUG] Input text type: {type(input_text)}")
-    print(f"[DEBUG] Input text length: {len(input_text)}")
     
     # Normalize input for easier matching
     input_lower = input_text.lower().strip()
@@ -76,16 +166,13 @@ async def submit_attack(request: Request, payload: SubmitRequest):
     has_user_id_label = any(label in input_lower for label in ["user id:", "userid:", "user id", "username:", "email:"])
     has_password_label = any(label in input_lower for label in ["password:", "pass:", "pwd:"])
     
-    print(f"[DEBUG] Admin email found: {has_admin_email}")
-    print(f"[DEBUG] Admin password found: {has_admin_password}")
-    print(f"[DEBUG] User ID label found: {has_user_id_label}")
-    print(f"[DEBUG] Password label found: {has_password_label}")
+    log.debug("Admin check", input=input_text, length=len(input_text), email=has_admin_email,
+              password=has_admin_password, user_id_label=has_user_id_label, password_label=has_password_label)
     
     # Admin check: email AND password must be present
     # This is a simple check - if both are present, grant access
     if has_admin_email and has_admin_password:
-        print("[DEBUG] ✓✓✓ ADMIN CREDENTIALS DETECTED - GRANTING ACCESS ✓✓✓")
-        print("[DEBUG] Returning admin response with action: 'redirect'")
+        log.info("Admin credentials detected, granting access", action='redirect')
         admin_response = {
             "received": True,
             "id": None,
@@ -105,49 +192,30 @@ async def submit_attack(request: Request, payload: SubmitRequest):
             "confidence": 1.0,
             "merkle_root": merkle.get_root() if hasattr(merkle, 'get_root') else ""
         }
-        print(f"[DEBUG] Admin response: {admin_response}")
-        print(f"[DEBUG] ========== ADMIN CHECK END (RETURNING) ==========\n")
         return admin_response
-    else:
-        print("[DEBUG] ✗ Admin credentials NOT found")
-        print(f"[DEBUG] Email check: {has_admin_email}, Password check: {has_admin_password}")
-        print(f"[DEBUG] Continuing with attack detection...")
     
-    print(f"[DEBUG] ========== ADMIN CHECK END (CONTINUING) ==========\n")
+    # Session actions (a live session is only closed once the event will be stored)
+    session = None
+    with span('submit', 'actions'):
+        if payload.session_id is not None:
+            session, actions = await take_session_actions(payload.session_id)
+        else:
+            actions = session_actions(payload.actions, payload.action_columns)
     
     # Detect attack type
-    attack_type, confidence = model.predict(payload.input)
-    
-    # Fallback pattern detection - only override if model is uncertain AND patterns are clearly malicious
-    # Don't override if model confidently says Benign
-    input_lower = payload.input.lower()
-    sqli_patterns = ["' or", "or 1=1", "union select", "drop table", "'; --", "or '1'='1", "admin' --", "union all select"]
-    xss_patterns = ["<script", "javascript:", "onerror=", "onload=", "<img src", "<svg", "onclick=", "alert("]
-    
-    # Only apply pattern detection if:
-    # 1. Model says Benign but confidence is low (< 0.6), OR
-    # 2. Model prediction is uncertain (confidence < 0.7)
-    # This prevents normal inputs from being misclassified
-    if (attack_type == "Benign" and confidence < 0.6) or (confidence < 0.7 and attack_type != "Benign"):
-        # Check for clear SQLi patterns (more specific patterns)
-        if any(pattern in input_lower for pattern in sqli_patterns):
-            print(f"[DEBUG] Pattern-based detection: SQLi pattern found, overriding model")
-            attack_type = "SQLi"
-            confidence = 0.9
-        # Check for clear XSS patterns
-        elif any(pattern in input_lower for pattern in xss_patterns):
-            print(f"[DEBUG] Pattern-based detection: XSS pattern found, overriding model")
-            attack_type = "XSS"
-            confidence = 0.9
-        # If no clear patterns found and model says Benign, keep it as Benign
-        elif attack_type == "Benign":
-            print(f"[DEBUG] Keeping Benign classification for normal input")
-            attack_type = "Benign"
-            confidence = max(confidence, 0.7)  # Boost confidence for normal inputs
-    
-    # Get deception strategy
-    strategy_func = deception.decide_strategy(attack_type)
-    response = strategy_func()
+    with span('submit', 'predict'):
+        attack_type, confidence = model.predict(payload.input)
+    
+    # Fallback: pattern-based override when the model is uncertain
+    with span('submit', 'overrides'):
+        attack_type, confidence = apply_pattern_overrides(payload.input, attack_type, confidence)
+    count_detection('submit', attack_type)
+    log.debug("Detected", attack_type=attack_type, confidence=confidence)
+    
+    # Get deception strategy (includes the tarpit delay)
+    with span('submit', 'deception'):
+        strategy_func = deception.decide_strategy(attack_type)
+        response = strategy_func()
     
     # Create event object
     event = {
@@ -159,27 +227,34 @@ async def submit_attack(request: Request, payload: SubmitRequest):
         'timestamp': datetime.now(timezone.utc).isoformat(),
         'user_agent': payload.ua,
         'headers': payload.headers or {},
-        'actions': [action.dict() for action in (payload.actions or [])]  # Store actions
+        'actions': actions  # Store actions
     }
     
     # Compute event hash
-    event_hash = hash_event(event)
+    with span('submit', 'hash'):
+        event_hash = hash_event(event)
     event['hash'] = event_hash
     
-    # Store in database
-    log_id = db.log_attack(
+    # Store event and its actions in database (one transaction, group-committed
+    # with other requests when write-behind is enabled)
+    stored = (
         event['ip_address'],
         event['input_payload'],
         event['attack_type'],
         event['confidence'],
         event['deception_strategy'],
-        event_hash
+        event_hash,
+        event['actions']
     )
-    
-    # Store actions in database
-    if payload.actions:
-        actions_list = [action.dict() for action in payload.actions]
-        db.save_actions(log_id, actions_list)
+    with span('submit', 'store'):
+        if session is None:
+            log_id = await adb.queue_attack(*stored)
+        else:
+            # The session is linked in the insert's own transaction, so a retried submit cannot store it twice
+            try:
+                log_id = await adb.log_session_attack(session['session_id'], *stored)
+            except ActionSessionConflict as e:
+                raise HTTPException(status_code=409, detail=str(e))
     
     # Emit socket.io event (if socket.io is set up)
     # socketio.emit('attack_event', {
@@ -194,6 +269,7 @@ async def submit_attack(request: Request, payload: SubmitRequest):
         "received": True,
         "id": log_id,
         "hash": event_hash,
+        "hash_version": EVENT_HASH_VERSION,
         "response": {
             "status": 200,
             "message": "Attack processed",
@@ -207,14 +283,174 @@ async def submit_attack(request: Request, payload: SubmitRequest):
         },
         "attack_type": attack_type,
         "confidence": confidence,
-        "merkle_root": merkle.get_root() if hasattr(merkle, 'get_root') else event_hash
+        "merkle_root": merkle.get_root() if hasattr(merkle, 'get_root') else event_hash,
+        **({"session": {"session_id": session['session_id'], "chunks": session['chunks'], "actions": len(actions)}}
+           if session is not None else {})
     }
 
 
+class BatchEvent(BaseModel):
+    """Single event in a batch submission"""
+    input: str
+    ua: Optional[str] = None
+    headers: Optional[Dict[str, Any]] = None
+    actions: Optional[List[Action]] = None
+    action_columns: Optional[ActionColumnsPayload] = None
+    ip_address: Optional[str] = None
+
+
+class BatchSubmitRequest(BaseModel):
+    """Batch of events from an edge proxy or sensor agent"""
+    events: List[BatchEvent]
+
+
+# Upper bound on events per /api/submit/batch call
+MAX_BATCH_EVENTS = int(os.getenv("SUBMIT_BATCH_MAX_EVENTS", 5000))
+
+_batch_model = None
+_batch_deception = DeceptionEngine(tarpit=False)
+
+
+def _get_batch_model():
+    global _batch_model
+    if _batch_model is None:
+        _batch_model = MLModel()
+    return _batch_model
+
+
+def _prepare_batch(events: List[BatchEvent], client_host: str):
+    """Classify, pick strategies and hash a batch (CPU-bound, runs off the event loop)"""
+    texts = [event.input for event in events]
+    predictions = _get_batch_model().predict_batch(texts)
+    timestamp = datetime.now(timezone.utc).isoformat()
+    rows, results = [], []
+    for event, (attack_type, confidence) in zip(events, predictions):
+        attack_type, confidence = apply_pattern_overrides(event.input, attack_type, float(confidence), verbose=False)
+        response = _batch_deception.decide_strategy(attack_type)()
+        actions = session_actions(event.actions, event.action_columns)
+        record = {
+            'ip_address': event.ip_address or client_host,
+            'input_payload': event.input,
+            'attack_type': attack_type,
+            'confidence': confidence,
+            'deception_strategy': response['deception'],
+            'timestamp': timestamp,
+            'user_agent': event.ua,
+            'headers': event.headers or {},
+            'actions': actions
+        }
+        event_hash = hash_event(record)
+        rows.append((record['ip_address'], event.input, attack_type, confidence,
+                     response['deception'], event_hash, actions))
+        results.append({
+            'attack_type': attack_type,
+            'confidence': confidence,
+            'deception': response['deception'],
+            'hash': event_hash
+        })
+    return rows, results
+
+
+@router.post("/api/submit/batch")
+async def submit_batch(request: Request, payload: BatchSubmitRequest):
+    """
+    Accept many events in one call.
+
+    Events are classified with one vectorized model call, stored in a single
+    transaction and appended to the shared Merkle tree (the one /api/analyze
+    appends to) in one pass. Tarpit delays and the analyst-login check are
+    skipped: batches come from sensors, not from the attacker's browser.
+    """
+    if not payload.events:
+        return {"received": 0, "results": [], "merkle_root": get_merkle_tree().get_root()}
+    if len(payload.events) > MAX_BATCH_EVENTS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_EVENTS} events)")
+
+    loop = asyncio.get_running_loop()
+    client_host = request.client.host if request.client else "127.0.0.1"
+    with span('submit_batch', 'classify'):
+        rows, results = await loop.run_in_executor(None, _prepare_batch, payload.events, client_host)
+
+    with span('submit_batch', 'store'):
+        log_ids = await adb.log_attacks(rows)
+    with span('submit_batch', 'merkle'):
+        # One root rebuild for the whole batch, off the event loop
+        merkle_root = await loop.run_in_executor(None, get_merkle_tree().add_leaves,
+                                                 [result['hash'] for result in results])
+
+    for log_id, result in zip(log_ids, results):
+        result['id'] = log_id
+    return {
+        "received": len(results),
+        "results": results,
+        "hash_version": EVENT_HASH_VERSION,
+        "merkle_root": merkle_root
+    }
+
+
+class ActionChunk(BaseModel):
+    """One chunk of a live session's actions (in either form)"""
+    seq: int
+    actions: Optional[List[Action]] = None
+    action_columns: Optional[ActionColumnsPayload] = None
+
+
+@router.post("/api/sessions/{session_id}/actions")
+async def append_session_actions(session_id: str, chunk: ActionChunk):
+    """
+    Append chunk `seq` (0, 1, 2, ...) of a live session's actions.
+
+    Chunks are stored as they arrive, so a session the attacker abandons is
+    still captured; submitting with session_id attaches them to the event.
+    Resending a stored chunk is a no-op, and a chunk ahead of next_seq or one
+    sent after the submit is refused with 409, so the stream has no holes.
+    """
+    check_session_id(session_id)
+    if chunk.seq < 0:
+        raise HTTPException(status_code=400, detail="seq must be >= 0")
+    actions = session_actions(chunk.actions, chunk.action_columns)
+    if len(actions) > ACTION_CHUNK_MAX:
+        raise HTTPException(status_code=413, detail=f"Chunk too large (max {ACTION_CHUNK_MAX} actions)")
+    with span('session_actions', 'store'):
+        status, next_seq = await adb.append_action_chunk(session_id, chunk.seq, actions, ACTION_SESSION_MAX)
+    if status == 'gap':
+        raise HTTPException(status_code=409, detail={"message": f"Expected chunk {next_seq}", "next_seq": next_seq})
+    if status == 'closed':
+        raise HTTPException(status_code=409, detail={"message": "Session already submitted", "next_seq": next_seq})
+    if status == 'full':
+        raise HTTPException(status_code=413, detail=f"Session too large (max {ACTION_SESSION_MAX} actions)")
+    return {"session_id": session_id, "seq": chunk.seq, "stored": status == 'stored', "next_seq": next_seq}
+
+
+@router.get("/api/sessions/{session_id}")
+async def get_action_session(session_id: str):
+    """State of a live session: chunks and actions uploaded, and its event once submitted"""
+    check_session_id(session_id)
+    session = await adb.get_action_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+@router.get("/api/sessions/{session_id}/actions")
+async def get_session_actions(session_id: str):
+    """Actions of a live or abandoned session (those of its event once submitted)"""
+    check_session_id(session_id)
+    session = await adb.get_action_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session['event_id'] is not None:
+        actions = await adb.get_actions(session['event_id'])
+    else:
+        actions = ActionColumns.concat(await adb.get_action_chunks(session_id)).to_dicts()
+    return {"session_id": session_id, "event_id": session['event_id'], "actions": actions}
+
+
 @router.get("/api/events/{event_id}/actions")
-async def get_event_actions(event_id: int):
-    """Get actions for a specific event"""
-    actions = db.get_actions(event_id)
+async def get_event_actions(event_id: int, offset: int = 0, limit: Optional[int] = None):
+    """Get actions for a specific event (optionally a slice of them)"""
+    stop = offset + limit if limit is not None else None
+    actions = await adb.get_actions(event_id, offset, stop)
     
     return {
         "event_id": event_id,
@@ -225,14 +461,13 @@ async def get_event_actions(event_id: int):
 @router.get("/api/events/{event_id}")
 async def get_event(event_id: int):
     """Get full event with actions"""
-    logs = db.get_logs()
-    event = next((log for log in logs if log.get('id') == event_id), None)
+    event = await adb.get_log(event_id)
     
     if not event:
         return {"error": "Event not found"}
     
     # Get actions from database
-    actions = db.get_actions(event_id)
+    actions = await adb.get_actions(event_id)
     
     result = dict(event)
     result['actions'] = actions
@@ -0,0 +1,66 @@
+/**
+ * Long-lived PDF report worker
+ *
+ * Started by backend/services/report_pool.py, which keeps a few of these
+ * running so Node start-up and the chart libraries are paid for once, not per
+ * report.
+ *
+ * Line protocol: one JSON object per line on stdin, one reply per line on stdout
+ *   {"id": 1, "type": "render", "data": {ipAddress, events, merkleRoot, stats}}
+ *       -> {"id": 1, "ok": true, "pdf": "<base64>"}
+ *   {"id": 2, "type": "ping"}
+ *       -> {"id": 2, "ok": true}
+ *   failures -> {"id": N, "ok": false, "error": "..."}
+ *
+ * Prints {"ready": true} once the report libraries are loaded. Requests are
+ * handled one at a time; the pool never sends a worker more than one.
+ */
+
+// stdout carries protocol replies only, so library logging goes to stderr
+console.log = console.info = console.warn = console.error;
+
+const readline = require('readline');
+const { buildIncidentReport } = require('../services/reportGenerator');
+
+function send(message) {
+    process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+async function handle(line) {
+    let request;
+    try {
+        request = JSON.parse(line);
+    } catch (error) {
+        send({ id: null, ok: false, error: 'Invalid JSON request' });
+        return;
+    }
+
+    try {
+        if (request.type === 'ping') {
+            send({ id: request.id, ok: true });
+        } else if (request.type === 'render') {
+            const pdf = await buildIncidentReport(request.data);
+            send({ id: request.id, ok: true, pdf: Buffer.from(pdf).toString('base64') });
+        } else {
+            send({ id: request.id, ok: false, error: `Unknown request type: ${request.type}` });
+        }
+    } catch (error) {
+        send({ id: request.id, ok: false, error: (error && error.stack) || String(error) });
+    }
+}
+
+let pending = Promise.resolve();
+const input = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+
+input.on('line', line => {
+    if (line.trim()) {
+        pending = pending.then(() => handle(line));
+    }
+});
+
+// stdin closed: the pool is shutting us down
+input.on('close', () => {
+    pending.then(() => process.exit(0));
+});
+
+send({ ready: true });
@@ -0,0 +1,498 @@
+"""
+Append-only, memory-mapped event segment log for forensic retention.
+
+Every stored event is also appended here (see StorageBackend.log_attacks) when
+EVENT_SEGMENT_DIR is set. Records are never modified once written.
+
+Layout of EVENT_SEGMENT_DIR:
+
+    00000001.seg, 00000002.seg, ...   fixed-size segments (EVENT_SEGMENT_SIZE)
+    00000001.idx, 00000002.idx, ...   sparse index, one entry per
+                                      EVENT_SEGMENT_INDEX_INTERVAL records
+    LOCK                              serializes writers across processes
+
+A segment starts with a 16-byte header (magic "CHSEGLOG", version, size) and is
+preallocated to its full size, so the zero-filled space after the last record
+marks the end of data. Each record is
+
+    length u32 | crc32 u32 | id i64 | ts_ms i64 | payload (length bytes)
+
+and the payload is the confidence as float64 (NaN = null) followed by the
+fields merkle_hash, ip_address, attack_type, deception_strategy,
+input_payload and actions, each as u32 length + bytes (0xFFFFFFFF = null).
+Actions are stored with backend/utils/action_codec.py (JSON if the codec
+cannot represent them). All integers are little-endian.
+
+Index entries are (id i64, ts_ms i64, offset u32, sequence number u32), for
+the first record of each segment and every interval-th record overall. Ids
+and ts_ms never decrease, so a lookup bisects the index and walks at most one
+interval of records.
+
+Readers map each segment with mmap and walk record headers in place: scan()
+hands out memoryviews into the mapping, and field()/iter_field() decode single
+fields without building dicts.
+
+Usage:
+    python -m backend.segment_log [dir]    verify checksums and print a summary
+"""
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+from bisect import bisect_right
+from contextlib import contextmanager
+from backend.utils.action_codec import encode_actions, decode_actions, action_dicts, is_compact, UnsupportedActions
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer process only
+    fcntl = None
+
+MAGIC = b'CHSEGLOG'
+VERSION = 1
+SEGMENT_HEADER = struct.Struct('<8sII')   # magic, version, segment size
+RECORD_HEADER = struct.Struct('<IIqq')    # length, crc32, id, ts_ms
+INDEX_ENTRY = struct.Struct('<qqII')      # id, ts_ms, offset, sequence number in the log
+_U32 = struct.Struct('<I')
+_F64 = struct.Struct('<d')
+_NULL = 0xFFFFFFFF
+
+# Payload fields after the confidence, in storage order
+FIELDS = ('merkle_hash', 'ip_address', 'attack_type', 'deception_strategy', 'input_payload', 'actions')
+
+_SEGMENT_RE = re.compile(r'^(\d{8})\.seg$')
+
+
+def _encode_field(out, value):
+    if value is None:
+        out += _U32.pack(_NULL)
+        return
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    out += _U32.pack(len(value))
+    out += value
+
+
+def encode_payload(event):
+    """Payload bytes for an (ip, payload, attack_type, confidence, strategy, merkle_hash, actions) event"""
+    ip, payload, attack_type, confidence, strategy, merkle_hash, actions = event
+    out = bytearray(_F64.pack(math.nan if confidence is None else confidence))
+    for value in (merkle_hash, ip, attack_type, strategy, payload):
+        _encode_field(out, value)
+    if actions:
+        try:
+            actions = encode_actions(actions)
+        except UnsupportedActions:
+            actions = json.dumps(actions, default=action_dicts).encode('utf-8')
+    else:
+        actions = None
+    _encode_field(out, actions)
+    return bytes(out)
+
+
+def _field_view(view, index):
+    """memoryview of payload field FIELDS[index], or None if null"""
+    pos = 8
+    for _ in range(index):
+        length = _U32.unpack_from(view, pos)[0]
+        pos += 4 + (0 if length == _NULL else length)
+    length = _U32.unpack_from(view, pos)[0]
+    if length == _NULL:
+        return None
+    return view[pos + 4:pos + 4 + length]
+
+
+def field(view, name):
+    """Decode one field of a record payload"""
+    if name == 'confidence':
+        value = _F64.unpack_from(view, 0)[0]
+        return None if math.isnan(value) else value
+    raw = _field_view(view, FIELDS.index(name))
+    if raw is None:
+        return None
+    if name == 'actions':
+        return decode_actions(raw) if is_compact(raw) else json.loads(bytes(raw))
+    return str(raw, 'utf-8')
+
+
+def decode_record(event_id, ts_ms, view):
+    """Record -> log dict (same keys as Database.get_log, timestamp left unset)"""
+    values = {}
+    pos = 8
+    for name in FIELDS[:-1]:
+        length = _U32.unpack_from(view, pos)[0]
+        pos += 4
+        if length == _NULL:
+            values[name] = None
+        else:
+            values[name] = str(view[pos:pos + length], 'utf-8')
+            pos += length
+    return {
+        'id': event_id,
+        'timestamp': None,
+        'ip_address': values['ip_address'],
+        'input_payload': values['input_payload'],
+        'attack_type': values['attack_type'],
+        'confidence': field(view, 'confidence'),
+        'deception_strategy': values['deception_strategy'],
+        'merkle_hash': values['merkle_hash'],
+        'ts_ms': ts_ms,
+    }
+
+
+class SegmentLog:
+    def __init__(self, path, segment_size=None, index_interval=None, fsync=None):
+        """
+        Args:
+            path: Directory holding the segments (created if missing)
+            segment_size: Bytes per segment file (default EVENT_SEGMENT_SIZE or 64 MiB)
+            index_interval: Records per sparse index entry (default EVENT_SEGMENT_INDEX_INTERVAL or 64)
+            fsync: fsync after every append (default: EVENT_SEGMENT_FSYNC=1)
+        """
+        if segment_size is None:
+            segment_size = int(os.getenv("EVENT_SEGMENT_SIZE", 64 * 1024 * 1024))
+        if index_interval is None:
+            index_interval = int(os.getenv("EVENT_SEGMENT_INDEX_INTERVAL", 64))
+        if fsync is None:
+            fsync = os.getenv("EVENT_SEGMENT_FSYNC", "0") == "1"
+        self.path = path
+        self.segment_size = segment_size
+        self.index_interval = index_interval
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._maps = {}       # segment number -> mmap
+        self._index = []      # (id, ts_ms, segment, offset), sorted
+        self._index_keys = []  # ids of self._index, for bisect
+        self._index_ts = []    # ts_ms of self._index, for bisect
+        self.first_id = None
+        self.last_id = 0
+        self.last_ts = None
+        self.count = 0        # records in the log
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = open(os.path.join(path, "LOCK"), 'a+b')
+        self._load()
+
+    # Segment files
+
+    def _segment_path(self, number, suffix='.seg'):
+        return os.path.join(self.path, f"{number:08d}{suffix}")
+
+    def _create_segment(self, number):
+        tmp_path = self._segment_path(number) + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SEGMENT_HEADER.pack(MAGIC, VERSION, self.segment_size))
+            f.truncate(self.segment_size)
+        os.replace(tmp_path, self._segment_path(number))
+
+    def _map(self, number):
+        segment = self._maps.get(number)
+        if segment is None:
+            with open(self._segment_path(number), 'rb') as f:
+                segment = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _ = SEGMENT_HEADER.unpack_from(segment, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Not an event segment: {self._segment_path(number)}")
+            self._maps[number] = segment
+        return segment
+
+    def _load(self):
+        numbers = sorted(int(m.group(1)) for m in map(_SEGMENT_RE.match, os.listdir(self.path)) if m)
+        if not numbers:
+            with self._exclusive():
+                if not os.path.exists(self._segment_path(1)):
+                    self._create_segment(1)
+            numbers = [1]
+        self._segment, self._offset = numbers[0], SEGMENT_HEADER.size
+        for number in numbers:
+            for event_id, ts_ms, offset, sequence in self._read_index(number):
+                self._add_index(event_id, ts_ms, number, offset)
+                if self.first_id is None:
+                    self.first_id = event_id
+                # Resume the tail at the last indexed record instead of rescanning
+                self._segment, self._offset, self.count = number, offset, sequence
+                self.last_id, self.last_ts = event_id - 1, ts_ms
+        self._refresh()
+
+    def _read_index(self, number):
+        path = self._segment_path(number, '.idx')
+        if not os.path.exists(path):
+            return []
+        with open(path, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        return list(INDEX_ENTRY.iter_unpack(data[:usable]))
+
+    def _add_index(self, event_id, ts_ms, number, offset):
+        if self._index_keys and event_id <= self._index_keys[-1]:
+            return
+        self._index.append((event_id, ts_ms, number, offset))
+        self._index_keys.append(event_id)
+        self._index_ts.append(ts_ms)
+
+    def _indexed(self, sequence, offset):
+        """Whether the record with this sequence number gets an index entry"""
+        return sequence % self.index_interval == 0 or offset == SEGMENT_HEADER.size
+
+    # Tail tracking
+
+    def _refresh(self):
+        """Advance the tail past records appended since the last call (by any process)"""
+        while True:
+            segment = self._map(self._segment)
+            if self._offset + RECORD_HEADER.size <= len(segment):
+                length, crc, event_id, ts_ms = RECORD_HEADER.unpack_from(segment, self._offset)
+                end = self._offset + RECORD_HEADER.size + length
+                if (length and end <= len(segment) and event_id > self.last_id
+                        and zlib.crc32(segment[self._offset + RECORD_HEADER.size:end]) == crc):
+                    if self._indexed(self.count, self._offset):
+                        self._add_index(event_id, ts_ms, self._segment, self._offset)
+                    if self.first_id is None:
+                        self.first_id = event_id
+                    self.last_id, self.last_ts = event_id, ts_ms
+                    self._offset = end
+                    self.count += 1
+                    continue
+            # Zero-filled (or torn) space: the writer moved on if a newer segment exists
+            if not os.path.exists(self._segment_path(self._segment + 1)):
+                break
+            self._segment += 1
+            self._offset = SEGMENT_HEADER.size
+
+    def _walk(self, number, offset):
+        """Yield (segment, offset, id, ts_ms, length) for records from a position up to the tail"""
+        while True:
+            segment = self._map(number)
+            limit = self._offset if number == self._segment else len(segment)
+            while offset + RECORD_HEADER.size <= limit:
+                length, _, event_id, ts_ms = RECORD_HEADER.unpack_from(segment, offset)
+                if not length or offset + RECORD_HEADER.size + length > limit:
+                    break
+                yield number, offset, event_id, ts_ms, length
+                offset += RECORD_HEADER.size + length
+            if number >= self._segment:
+                return
+            number += 1
+            offset = SEGMENT_HEADER.size
+
+    # Writing
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the writer lock (thread and, where fcntl exists, process)"""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def append(self, ids, ts_ms, events):
+        """
+        Append events stored by the primary store.
+
+        Args:
+            ids: Their ids (increasing, and above every id already in the log)
+            ts_ms: Event time, UTC epoch milliseconds (raised to the last
+                record's time if the clock stepped back)
+            events: (ip, payload, attack_type, confidence, strategy, merkle_hash, actions) tuples
+        """
+        payloads = [encode_payload(event) for event in events]
+        with self._exclusive():
+            self._refresh()
+            if ids and ids[0] <= self.last_id:
+                raise ValueError(f"Event id {ids[0]} is not above the last logged id {self.last_id}")
+            ts_ms = max(ts_ms, self.last_ts or ts_ms)
+            records, index_entries = [], []  # (segment, offset, bytes)
+            number, offset, sequence = self._segment, self._offset, self.count
+            for event_id, payload in zip(ids, payloads):
+                record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload), event_id, ts_ms) + payload
+                if SEGMENT_HEADER.size + len(record) > self.segment_size:
+                    raise ValueError(f"Event {event_id} does not fit in a {self.segment_size}-byte segment")
+                if offset + len(record) > self.segment_size:
+                    # End-of-data marker, so leftovers of a torn write are never read
+                    records.append((number, offset, bytes(min(4, self.segment_size - offset))))
+                    number, offset = number + 1, SEGMENT_HEADER.size
+                    self._create_segment(number)
+                if self._indexed(sequence, offset):
+                    index_entries.append((number, None, INDEX_ENTRY.pack(event_id, ts_ms, offset, sequence)))
+                records.append((number, offset, record))
+                offset += len(record)
+                sequence += 1
+            # Records first: an index entry never points past the written data
+            writes = records + index_entries
+            self._write(writes)
+            self._refresh()
+
+    def _write(self, writes):
+        files = {}
+        try:
+            for number, offset, data in writes:
+                key = (number, offset is None)
+                fd = files.get(key)
+                if fd is None:
+                    if offset is None:
+                        fd = os.open(self._segment_path(number, '.idx'), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                    else:
+                        fd = os.open(self._segment_path(number), os.O_WRONLY)
+                    files[key] = fd
+                if offset is not None:
+                    os.lseek(fd, offset, os.SEEK_SET)
+                os.write(fd, data)
+            if self.fsync:
+                for fd in files.values():
+                    os.fsync(fd)
+        finally:
+            for fd in files.values():
+                os.close(fd)
+
+    # Reading
+
+    def _start(self, start_id=None, since_ms=None):
+        """(segment, offset) of the indexed record at or before the requested position"""
+        if not self._index:
+            return self._segment, SEGMENT_HEADER.size
+        if start_id is not None:
+            position = bisect_right(self._index_keys, start_id) - 1
+        elif since_ms is not None:
+            position = bisect_right(self._index_ts, since_ms) - 1
+            # Equal timestamps can start before the entry that bisect found
+            while position > 0 and self._index[position][1] >= since_ms:
+                position -= 1
+        else:
+            position = 0
+        _, _, number, offset = self._index[max(position, 0)]
+        return number, offset
+
+    def scan(self, start_id=None, stop_id=None, since_ms=None, until_ms=None):
+        """
+        Yield (id, ts_ms, payload memoryview) in id order, without copying.
+
+        Args:
+            start_id / stop_id: Only ids in [start_id, stop_id)
+            since_ms / until_ms: Only events in [since_ms, until_ms)
+
+        The memoryviews point into the segment mappings; decode what you need
+        with field() or decode_record() before the log is closed.
+        """
+        with self._lock:
+            self._refresh()
+            number, offset = self._start(start_id, since_ms)
+            stop_segment, stop_offset = self._segment, self._offset
+        for number, offset, event_id, ts_ms, length in self._walk(number, offset):
+            if (number, offset) >= (stop_segment, stop_offset):
+                return
+            if stop_id is not None and event_id >= stop_id:
+                return
+            if until_ms is not None and ts_ms >= until_ms:
+                return
+            if start_id is not None and event_id < start_id:
+                continue
+            if since_ms is not None and ts_ms < since_ms:
+                continue
+            start = offset + RECORD_HEADER.size
+            yield event_id, ts_ms, memoryview(self._maps[number])[start:start + length]
+
+    def iter_field(self, name, **range_kwargs):
+        """Yield one decoded field per record (e.g. every merkle_hash), in id order"""
+        for _, _, view in self.scan(**range_kwargs):
+            yield field(view, name)
+
+    def find(self, ip_address=None, **range_kwargs):
+        """
+        Yield log dicts in id order, optionally only for one IP.
+
+        The IP is compared on the raw bytes, so only matching records are decoded.
+        """
+        wanted = ip_address.encode('utf-8') if ip_address is not None else None
+        ip_index = FIELDS.index('ip_address')
+        for event_id, ts_ms, view in self.scan(**range_kwargs):
+            if wanted is not None and _field_view(view, ip_index) != wanted:
+                continue
+            yield decode_record(event_id, ts_ms, view)
+
+    def get(self, event_id):
+        """Log dict for one id, or None"""
+        for found_id, ts_ms, view in self.scan(start_id=event_id, stop_id=event_id + 1):
+            return decode_record(found_id, ts_ms, view)
+        return None
+
+    def get_actions(self, event_id):
+        for _, _, view in self.scan(start_id=event_id, stop_id=event_id + 1):
+            return field(view, 'actions') or []
+        return []
+
+    def verify(self):
+        """
+        Check every record's checksum and id order.
+
+        Returns:
+            Dict with segments, records, first_id, last_id and a list of errors
+        """
+        errors = []
+        records = 0
+        previous_id = 0
+        with self._lock:
+            self._refresh()
+            numbers = sorted(int(m.group(1)) for m in map(_SEGMENT_RE.match, os.listdir(self.path)) if m)
+            for number, offset, event_id, _, length in self._walk(numbers[0], SEGMENT_HEADER.size):
+                segment = self._maps[number]
+                crc = RECORD_HEADER.unpack_from(segment, offset)[1]
+                start = offset + RECORD_HEADER.size
+                if zlib.crc32(segment[start:start + length]) != crc:
+                    errors.append(f"{number:08d}.seg@{offset}: checksum mismatch (id {event_id})")
+                if event_id <= previous_id:
+                    errors.append(f"{number:08d}.seg@{offset}: id {event_id} after {previous_id}")
+                previous_id = event_id
+                records += 1
+        return {
+            'segments': len(numbers),
+            'records': records,
+            'first_id': self.first_id,
+            'last_id': self.last_id,
+            'errors': errors,
+        }
+
+    def close(self):
+        with self._lock:
+            for segment in self._maps.values():
+                segment.close()
+            self._maps.clear()
+            self._lock_file.close()
+
+
+_event_logs = {}
+_event_logs_lock = threading.Lock()
+
+
+def get_event_log(path=None):
+    """
+    Shared SegmentLog for a directory (default EVENT_SEGMENT_DIR).
+
+    Returns None when no directory is configured.
+    """
+    if path is None:
+        path = os.getenv("EVENT_SEGMENT_DIR")
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    with _event_logs_lock:
+        if path not in _event_logs:
+            _event_logs[path] = SegmentLog(path)
+        return _event_logs[path]
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.getenv("EVENT_SEGMENT_DIR", "segments")
+    report = SegmentLog(directory).verify()
+    print(f"[SEGMENT] {report['records']} records in {report['segments']} segments "
+          f"(ids {report['first_id']}..{report['last_id']})")
+    for error in report['errors']:
+        print(f"[SEGMENT] {error}")
+    sys.exit(1 if report['errors'] else 0)
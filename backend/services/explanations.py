@@ -0,0 +1,165 @@
+"""
+Rule-based attack explanations, precomputed at ingest and cached.
+
+The explanation of a stored event only changes when the rules do, so it is
+computed once and kept:
+
+- After ingest, new events are explained on a background thread and saved
+  next to them in batches (StorageBackend.save_explanations), tagged with
+  fallbackRules.RULES_VERSION. Set EXPLAIN_PRECOMPUTE=0 to skip this.
+- Reads go through an in-process LRU of EXPLAIN_CACHE_SIZE explanations,
+  then the stored explanation, and only then evaluate the rules (saving the
+  result for next time).
+
+A stored explanation from another rules version counts as missing, so bumping
+RULES_VERSION invalidates them lazily, one read at a time.
+"""
+import os
+import queue
+import threading
+from collections import OrderedDict
+from backend.services.fallbackRules import explain_attack, RULES_VERSION
+from backend.logger import get_logger
+
+log = get_logger('explain')
+
+# Ingest batches drained into one background save
+PRECOMPUTE_BATCH = 500
+
+
+class ExplanationService:
+    def __init__(self, db, cache_size=None, precompute=None):
+        """
+        Args:
+            db: Storage backend holding the events
+            cache_size: Explanations kept in memory (default EXPLAIN_CACHE_SIZE or 10000)
+            precompute: Explain new events in the background (default EXPLAIN_PRECOMPUTE=1)
+        """
+        if cache_size is None:
+            cache_size = int(os.getenv("EXPLAIN_CACHE_SIZE", 10000))
+        if precompute is None:
+            precompute = os.getenv("EXPLAIN_PRECOMPUTE", "1") == "1"
+        self.db = db
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # event_id -> explanation
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stats = {'cache_hits': 0, 'stored_hits': 0, 'computed': 0, 'precomputed': 0, 'stale': 0}
+        if precompute:
+            db.add_ingest_listener(self._on_ingest)
+
+    def get(self, event_id):
+        """Explanation of a stored event, or None if the event does not exist"""
+        return self.get_many([event_id]).get(event_id)
+
+    def get_many(self, event_ids):
+        """
+        Explanations for stored events (missing events are left out).
+
+        Events without a current explanation are fetched in one
+        get_logs_by_ids call.
+
+        Returns:
+            {event_id: explanation}
+        """
+        found, missing = self._lookup(event_ids)
+        if missing:
+            found.update(self._compute(self.db.get_logs_by_ids(missing)))
+        return found
+
+    def explain_logs(self, logs):
+        """Like get_many, for logs the caller already fetched (e.g. by IP or time range)"""
+        found, missing = self._lookup([log['id'] for log in logs])
+        if missing:
+            missing = set(missing)
+            found.update(self._compute([log for log in logs if log['id'] in missing]))
+        return found
+
+    def _lookup(self, event_ids):
+        """Cached or stored current explanations, and the ids that have neither"""
+        found = {}
+        missing = []
+        with self._lock:
+            for event_id in event_ids:
+                explanation = self._cache.get(event_id)
+                if explanation is None:
+                    missing.append(event_id)
+                else:
+                    self._cache.move_to_end(event_id)
+                    found[event_id] = explanation
+            self._stats['cache_hits'] += len(found)
+        if not missing:
+            return found, missing
+
+        stored = {}
+        stale = 0
+        for event_id, (version, explanation) in self.db.get_explanations(missing).items():
+            if version == RULES_VERSION:
+                stored[event_id] = explanation
+            else:
+                stale += 1
+        self._remember(stored.items(), stored_hits=len(stored), stale=stale)
+        found.update(stored)
+        return found, [event_id for event_id in missing if event_id not in stored]
+
+    def _compute(self, logs):
+        """Run the rules over logs in one pass and store the results"""
+        computed = {log['id']: explain_attack(log) for log in logs}
+        if computed:
+            self.db.save_explanations([(event_id, RULES_VERSION, explanation)
+                                       for event_id, explanation in computed.items()])
+            self._remember(computed.items(), computed=len(computed))
+        return computed
+
+    def _remember(self, items, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                self._stats[name] += count
+            for event_id, explanation in items:
+                self._cache[event_id] = explanation
+                self._cache.move_to_end(event_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _on_ingest(self, ids, events):
+        """Ingest listener: hand the batch to the background thread"""
+        self._queue.put((ids, events))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="explain-precompute", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batches = [self._queue.get()]
+            while len(batches) < PRECOMPUTE_BATCH:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            items = []
+            for ids, events in batches:
+                for event_id, event in zip(ids, events):
+                    explanation = explain_attack({'input_payload': event[1], 'attack_type': event[2],
+                                                  'confidence': event[3]})
+                    items.append((event_id, RULES_VERSION, explanation))
+            try:
+                self.db.save_explanations(items)
+                with self._lock:
+                    self._stats['precomputed'] += len(items)
+            except Exception as e:
+                # Not fatal: these are computed on first read instead
+                log.warning("Failed to save precomputed explanations", count=len(items), error=str(e))
+            for _ in batches:
+                self._queue.task_done()
+
+    def join(self):
+        """Wait until every queued event has been explained"""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'cached': len(self._cache), 'pending': self._queue.qsize(),
+                    'rules_version': RULES_VERSION}
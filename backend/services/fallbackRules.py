@@ -2,6 +2,10 @@
 Fallback Rules for AI Assistant (Python version)
 """
 
+# Bump whenever the rules below change: stored explanations from an older
+# version are recomputed on their next read (see services/explanations.py)
+RULES_VERSION = 1
+
 def explain_attack(event):
     """
     Explain attack using pattern-based rules.
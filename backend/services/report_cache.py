@@ -0,0 +1,62 @@
+"""
+In-process cache of generated incident-report PDFs.
+
+Each IP has at most one entry, tagged with the highest event id the PDF
+covers (StorageBackend.get_ip_last_event_id). A lookup only hits when that id
+is unchanged, so a new event for an IP invalidates that IP's report and no
+other. Least recently used entries are evicted beyond REPORT_CACHE_MAX_BYTES.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+
+class ReportCache:
+    def __init__(self, max_bytes=None):
+        """
+        Args:
+            max_bytes: Total PDF bytes kept (default REPORT_CACHE_MAX_BYTES or 64 MiB; 0 disables)
+        """
+        if max_bytes is None:
+            max_bytes = int(os.getenv("REPORT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # ip -> (last_event_id, pdf bytes or SpooledPDF)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, ip_address, last_event_id):
+        """Cached PDF for the IP if it covers exactly up to last_event_id, else None"""
+        with self._lock:
+            entry = self._entries.get(ip_address)
+            if entry is None or entry[0] != last_event_id:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(ip_address)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def put(self, ip_address, last_event_id, pdf):
+        """Store the PDF generated for an IP, replacing its previous version"""
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(ip_address)
+            self._entries[ip_address] = (last_event_id, pdf)
+            self._size += len(pdf)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, ip_address):
+        with self._lock:
+            self._remove(ip_address)
+
+    def _remove(self, ip_address):
+        entry = self._entries.pop(ip_address, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries), 'bytes': self._size}
@@ -0,0 +1,206 @@
+"""
+Background queue for incident-report generation.
+
+Reports are submitted as jobs and rendered by REPORT_JOB_WORKERS worker tasks,
+so however many reports are requested at once only that many are generated
+concurrently and the rest wait their turn instead of competing with
+/api/analyze for CPU and database threads. Clients poll a job's status
+(queued/running/done/failed with a progress percentage) and fetch the PDF
+once it is done. Finished jobs and their PDFs are dropped REPORT_JOB_TTL
+seconds after completion.
+
+Jobs for the same IP and event high-water mark (see ReportCache) are shared:
+submitting while an identical job is still queued, running or retained
+returns that job.
+"""
+import asyncio
+import os
+import time
+import uuid
+
+
+class ReportQueueFull(Exception):
+    """Too many report jobs are waiting."""
+
+
+class ReportJob:
+    def __init__(self, ip_address, last_event_id):
+        self.id = uuid.uuid4().hex
+        self.ip_address = ip_address
+        self.last_event_id = last_event_id
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.progress = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.exception = None
+        self.done = asyncio.Event()
+
+    def update(self, progress, stage):
+        """Record progress; safe to call from the thread rendering the report"""
+        self.progress = progress
+        self.stage = stage
+
+    @property
+    def error(self):
+        if self.exception is None:
+            return None
+        return getattr(self.exception, 'detail', None) or str(self.exception)
+
+    def to_dict(self):
+        return {
+            'jobId': self.id,
+            'ip': self.ip_address,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+            'size': len(self.result) if self.result is not None else None,
+            'error': self.error,
+        }
+
+
+class ReportJobQueue:
+    def __init__(self, render, workers=None, ttl=None, max_pending=None):
+        """
+        Args:
+            render: Coroutine function taking a ReportJob and returning the PDF (bytes or SpooledPDF)
+            workers: Reports generated concurrently (default REPORT_JOB_WORKERS or 1)
+            ttl: Seconds finished jobs are kept (default REPORT_JOB_TTL or 600)
+            max_pending: Queued jobs accepted before submit refuses (default REPORT_JOB_MAX_PENDING or 100)
+        """
+        self.render = render
+        self.workers = workers if workers is not None else int(os.getenv("REPORT_JOB_WORKERS", 1))
+        self.ttl = ttl if ttl is not None else float(os.getenv("REPORT_JOB_TTL", 600))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("REPORT_JOB_MAX_PENDING", 100))
+        self._jobs = {}  # job id -> ReportJob
+        self._by_key = {}  # (ip, last_event_id) -> job id
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+        self._stats = {'submitted': 0, 'deduplicated': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'expired': 0}
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # Tasks and events belong to the loop that created them
+        for task in self._tasks:
+            task.cancel()
+        self._jobs.clear()
+        self._by_key.clear()
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._sweeper()))
+
+    def submit(self, ip_address, last_event_id, result=None):
+        """
+        Queue a report for an IP (or return the identical job already known).
+
+        Args:
+            result: Already available PDF (e.g. from ReportCache); the job is
+                recorded as done without queueing
+
+        Raises:
+            ReportQueueFull: If max_pending jobs are already waiting
+        """
+        self._ensure_started()
+        self.cleanup()
+        job_id = self._by_key.get((ip_address, last_event_id))
+        if job_id is not None and self._jobs[job_id].status != 'failed':
+            self._stats['deduplicated'] += 1
+            return self._jobs[job_id]
+        if result is not None:
+            job = ReportJob(ip_address, last_event_id)
+            job.result = result
+            job.status = 'done'
+            job.update(100, 'done')
+            job.started_at = job.finished_at = job.created_at
+            job.done.set()
+            self._jobs[job.id] = job
+            self._by_key[(ip_address, last_event_id)] = job.id
+            return job
+        if self._queue.qsize() >= self.max_pending:
+            self._stats['rejected'] += 1
+            raise ReportQueueFull(f"{self._queue.qsize()} report jobs already queued")
+
+        job = ReportJob(ip_address, last_event_id)
+        self._jobs[job.id] = job
+        self._by_key[(ip_address, last_event_id)] = job.id
+        self._queue.put_nowait(job)
+        self._stats['submitted'] += 1
+        return job
+
+    def get(self, job_id):
+        """Job by id, or None if unknown or expired"""
+        self.cleanup()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job):
+        """
+        Wait for a job to finish.
+
+        Returns:
+            The PDF (bytes or SpooledPDF)
+
+        Raises:
+            The exception the job failed with
+        """
+        await job.done.wait()
+        if job.exception is not None:
+            raise job.exception
+        return job.result
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = 'running'
+            job.started_at = time.time()
+            job.update(5, 'starting')
+            try:
+                job.result = await self.render(job)
+                job.status = 'done'
+                job.update(100, 'done')
+                self._stats['completed'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[REPORT JOBS] Job {job.id} for {job.ip_address} failed: {e}")
+                job.exception = e
+                job.status = 'failed'
+                job.stage = 'failed'
+                self._stats['failed'] += 1
+            finally:
+                job.finished_at = time.time()
+                job.done.set()
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(max(1.0, min(self.ttl, 60.0)))
+            self.cleanup()
+
+    def cleanup(self):
+        """Drop jobs (and their PDFs) finished more than ttl seconds ago"""
+        cutoff = time.time() - self.ttl
+        expired = [job for job in self._jobs.values() if job.finished_at is not None and job.finished_at < cutoff]
+        for job in expired:
+            del self._jobs[job.id]
+            if self._by_key.get((job.ip_address, job.last_event_id)) == job.id:
+                del self._by_key[(job.ip_address, job.last_event_id)]
+        self._stats['expired'] += len(expired)
+
+    def stats(self):
+        statuses = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+        for job in self._jobs.values():
+            statuses[job.status] += 1
+        return {
+            **self._stats,
+            **statuses,
+            'workers': self.workers,
+            'result_bytes': sum(len(job.result) for job in self._jobs.values() if job.result is not None),
+        }
@@ -0,0 +1,278 @@
+"""
+Pool of long-lived Node report workers (backend/scripts/reportWorker.js).
+
+Replaces spawning `node generateReport.js` per report: REPORT_WORKERS
+processes are started on first use and reused, each handling one report at a
+time, so at most that many reports render concurrently and further requests
+wait for a free worker.
+
+Workers that crash, time out or answer garbage are killed and restarted, idle
+workers are pinged every REPORT_WORKER_HEALTH_INTERVAL seconds, and every
+worker is recycled after REPORT_WORKER_MAX_JOBS reports. If workers cannot be
+started at all (no node binary, missing npm packages) the pool reports itself
+unavailable for a minute so callers fall back without paying a failed spawn
+per request.
+"""
+import asyncio
+import base64
+import json
+import os
+import shutil
+import time
+from backend.logger import get_logger
+
+log = get_logger('report_pool')
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'reportWorker.js')
+
+# Longest reply line accepted from a worker (base64 PDF)
+MAX_REPLY_BYTES = 256 * 1024 * 1024
+
+# Seconds to stop offering the pool after workers failed to start
+START_FAILURE_BACKOFF = 60
+
+
+class ReportWorkerError(Exception):
+    """A report could not be rendered by the worker pool."""
+
+
+class _Slot:
+    """One pool position; its process is replaced whenever it fails"""
+
+    def __init__(self, number):
+        self.number = number
+        self.process = None
+        self.jobs = 0
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+
+class NodeReportPool:
+    def __init__(self, size=None, timeout=None, max_jobs=None, health_interval=None, script=WORKER_SCRIPT, node=None):
+        """
+        Args:
+            size: Worker processes (default REPORT_WORKERS or 2)
+            timeout: Seconds allowed per report (default REPORT_WORKER_TIMEOUT or 30)
+            max_jobs: Reports before a worker is recycled (default REPORT_WORKER_MAX_JOBS or 200)
+            health_interval: Seconds between pings of idle workers (default REPORT_WORKER_HEALTH_INTERVAL or 30)
+            script: Worker script path
+            node: Node binary (default: `node` on PATH)
+        """
+        self.size = size if size is not None else int(os.getenv("REPORT_WORKERS", 2))
+        self.timeout = timeout if timeout is not None else float(os.getenv("REPORT_WORKER_TIMEOUT", 30))
+        self.max_jobs = max_jobs if max_jobs is not None else int(os.getenv("REPORT_WORKER_MAX_JOBS", 200))
+        self.health_interval = health_interval if health_interval is not None else float(
+            os.getenv("REPORT_WORKER_HEALTH_INTERVAL", 30))
+        self.script = script
+        self.node = node or shutil.which("node")
+        self._loop = None
+        self._slots = []
+        self._idle = None
+        self._health_task = None
+        # Background restarts of recycled workers (referenced until done)
+        self._recycling = set()
+        self._start_lock = None
+        self._next_id = 0
+        self._disabled_until = 0.0
+        self._stats = {'started': 0, 'restarts': 0, 'reports': 0, 'failures': 0, 'timeouts': 0}
+
+    @property
+    def available(self):
+        """False without node/the worker script, or shortly after workers failed to start"""
+        return bool(self.node) and os.path.exists(self.script) and time.monotonic() >= self._disabled_until
+
+    async def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Subprocess pipes belong to the loop that created them
+            self._abandon()
+            self._loop = loop
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            slots = [_Slot(number) for number in range(self.size)]
+            try:
+                await asyncio.gather(*(self._spawn(slot) for slot in slots))
+            except Exception:
+                for slot in slots:
+                    self._kill(slot)
+                self._disabled_until = time.monotonic() + START_FAILURE_BACKOFF
+                raise
+            self._slots = slots
+            self._idle = asyncio.Queue()
+            for slot in slots:
+                self._idle.put_nowait(slot)
+            if self.health_interval > 0:
+                self._health_task = loop.create_task(self._health_loop())
+            log.info("Started report workers", workers=self.size)
+
+    async def _spawn(self, slot):
+        """Start a worker in the slot and wait for its ready line"""
+        slot.process = await asyncio.create_subprocess_exec(
+            self.node, self.script,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=MAX_REPLY_BYTES,
+        )
+        slot.jobs = 0
+        try:
+            line = await asyncio.wait_for(slot.process.stdout.readline(), self.timeout)
+            if json.loads(line or b'{}').get('ready') is not True:
+                raise ReportWorkerError("Report worker did not start (see its stderr above)")
+        except Exception:
+            self._kill(slot)
+            raise
+        self._stats['started'] += 1
+
+    async def _restart(self, slot, reason):
+        log.info("Restarting worker", worker=slot.number, reason=reason)
+        self._kill(slot)
+        self._stats['restarts'] += 1
+        await self._spawn(slot)
+
+    async def _try_restart(self, slot, reason):
+        """_restart that reports a failure instead of raising; the slot's next user retries"""
+        try:
+            await self._restart(slot, reason)
+        except Exception as e:
+            log.error("Worker could not be restarted", worker=slot.number, error=str(e))
+
+    async def _recycle(self, slot):
+        try:
+            await self._try_restart(slot, f"recycling after {slot.jobs} reports")
+        finally:
+            # Unless the pool was closed or moved to another loop meanwhile
+            if self._idle is not None and slot in self._slots:
+                self._idle.put_nowait(slot)
+
+    def _kill(self, slot):
+        if slot.alive:
+            slot.process.kill()
+        slot.process = None
+
+    async def _request(self, slot, message):
+        self._next_id += 1
+        message = {'id': self._next_id, **message}
+        slot.process.stdin.write(json.dumps(message, default=str).encode('utf-8') + b"\n")
+        await slot.process.stdin.drain()
+        line = await slot.process.stdout.readline()
+        if not line:
+            raise ReportWorkerError("Report worker exited")
+        reply = json.loads(line)
+        if reply.get('id') != message['id']:
+            raise ReportWorkerError("Report worker replied out of order")
+        return reply
+
+    async def render(self, data):
+        """
+        Render an incident report.
+
+        Args:
+            data: {ipAddress, events, merkleRoot, stats} as expected by buildIncidentReport
+
+        Returns:
+            PDF bytes
+
+        Raises:
+            ReportWorkerError: If no worker could render it in time
+        """
+        await self._ensure_started()
+        slot = await self._idle.get()
+        try:
+            if not slot.alive:
+                await self._restart(slot, "process not running")
+            try:
+                reply = await asyncio.wait_for(self._request(slot, {'type': 'render', 'data': data}), self.timeout)
+            except asyncio.TimeoutError:
+                self._stats['timeouts'] += 1
+                self._kill(slot)
+                raise ReportWorkerError(f"Report worker timed out after {self.timeout:.0f}s")
+            except (OSError, ValueError, ReportWorkerError) as e:
+                self._stats['failures'] += 1
+                self._kill(slot)
+                raise ReportWorkerError(f"Report worker failed: {e}")
+            if not reply.get('ok'):
+                self._stats['failures'] += 1
+                raise ReportWorkerError(reply.get('error') or "Report worker error")
+            self._stats['reports'] += 1
+            slot.jobs += 1
+            pdf = base64.b64decode(reply['pdf'])
+            if slot.jobs >= self.max_jobs:
+                # The report is done; the slot rejoins the pool once its worker is replaced
+                task = asyncio.get_running_loop().create_task(self._recycle(slot))
+                self._recycling.add(task)
+                task.add_done_callback(self._recycling.discard)
+                slot = None
+            return pdf
+        finally:
+            # Dead slots go back too; the next user restarts them
+            if slot is not None:
+                self._idle.put_nowait(slot)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            # Only idle workers; busy ones prove themselves by answering
+            for _ in range(self._idle.qsize()):
+                slot = self._idle.get_nowait()
+                try:
+                    await self._check(slot)
+                finally:
+                    self._idle.put_nowait(slot)
+
+    async def _check(self, slot):
+        # Restart failures are reported, never raised: they would end the health loop
+        try:
+            if not slot.alive:
+                await self._try_restart(slot, "process exited")
+                return
+            reply = await asyncio.wait_for(self._request(slot, {'type': 'ping'}), 5)
+            if not reply.get('ok'):
+                await self._try_restart(slot, "ping failed")
+        except asyncio.TimeoutError:
+            await self._try_restart(slot, "ping timed out")
+        except Exception as e:
+            await self._try_restart(slot, f"health check failed: {e}")
+
+    def _abandon(self):
+        """Forget workers started on another event loop"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for task in self._recycling:
+            task.cancel()
+        for slot in self._slots:
+            self._kill(slot)
+        self._slots = []
+        self._idle = None
+
+    async def close(self):
+        """Stop the workers (they exit once stdin closes)"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        # A recycle still spawning would otherwise leave a worker behind
+        for task in self._recycling:
+            task.cancel()
+        await asyncio.gather(*self._recycling, return_exceptions=True)
+        for slot in self._slots:
+            if slot.alive:
+                slot.process.stdin.close()
+                try:
+                    await asyncio.wait_for(slot.process.wait(), 5)
+                except asyncio.TimeoutError:
+                    self._kill(slot)
+        self._slots = []
+        self._idle = None
+
+    def stats(self):
+        return {
+            **self._stats,
+            'size': self.size,
+            'alive': sum(1 for slot in self._slots if slot.alive),
+            'idle': self._idle.qsize() if self._idle is not None else 0,
+            'available': self.available,
+        }
@@ -0,0 +1,57 @@
+"""
+Spooled PDF output for incident reports.
+
+A SpooledPDF keeps a generated report in memory up to REPORT_SPOOL_MAX_MEMORY
+bytes (default 4 MiB) and in an anonymous temp file beyond that. Responses
+stream it back in chunks, so a large report is never copied into one bytes
+object per download. The temp file is removed once the last reference (job,
+report cache, response) goes away.
+"""
+import os
+import tempfile
+import threading
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SpooledPDF:
+    def __init__(self, max_memory=None):
+        if max_memory is None:
+            max_memory = int(os.getenv("REPORT_SPOOL_MAX_MEMORY", 4 * 1024 * 1024))
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self._lock = threading.Lock()
+        self._size = 0
+
+    def write(self, data):
+        """File-like write, so ReportLab can build straight into the spool"""
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(data)
+            self._size += len(data)
+        return len(data)
+
+    def read(self, offset, length):
+        """Bytes [offset, offset + length); safe while other readers stream the same PDF"""
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        offset = 0
+        while offset < self._size:
+            chunk = self.read(offset, chunk_size)
+            offset += len(chunk)
+            yield chunk
+
+    def getvalue(self):
+        return self.read(0, self._size)
+
+    @property
+    def on_disk(self):
+        return bool(getattr(self._file, '_rolled', False))
+
+    def __len__(self):
+        return self._size
+
+    def close(self):
+        self._file.close()
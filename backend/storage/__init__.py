@@ -0,0 +1,63 @@
+"""
+Interchangeable event-store backends.
+
+    sqlite   backend.database.Database (default)
+    memory   backend.storage.memory.MemoryDatabase - tests and benchmarks
+    segment  backend.storage.segment.SegmentDatabase - append-only files for write-heavy ingest
+
+The backend is chosen with the STORAGE_BACKEND environment variable.
+get_database() returns one shared instance per process, so every router reads
+and writes the same store (which the memory backend depends on), and
+get_async_database() its one AsyncDatabase wrapper, whose thread pools bound
+storage concurrency for the whole process.
+"""
+import os
+import threading
+from backend.async_database import AsyncDatabase
+from backend.database import Database, StorageBackend
+from backend.logger import get_logger
+from backend.storage.memory import MemoryDatabase
+from backend.storage.segment import SegmentDatabase
+
+BACKENDS = {
+    'sqlite': Database,
+    'memory': MemoryDatabase,
+    'segment': SegmentDatabase,
+}
+
+_instance = None
+_async_instance = None
+_instance_lock = threading.Lock()
+
+
+def create_database(backend=None, **kwargs):
+    """New store of the given backend (default STORAGE_BACKEND or sqlite)"""
+    if backend is None:
+        backend = os.getenv("STORAGE_BACKEND", "sqlite")
+    if backend not in BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND must be one of: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](**kwargs)
+
+
+def get_database():
+    """The process-wide store selected by STORAGE_BACKEND"""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = create_database()
+            get_logger('storage').info("Using backend", backend=_instance.name)
+        return _instance
+
+
+def get_async_database():
+    """The process-wide AsyncDatabase over get_database()"""
+    global _async_instance
+    db = get_database()
+    with _instance_lock:
+        if _async_instance is None:
+            _async_instance = AsyncDatabase(db)
+        return _async_instance
+
+
+__all__ = ['BACKENDS', 'StorageBackend', 'Database', 'MemoryDatabase', 'SegmentDatabase', 'AsyncDatabase',
+           'create_database', 'get_database', 'get_async_database']
@@ -0,0 +1,272 @@
+"""
+In-memory event store for tests and benchmarks.
+
+Nothing is persisted: the store lives as long as the process. Rollups are kept
+as plain dicts updated on every insert, mirroring the SQLite rollup tables.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from backend.database import (StorageBackend, LOG_COLUMNS, TIME_SERIES_GROUPS, row_to_log, now_ms,
+                              event_hash_version, encode_actions_row, decode_actions_row, decode_action_columns_row,
+                              action_chunk_status, new_action_session, ActionSessionConflict)
+
+
+class Rollups:
+    """Counters behind /api/stats, with the same defaults as the SQLite insert trigger"""
+
+    def __init__(self):
+        self.ips = {}         # ip -> [total, sqli, xss, benign, last_id]
+        self.ip_ids = {}      # ip -> ids of its events, ascending (the per-IP index)
+        self.strategies = {}  # strategy -> count
+        self.hourly = {}      # (hour, attack_type, strategy) -> count
+        self.total = 0
+        self.confidence_count = 0
+        self.confidence_sum = 0.0
+        self.confidence_min = None
+        self.confidence_max = None
+
+    def add(self, log):
+        ip = log['ip_address'] if log['ip_address'] is not None else 'unknown'
+        attack_type = log['attack_type']
+        strategy = log['deception_strategy'] if log['deception_strategy'] is not None else 'Unknown'
+        counts = self.ips.get(ip)
+        if counts is None:
+            counts = self.ips[ip] = [0, 0, 0, 0, None]
+            self.ip_ids[ip] = []
+        counts[0] += 1
+        counts[1 if attack_type == 'SQLi' else 2 if attack_type == 'XSS' else 3] += 1
+        counts[4] = log['id']
+        self.ip_ids[ip].append(log['id'])
+        self.strategies[strategy] = self.strategies.get(strategy, 0) + 1
+        key = (log['ts_ms'] // 3600000, attack_type if attack_type is not None else 'Benign', strategy)
+        self.hourly[key] = self.hourly.get(key, 0) + 1
+
+        self.total += 1
+        confidence = log['confidence']
+        if confidence is not None:
+            self.confidence_count += 1
+            self.confidence_sum += confidence
+            if self.confidence_min is None or confidence < self.confidence_min:
+                self.confidence_min = confidence
+            if self.confidence_max is None or confidence > self.confidence_max:
+                self.confidence_max = confidence
+
+    def top_ips(self, limit=10):
+        ranked = sorted(self.ips.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return [{'ip': ip, 'total': total, 'sqli': sqli, 'xss': xss, 'benign': benign}
+                for ip, (total, sqli, xss, benign, _) in ranked]
+
+    def ids_for_ip(self, ip_address, first_id=None, last_id=None, limit=None):
+        """Event ids of an IP within [first_id, last_id] (default all), newest first, at most limit"""
+        ids = self.ip_ids.get(ip_address, [])
+        start = bisect_left(ids, first_id) if first_id is not None else 0
+        stop = bisect_right(ids, last_id) if last_id is not None else len(ids)
+        if limit is not None:
+            start = max(start, stop - limit)
+        return ids[start:stop][::-1]
+
+    def last_id_for_ip(self, ip_address):
+        counts = self.ips.get(ip_address)
+        return counts[4] if counts else None
+
+    def strategy_counts(self):
+        ranked = sorted(self.strategies.items(), key=lambda item: item[1], reverse=True)
+        return [{'strategy': strategy, 'count': count} for strategy, count in ranked]
+
+    def confidence_stats(self):
+        if not self.confidence_count:
+            return {'average': 0, 'min': 0, 'max': 0, 'total': self.total}
+        return {
+            'average': self.confidence_sum / self.confidence_count,
+            'min': self.confidence_min,
+            'max': self.confidence_max,
+            'total': self.total
+        }
+
+    def hourly_bucket_counts(self, start_ms, end_ms, bucket_ms, group_by):
+        """get_bucket_counts for hour-aligned ranges and buckets"""
+        hours_per_bucket = bucket_ms // 3600000
+        start_hour, end_hour = start_ms // 3600000, end_ms // 3600000
+        position = 1 if group_by == 'attack_type' else 2
+        counts = {}
+        for key, count in self.hourly.items():
+            if start_hour <= key[0] < end_hour:
+                bucket = (key[0] // hours_per_bucket, key[position])
+                counts[bucket] = counts.get(bucket, 0) + count
+        return [(index, group, count) for (index, group), count in counts.items()]
+
+
+def is_hour_aligned(start_ms, end_ms, bucket_ms):
+    return bucket_ms % 3600000 == 0 and start_ms % 3600000 == 0 and end_ms % 3600000 == 0
+
+
+class MemoryDatabase(StorageBackend):
+    """
+    Event store held in Python lists.
+
+    Ids are consecutive from 1, so a log is found by position, and timestamps
+    never decrease, so time ranges are found by bisecting the ts_ms list.
+    """
+    name = 'memory'
+
+    def __init__(self, write_behind=None):
+        super().__init__(write_behind)
+        self._lock = threading.Lock()
+        self._logs = []
+        self._ts = []
+        self._actions = {}  # event_id -> (actions_json, actions_blob)
+        self._explanations = {}  # event_id -> (rules_version, explanation)
+        self._sessions = {}  # session_id -> live session state
+        self._chunks = {}  # session_id -> [(actions_json, actions_blob)] by seq
+        self._rollups = Rollups()
+
+    def _append_events(self, events, ts_ms, session_id=None):
+        with self._lock:
+            if session_id is not None:
+                session = self._sessions.get(session_id)
+                if session is None or session['event_id'] is not None:
+                    raise ActionSessionConflict(session_id, session and session['event_id'])
+            if self._ts:
+                # Clamped so a clock step backwards cannot unsort the log
+                ts_ms = max(ts_ms, self._ts[-1])
+            first_id = len(self._logs) + 1
+            for offset, event in enumerate(events):
+                log = dict(zip(LOG_COLUMNS, (first_id + offset, None, *event[:6], ts_ms, event_hash_version(event))))
+                self._logs.append(log)
+                self._ts.append(ts_ms)
+                self._rollups.add(log)
+                if event[6]:
+                    self._actions[log['id']] = encode_actions_row(event[6])
+            if session_id is not None:
+                session['event_id'] = first_id
+                session['updated_ms'] = ts_ms
+                self._chunks.pop(session_id, None)
+        return list(range(first_id, first_id + len(events)))
+
+    def _range(self, since_ms, until_ms):
+        start = bisect_left(self._ts, since_ms) if since_ms is not None else 0
+        stop = bisect_left(self._ts, until_ms) if until_ms is not None else len(self._ts)
+        return start, stop
+
+    def get_logs(self, since_ms=None, until_ms=None, hot_only=False, limit=None):
+        with self._lock:
+            start, stop = self._range(since_ms, until_ms)
+            if limit is not None:
+                start = max(start, stop - limit)
+            rows = self._logs[start:stop]
+        return [row_to_log(row) for row in reversed(rows)]
+
+    def get_log(self, event_id):
+        if not 1 <= event_id <= len(self._logs):
+            return None
+        return row_to_log(self._logs[event_id - 1])
+
+    def get_logs_by_ids(self, event_ids):
+        count = len(self._logs)
+        return [row_to_log(self._logs[event_id - 1]) for event_id in event_ids if 1 <= event_id <= count]
+
+    def get_logs_for_ip(self, ip_address, since_ms=None, until_ms=None, limit=None):
+        with self._lock:
+            # Ids are positions + 1, so the time range maps straight to an id range
+            start, stop = self._range(since_ms, until_ms)
+            ids = self._rollups.ids_for_ip(ip_address, start + 1, stop, limit)
+        return [row_to_log(self._logs[event_id - 1]) for event_id in ids]
+
+    def iter_logs_for_ip(self, ip_address, chunk_size=1000):
+        with self._lock:
+            ids = self._rollups.ids_for_ip(ip_address)[::-1]
+        for start in range(0, len(ids), chunk_size):
+            yield [row_to_log(self._logs[event_id - 1]) for event_id in ids[start:start + chunk_size]]
+
+    def get_ip_last_event_id(self, ip_address):
+        with self._lock:
+            return self._rollups.last_id_for_ip(ip_address)
+
+    def save_actions(self, event_id, actions):
+        with self._lock:
+            self._actions[event_id] = encode_actions_row(actions)
+
+    def get_actions(self, event_id, start=0, stop=None):
+        stored = self._actions.get(event_id)
+        if stored is None:
+            return []
+        return decode_actions_row(*stored, start, stop)
+
+    def append_action_chunk(self, session_id, seq, actions, max_actions=None):
+        row = encode_actions_row(actions)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            status = action_chunk_status(seq, len(actions), session, max_actions)
+            if status == 'stored':
+                if session is None:
+                    session = self._sessions[session_id] = new_action_session(session_id, now_ms())
+                self._chunks.setdefault(session_id, []).append(row)
+                session['chunks'] += 1
+                session['actions'] += len(actions)
+                session['updated_ms'] = now_ms()
+            return status, session['chunks'] if session else 0
+
+    def get_action_session(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return dict(session) if session else None
+
+    def get_action_chunks(self, session_id):
+        with self._lock:
+            rows = list(self._chunks.get(session_id, ()))
+        return [decode_action_columns_row(*row) for row in rows]
+
+    def close_action_session(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = new_action_session(session_id, now_ms())
+            session['closed'] = True
+            session['updated_ms'] = now_ms()
+            return dict(session)
+
+    def expire_action_sessions(self, before_ms):
+        with self._lock:
+            expired = [session_id for session_id, session in self._sessions.items()
+                       if session['updated_ms'] < before_ms]
+            for session_id in expired:
+                del self._sessions[session_id]
+                self._chunks.pop(session_id, None)
+        return len(expired)
+
+    def save_explanations(self, items):
+        with self._lock:
+            for event_id, version, explanation in items:
+                self._explanations[event_id] = (version, explanation)
+
+    def get_explanations(self, event_ids):
+        with self._lock:
+            return {event_id: self._explanations[event_id] for event_id in event_ids
+                    if event_id in self._explanations}
+
+    def get_top_ips(self, limit=10):
+        with self._lock:
+            return self._rollups.top_ips(limit)
+
+    def get_strategy_counts(self):
+        with self._lock:
+            return self._rollups.strategy_counts()
+
+    def get_confidence_stats(self):
+        with self._lock:
+            return self._rollups.confidence_stats()
+
+    def get_bucket_counts(self, start_ms, end_ms, bucket_ms, group_by='attack_type'):
+        column = TIME_SERIES_GROUPS[group_by]
+        default = 'Benign' if group_by == 'attack_type' else 'Unknown'
+        with self._lock:
+            if is_hour_aligned(start_ms, end_ms, bucket_ms):
+                return self._rollups.hourly_bucket_counts(start_ms, end_ms, bucket_ms, group_by)
+            start, stop = self._range(start_ms, end_ms)
+            rows = self._logs[start:stop]
+        counts = {}
+        for row in rows:
+            value = row[column]
+            key = (row['ts_ms'] // bucket_ms, value if value is not None else default)
+            counts[key] = counts.get(key, 0) + 1
+        return [(index, group, count) for (index, group), count in counts.items()]
@@ -0,0 +1,385 @@
+"""
+Append-only segmented file event store, optimized for write-heavy ingest.
+
+Every event (and every save_actions / save_explanations item, session chunk,
+session state change and session expiry) is appended as one NDJSON record to the newest
+segment file under the store directory:
+
+    segment-00000001.log, segment-00000002.log, ...
+
+A new segment is started once the current one reaches STORAGE_SEGMENT_BYTES.
+A batch is written with a single write() call and nothing is ever updated in
+place, so inserts cost one buffered append (plus an fsync per batch when
+STORAGE_SEGMENT_FSYNC=1).
+
+On open the segments are scanned once to rebuild the in-memory index (id ->
+file offset, ts_ms per id) and the stats rollups; a torn record at the end of
+the last segment, left by a crash mid-write, is truncated away. Reads seek
+straight to the indexed offsets.
+
+The index and the id counter live in the process, so a store directory is
+served by one process only: opening it takes an exclusive lock on its LOCK
+file, and a second process (e.g. another uvicorn worker) fails to start.
+"""
+import json
+import os
+import re
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process check
+    fcntl = None
+from bisect import bisect_left
+from backend.database import (StorageBackend, LOG_COLUMNS, TIME_SERIES_GROUPS, row_to_log, now_ms,
+                              event_hash_version, action_chunk_status, new_action_session, ActionSessionConflict)
+from backend.storage.memory import Rollups, is_hour_aligned
+from backend.utils.action_codec import ActionColumns, action_dicts
+
+_SEGMENT_RE = re.compile(r'^segment-(\d{8})\.log$')
+
+# Record kinds
+_EVENT = 'e'
+_ACTIONS = 'a'
+_EXPLANATION = 'x'
+_CHUNK = 'c'
+_SESSION = 's'
+_EXPIRE = 'r'
+
+
+def _segment_name(number):
+    return f"segment-{number:08d}.log"
+
+
+class SegmentDatabase(StorageBackend):
+    name = 'segment'
+
+    def __init__(self, path=None, segment_bytes=None, fsync=None, write_behind=None):
+        """
+        Args:
+            path: Store directory (default STORAGE_SEGMENT_DIR or "segments"
+                next to DATABASE_PATH)
+            segment_bytes: Size at which a new segment is started
+                (default STORAGE_SEGMENT_BYTES or 64 MiB)
+            fsync: fsync after every batch (default STORAGE_SEGMENT_FSYNC=1)
+            write_behind: Group-commit inserts on a writer thread
+        """
+        super().__init__(write_behind)
+        if path is None:
+            path = os.getenv("STORAGE_SEGMENT_DIR") or os.path.join(
+                os.path.dirname(os.path.abspath(os.getenv("DATABASE_PATH", "logs.db"))), "segments")
+        if segment_bytes is None:
+            segment_bytes = int(os.getenv("STORAGE_SEGMENT_BYTES", 64 * 1024 * 1024))
+        if fsync is None:
+            fsync = os.getenv("STORAGE_SEGMENT_FSYNC", "0") == "1"
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._locations = []  # id - 1 -> (segment number, offset)
+        self._ts = []         # id - 1 -> ts_ms
+        self._actions = {}    # event_id -> (segment number, offset) of the latest actions record
+        self._explanations = {}  # event_id -> (segment number, offset) of the latest explanation record
+        self._sessions = {}  # session_id -> live session state
+        self._chunks = {}  # session_id -> [(segment number, offset)] of its chunk records, by seq
+        self._rollups = Rollups()
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_file = self._acquire_store_lock()
+        self._segment = 0
+        self._file = None
+        self._load()
+
+    def _acquire_store_lock(self):
+        """Exclusive lock on the store directory, held until close()"""
+        lock_file = open(os.path.join(self.path, "LOCK"), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                raise RuntimeError(f"Segment store {self.path} is already open in another process; "
+                                   f"the segment backend runs with a single worker process") from None
+        return lock_file
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, _segment_name(number))
+
+    def _load(self):
+        """Rebuild the index and rollups from the segment files"""
+        numbers = sorted(int(m.group(1)) for m in map(_SEGMENT_RE.match, os.listdir(self.path)) if m)
+        for number in numbers:
+            with open(self._segment_path(number), 'rb') as f:
+                offset = 0
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        if number != numbers[-1]:
+                            raise
+                        # Torn write at the tail: drop it
+                        print(f"[STORAGE] Truncating partial record in {_segment_name(number)} at {offset}")
+                        os.truncate(self._segment_path(number), offset)
+                        break
+                    self._index(record, number, offset)
+                    offset += len(line)
+        self._segment = numbers[-1] if numbers else 1
+        self._file = open(self._segment_path(self._segment), 'ab')
+
+    def _index(self, record, number, offset):
+        if record['k'] == _EVENT:
+            self._locations.append((number, offset))
+            self._ts.append(record['ts_ms'])
+            self._rollups.add(record)
+        elif record['k'] == _EXPLANATION:
+            self._explanations[record['event_id']] = (number, offset)
+        elif record['k'] == _CHUNK:
+            session_id = record['session_id']
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = new_action_session(session_id, record['ts_ms'])
+            session['chunks'] += 1
+            session['actions'] += len(record['actions'])
+            session['updated_ms'] = record['ts_ms']
+            self._chunks.setdefault(session_id, []).append((number, offset))
+        elif record['k'] == _SESSION:
+            session_id = record['session_id']
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = new_action_session(session_id, record['ts_ms'])
+            session['closed'] = True
+            session['updated_ms'] = record['ts_ms']
+            if record['event_id'] is not None:
+                # Linked: the chunk records stay in the segments but are no longer served
+                session['event_id'] = record['event_id']
+                self._chunks.pop(session_id, None)
+        elif record['k'] == _EXPIRE:
+            # Expired sessions are forgotten; their records are dead space in the segments
+            for session_id, session in list(self._sessions.items()):
+                if session['updated_ms'] < record['before_ms']:
+                    del self._sessions[session_id]
+                    self._chunks.pop(session_id, None)
+        else:
+            self._actions[record['event_id']] = (number, offset)
+
+    def _append(self, records):
+        """Append records (lock held), rolling segments as needed; each is indexed once written"""
+        pending = []
+        size = self._file.tell()
+        for record in records:
+            line = (json.dumps(record, separators=(',', ':'), default=action_dicts) + "\n").encode('utf-8')
+            if size and size + len(line) > self.segment_bytes:
+                self._write(pending)
+                pending = []
+                self._file.close()
+                self._segment += 1
+                self._file = open(self._segment_path(self._segment), 'ab')
+                size = 0
+            pending.append((record, size, line))
+            size += len(line)
+        self._write(pending)
+
+    def _write(self, pending):
+        """Write (record, offset, line) entries to the active segment, then index them"""
+        if not pending:
+            return
+        self._file.write(b''.join(line for _, _, line in pending))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        # Only now can a reader that finds a record in the index also find it on disk
+        for record, offset, _ in pending:
+            self._index(record, self._segment, offset)
+
+    def _read(self, location):
+        number, offset = location
+        with open(self._segment_path(number), 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def _read_events(self, start, stop):
+        """Event records with ids start+1 .. stop, reading each segment sequentially"""
+        with self._lock:
+            locations = self._locations[start:stop]
+        rows = []
+        index = 0
+        stop = len(locations)
+        while index < stop:
+            number, offset = locations[index]
+            with open(self._segment_path(number), 'rb') as f:
+                f.seek(offset)
+                while index < stop and locations[index][0] == number:
+                    record = json.loads(f.readline())
+                    if record['k'] == _EVENT:
+                        rows.append(record)
+                        index += 1
+        return rows
+
+    def _append_events(self, events, ts_ms, session_id=None):
+        with self._lock:
+            if session_id is not None:
+                session = self._sessions.get(session_id)
+                if session is None or session['event_id'] is not None:
+                    raise ActionSessionConflict(session_id, session and session['event_id'])
+            if self._ts:
+                # Clamped so a clock step backwards cannot unsort the log
+                ts_ms = max(ts_ms, self._ts[-1])
+            first_id = len(self._locations) + 1
+            records = []
+            for offset, event in enumerate(events):
+                record = {'k': _EVENT, **dict(zip(LOG_COLUMNS, (first_id + offset, None, *event[:6], ts_ms, event_hash_version(event))))}
+                records.append(record)
+                if event[6]:
+                    records.append({'k': _ACTIONS, 'event_id': record['id'], 'actions': event[6]})
+            if session_id is not None:
+                # Same write() as the event, so the link cannot be lost without it
+                records.append({'k': _SESSION, 'session_id': session_id, 'ts_ms': ts_ms, 'event_id': first_id})
+            self._append(records)
+        return list(range(first_id, first_id + len(events)))
+
+    def _range(self, since_ms, until_ms):
+        start = bisect_left(self._ts, since_ms) if since_ms is not None else 0
+        stop = bisect_left(self._ts, until_ms) if until_ms is not None else len(self._ts)
+        return start, stop
+
+    def get_logs(self, since_ms=None, until_ms=None, hot_only=False, limit=None):
+        with self._lock:
+            start, stop = self._range(since_ms, until_ms)
+            if limit is not None:
+                start = max(start, stop - limit)
+        return [row_to_log({column: row.get(column) for column in LOG_COLUMNS})
+                for row in reversed(self._read_events(start, stop))]
+
+    def get_log(self, event_id):
+        with self._lock:
+            if not 1 <= event_id <= len(self._locations):
+                return None
+            location = self._locations[event_id - 1]
+        row = self._read(location)
+        return row_to_log({column: row.get(column) for column in LOG_COLUMNS})
+
+    def get_logs_by_ids(self, event_ids):
+        """Several events, opening each segment once and reading it in offset order"""
+        with self._lock:
+            count = len(self._locations)
+            event_ids = [event_id for event_id in event_ids if 1 <= event_id <= count]
+            locations = [self._locations[event_id - 1] for event_id in event_ids]
+        by_segment = {}
+        for event_id, (number, offset) in zip(event_ids, locations):
+            by_segment.setdefault(number, []).append((offset, event_id))
+        logs = {}
+        for number, entries in by_segment.items():
+            with open(self._segment_path(number), 'rb') as f:
+                for offset, event_id in sorted(entries):
+                    f.seek(offset)
+                    row = json.loads(f.readline())
+                    logs[event_id] = row_to_log({column: row.get(column) for column in LOG_COLUMNS})
+        return [logs[event_id] for event_id in event_ids]
+
+    def get_logs_for_ip(self, ip_address, since_ms=None, until_ms=None, limit=None):
+        with self._lock:
+            start, stop = self._range(since_ms, until_ms)
+            ids = self._rollups.ids_for_ip(ip_address, start + 1, stop, limit)
+        return self.get_logs_by_ids(ids)
+
+    def iter_logs_for_ip(self, ip_address, chunk_size=1000):
+        with self._lock:
+            ids = self._rollups.ids_for_ip(ip_address)[::-1]
+        for start in range(0, len(ids), chunk_size):
+            yield [self.get_log(event_id) for event_id in ids[start:start + chunk_size]]
+
+    def get_ip_last_event_id(self, ip_address):
+        with self._lock:
+            return self._rollups.last_id_for_ip(ip_address)
+
+    def save_actions(self, event_id, actions):
+        with self._lock:
+            self._append([{'k': _ACTIONS, 'event_id': event_id, 'actions': actions}])
+
+    def get_actions(self, event_id, start=0, stop=None):
+        with self._lock:
+            location = self._actions.get(event_id)
+        if location is None:
+            return []
+        return self._read(location)['actions'][start:stop]
+
+    def append_action_chunk(self, session_id, seq, actions, max_actions=None):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            status = action_chunk_status(seq, len(actions), session, max_actions)
+            if status == 'stored':
+                self._append([{'k': _CHUNK, 'session_id': session_id, 'seq': seq, 'ts_ms': now_ms(),
+                               'actions': actions}])
+            session = self._sessions.get(session_id)
+            return status, session['chunks'] if session else 0
+
+    def get_action_session(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return dict(session) if session else None
+
+    def get_action_chunks(self, session_id):
+        with self._lock:
+            locations = list(self._chunks.get(session_id, ()))
+        return [ActionColumns.from_dicts(self._read(location)['actions']) for location in locations]
+
+    def close_action_session(self, session_id):
+        with self._lock:
+            self._append([{'k': _SESSION, 'session_id': session_id, 'ts_ms': now_ms(), 'event_id': None}])
+            return dict(self._sessions[session_id])
+
+    def expire_action_sessions(self, before_ms):
+        with self._lock:
+            count = len(self._sessions)
+            self._append([{'k': _EXPIRE, 'before_ms': before_ms}])
+            return count - len(self._sessions)
+
+    def save_explanations(self, items):
+        if not items:
+            return
+        with self._lock:
+            self._append([{'k': _EXPLANATION, 'event_id': event_id, 'rules_version': version,
+                           'explanation': explanation} for event_id, version, explanation in items])
+
+    def get_explanations(self, event_ids):
+        with self._lock:
+            locations = {event_id: self._explanations[event_id] for event_id in event_ids
+                         if event_id in self._explanations}
+        found = {}
+        for event_id, location in locations.items():
+            record = self._read(location)
+            found[event_id] = (record['rules_version'], record['explanation'])
+        return found
+
+    def get_top_ips(self, limit=10):
+        with self._lock:
+            return self._rollups.top_ips(limit)
+
+    def get_strategy_counts(self):
+        with self._lock:
+            return self._rollups.strategy_counts()
+
+    def get_confidence_stats(self):
+        with self._lock:
+            return self._rollups.confidence_stats()
+
+    def get_bucket_counts(self, start_ms, end_ms, bucket_ms, group_by='attack_type'):
+        column = TIME_SERIES_GROUPS[group_by]
+        default = 'Benign' if group_by == 'attack_type' else 'Unknown'
+        with self._lock:
+            if is_hour_aligned(start_ms, end_ms, bucket_ms):
+                return self._rollups.hourly_bucket_counts(start_ms, end_ms, bucket_ms, group_by)
+            start, stop = self._range(start_ms, end_ms)
+        counts = {}
+        for row in self._read_events(start, stop):
+            value = row[column]
+            key = (row['ts_ms'] // bucket_ms, value if value is not None else default)
+            counts[key] = counts.get(key, 0) + 1
+        return [(index, group, count) for (index, group), count in counts.items()]
+
+    def close(self):
+        """Flush queued writes and close the active segment"""
+        super().close()
+        with self._lock:
+            if self._file is not None and not self._file.closed:
+                self._file.close()
+            if not self._lock_file.closed:
+                self._lock_file.close()
@@ -0,0 +1,112 @@
+"""
+Time-series engine for the stats endpoints.
+
+Windows and bucket sizes are given as durations such as "90s", "15m", "24h" or
+"7d". Bucketing and counting happen inside SQLite (see
+Database.get_bucket_counts); this module only validates the request and shapes
+the result for the dashboard.
+"""
+import datetime
+import re
+import time
+from datetime import timezone
+from backend.database import TIME_SERIES_GROUPS
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+MIN_WINDOW_SECONDS = 60
+MAX_WINDOW_SECONDS = 90 * 86400
+MIN_BUCKET_SECONDS = 1
+MAX_BUCKET_SECONDS = 30 * 86400
+# Keeps responses (and the per-bucket work) bounded for fine buckets on long windows
+MAX_BUCKETS = 5000
+
+
+def parse_duration(value) -> int:
+    """
+    Parse a duration like "30s", "15m", "24h", "7d" (or a plain number of seconds).
+
+    Returns:
+        Duration in seconds
+
+    Raises:
+        ValueError: If the value is not a positive duration
+    """
+    if isinstance(value, (int, float)):
+        seconds = int(value)
+    else:
+        match = re.fullmatch(r'\s*(\d+)\s*([smhd]?)\s*', str(value).lower())
+        if not match:
+            raise ValueError(f"Invalid duration: {value!r} (expected e.g. 30s, 15m, 24h, 7d)")
+        seconds = int(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+    if seconds <= 0:
+        raise ValueError(f"Duration must be positive: {value!r}")
+    return seconds
+
+
+def query_time_series(db, window='24h', bucket='1h', group_by='attack_type', now=None):
+    """
+    Count events per bucket over the trailing window.
+
+    Buckets are aligned to multiples of the bucket size since the epoch (UTC),
+    so the last bucket is the one containing `now` and successive calls line up.
+
+    Args:
+        db: Database instance
+        window: Trailing window to cover
+        bucket: Bucket width
+        group_by: 'attack_type' or 'strategy'
+        now: Override for the current time (epoch seconds), mainly for benchmarks
+
+    Returns:
+        List of buckets, oldest first. Each bucket has 'hour' (display label),
+        'timestamp' (ISO bucket start), 'total' and 'counts' per group key; when
+        grouped by attack type it also carries 'sqli', 'xss' and 'benign'.
+
+    Raises:
+        ValueError: On invalid window, bucket or group_by
+    """
+    window_s = parse_duration(window)
+    bucket_s = parse_duration(bucket)
+    if group_by not in TIME_SERIES_GROUPS:
+        raise ValueError(f"group_by must be one of: {', '.join(TIME_SERIES_GROUPS)}")
+    if not MIN_WINDOW_SECONDS <= window_s <= MAX_WINDOW_SECONDS:
+        raise ValueError("window must be between 1m and 90d")
+    if not MIN_BUCKET_SECONDS <= bucket_s <= min(window_s, MAX_BUCKET_SECONDS):
+        raise ValueError("bucket must be between 1s and the window size")
+    n_buckets = -(-window_s // bucket_s)
+    if n_buckets > MAX_BUCKETS:
+        raise ValueError(f"window/bucket yields {n_buckets} buckets (max {MAX_BUCKETS}); use a larger bucket")
+
+    now_s = int(time.time() if now is None else now)
+    end_index = now_s // bucket_s
+    start_index = end_index - n_buckets + 1
+    bucket_ms = bucket_s * 1000
+
+    label_format = '%Y-%m-%d' if bucket_s % 86400 == 0 else ('%H:%M' if bucket_s >= 60 else '%H:%M:%S')
+    buckets = []
+    for index in range(start_index, end_index + 1):
+        start = datetime.datetime.fromtimestamp(index * bucket_s, timezone.utc)
+        entry = {
+            'hour': start.strftime(label_format),
+            'timestamp': start.isoformat(),
+            'total': 0,
+            'counts': {}
+        }
+        if group_by == 'attack_type':
+            entry.update({'sqli': 0, 'xss': 0, 'benign': 0})
+        buckets.append(entry)
+
+    rows = db.get_bucket_counts(start_index * bucket_ms, (end_index + 1) * bucket_ms, bucket_ms, group_by)
+    for index, key, count in rows:
+        entry = buckets[index - start_index]
+        entry['counts'][key] = entry['counts'].get(key, 0) + count
+        entry['total'] += count
+        if group_by == 'attack_type':
+            if key == 'SQLi':
+                entry['sqli'] += count
+            elif key == 'XSS':
+                entry['xss'] += count
+            else:
+                entry['benign'] += count
+    return buckets
@@ -0,0 +1,381 @@
+"""
+Compact binary encoding for session replay actions.
+
+A session is stored column by column instead of as a JSON array of dicts:
+
+    magic "SA" | version (1 byte) | flags (1 byte, bit 0 = zlib body)
+    body:
+        varint   number of actions
+        varint   number of strings, then each string as varint length + UTF-8
+        columns  type, ts, payload, x, y, target, value (in that order)
+
+Every column starts with a layout byte:
+
+    0  key absent from every action
+    1  key present and non-null in every action
+    2  two bitmaps follow (key present, value non-null), ceil(n / 8) bytes each
+
+followed by the non-null values only, packed as fixed-width little-endian
+arrays so they decode at C speed:
+
+    string columns (type, payload, target, value)
+        width byte (1, 2 or 4), then unsigned indexes into the string table,
+        so repeated action types and targets cost one byte each
+    numeric columns (ts, x, y)
+        kind byte: 1 = ints, 3 = integral floats, both followed by a width byte
+        (1, 2, 4 or 8) and signed deltas from the previous value; 2 = raw
+        float64 values. Timestamps are therefore stored as small deltas.
+
+Decoded actions compare equal to what json.loads would have returned for the
+same actions, including keys present with a null value.
+
+Sessions that arrive column by column (the action_columns form of
+/api/submit) are held in an ActionColumns and encoded straight from their
+lists, without building a dict per action.
+"""
+import struct
+import zlib
+from itertools import accumulate, chain
+from typing import List, Optional
+
+MAGIC = b'SA'
+VERSION = 1
+FLAG_ZLIB = 0x01
+
+STRING_COLUMNS = ('type', 'payload', 'target', 'value')
+NUMERIC_COLUMNS = ('ts', 'x', 'y')
+COLUMNS = ('type', 'ts', 'payload', 'x', 'y', 'target', 'value')
+
+_LAYOUT_ABSENT = 0
+_LAYOUT_DENSE = 1
+_LAYOUT_SPARSE = 2
+
+_KIND_INT = 1
+_KIND_FLOAT = 2
+_KIND_INTEGRAL_FLOAT = 3
+
+
+class UnsupportedActions(ValueError):
+    """The actions contain keys or value types the compact format cannot represent."""
+
+
+class ActionColumns:
+    """
+    Session actions as parallel lists, one per column in COLUMNS.
+
+    Every action has every key, as Action.dict() produces; a column that was
+    not sent is all null. len() is the number of actions.
+    """
+    __slots__ = ('columns', 'count')
+
+    def __init__(self, columns: dict):
+        """
+        Args:
+            columns: Column name -> list of values (None for missing values)
+
+        Raises:
+            UnsupportedActions: On unknown column names or lists of different lengths
+        """
+        unknown = set(columns) - set(COLUMNS)
+        if unknown:
+            raise UnsupportedActions(f"Unknown action columns: {sorted(unknown)}")
+        lengths = {len(values) for values in columns.values() if values is not None}
+        if len(lengths) > 1:
+            raise UnsupportedActions(f"Action columns have different lengths: {sorted(lengths)}")
+        self.count = lengths.pop() if lengths else 0
+        self.columns = {name: columns.get(name) or [None] * self.count for name in COLUMNS}
+
+    def __len__(self):
+        return self.count
+
+    def rows(self, names=COLUMNS):
+        """Tuples of the named columns, one per action"""
+        return zip(*(self.columns[name] for name in names))
+
+    def to_dicts(self) -> List[dict]:
+        return [dict(zip(COLUMNS, row)) for row in self.rows()]
+
+    @classmethod
+    def from_dicts(cls, actions: List[dict]) -> 'ActionColumns':
+        """Columns of action dicts (keys outside COLUMNS are dropped, missing keys become null)"""
+        return cls({name: [action.get(name) for action in actions] for name in COLUMNS})
+
+    @classmethod
+    def concat(cls, parts: List['ActionColumns']) -> 'ActionColumns':
+        """The actions of parts, in order, as one ActionColumns"""
+        return cls({name: list(chain.from_iterable(part.columns[name] for part in parts)) for name in COLUMNS})
+
+
+def action_dicts(actions):
+    """actions as a list of dicts (for JSON), whichever form they came in"""
+    return actions.to_dicts() if isinstance(actions, ActionColumns) else actions
+
+
+def is_compact(data) -> bool:
+    """True if data is an encoded action blob"""
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:2]) == MAGIC
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+# width -> (unsigned, signed) struct codes
+_WIDTHS = {1: ('B', 'b'), 2: ('H', 'h'), 4: ('I', 'i'), 8: ('Q', 'q')}
+
+
+def _pack_array(out: bytearray, values, signed: bool):
+    low = min(values, default=0)
+    high = max(values, default=0)
+    for width in (1, 2, 4, 8):
+        limit = 1 << (8 * width - (1 if signed else 0))
+        if (-limit if signed else 0) <= low and high < limit:
+            break
+    else:
+        raise UnsupportedActions("Value out of range")
+    out.append(width)
+    out += struct.pack(f'<{len(values)}{_WIDTHS[width][signed]}', *values)
+
+
+def _unpack_array(buf, pos, count, signed: bool):
+    width = buf[pos]
+    values = struct.unpack_from(f'<{count}{_WIDTHS[width][signed]}', buf, pos + 1)
+    return values, pos + 1 + width * count
+
+
+def _bitmap(flags) -> bytes:
+    size = (len(flags) + 7) // 8
+    if all(flags):
+        return ((1 << len(flags)) - 1).to_bytes(size, 'little')
+    bits = 0
+    for i, flag in enumerate(flags):
+        if flag:
+            bits |= 1 << i
+    return bits.to_bytes(size, 'little')
+
+
+def encode_actions(actions: List[dict], compress: bool = True) -> bytes:
+    """
+    Encode a list of action dicts (or an ActionColumns).
+
+    Args:
+        actions: Actions as produced by the recorder / Action.dict()
+        compress: zlib-compress the body when that makes it smaller
+
+    Returns:
+        Encoded blob
+
+    Raises:
+        UnsupportedActions: If an action has unknown keys or unexpected value types
+    """
+    n = len(actions)
+    strings = {}
+    if isinstance(actions, ActionColumns):
+        # Every key is present in every action
+        columns = {name: (None, values) for name, values in actions.columns.items()}
+    else:
+        columns = {name: ([], []) for name in COLUMNS}  # name -> (present flags, values)
+        for action in actions:
+            if not isinstance(action, dict) or not action.keys() <= set(COLUMNS):
+                raise UnsupportedActions(f"Unsupported action: {action!r}")
+            for name in COLUMNS:
+                present, values = columns[name]
+                present.append(name in action)
+                values.append(action.get(name))
+
+    body = bytearray()
+    _write_varint(body, n)
+    column_bytes = bytearray()
+    for name in COLUMNS:
+        present, values = columns[name]
+        if present is not None and not any(present):
+            column_bytes.append(_LAYOUT_ABSENT)
+            continue
+        if None not in values:
+            column_bytes.append(_LAYOUT_DENSE)
+        else:
+            column_bytes.append(_LAYOUT_SPARSE)
+            column_bytes += _bitmap(present if present is not None else [True] * n)
+            column_bytes += _bitmap([value is not None for value in values])
+            values = [value for value in values if value is not None]
+        if name in STRING_COLUMNS:
+            if not all(isinstance(value, str) for value in values):
+                raise UnsupportedActions(f"Expected strings for '{name}'")
+            _pack_array(column_bytes, [strings.setdefault(value, len(strings)) for value in values], signed=False)
+        else:
+            _encode_numbers(column_bytes, name, values)
+
+    _write_varint(body, len(strings))
+    for value in strings:
+        encoded = value.encode('utf-8')
+        _write_varint(body, len(encoded))
+        body += encoded
+    body += column_bytes
+
+    flags = 0
+    if compress:
+        compressed = zlib.compress(bytes(body), 6)
+        if len(compressed) < len(body):
+            body = compressed
+            flags |= FLAG_ZLIB
+    return MAGIC + bytes((VERSION, flags)) + bytes(body)
+
+
+def _encode_numbers(out: bytearray, name, values):
+    if any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in values):
+        raise UnsupportedActions(f"Expected numbers for '{name}'")
+    if all(isinstance(value, int) for value in values):
+        kind = _KIND_INT
+    elif all(isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 53 for value in values):
+        kind = _KIND_INTEGRAL_FLOAT
+    else:
+        out.append(_KIND_FLOAT)
+        out += struct.pack(f'<{len(values)}d', *values)
+        return
+    out.append(kind)
+    values = [int(value) for value in values]
+    _pack_array(out, [value - previous for previous, value in zip([0] + values, values)], signed=True)
+
+
+def count_actions(blob: bytes) -> int:
+    """Number of actions in a blob, without decoding the columns"""
+    body = _body(blob)
+    return _read_varint(body, 0)[0]
+
+
+def decode_actions(blob: bytes, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+    """
+    Decode actions[start:stop] from a blob.
+
+    Only the requested rows are materialized as dicts.
+    """
+    body = _body(blob)
+    n, pos = _read_varint(body, 0)
+    start, stop, _ = slice(start, stop).indices(n)
+    count, pos = _read_varint(body, pos)
+    strings = []
+    for _ in range(count):
+        length, pos = _read_varint(body, pos)
+        strings.append(body[pos:pos + length].decode('utf-8'))
+        pos += length
+
+    actions = [{} for _ in range(max(stop - start, 0))]
+    # Columns are filled in COLUMNS order, so keys come out as type, ts, payload, ...
+    bitmap_size = (n + 7) // 8
+    for name in COLUMNS:
+        layout = body[pos]
+        pos += 1
+        if layout == _LAYOUT_ABSENT:
+            continue
+        present = non_null = None
+        count = n
+        if layout == _LAYOUT_SPARSE:
+            present = int.from_bytes(body[pos:pos + bitmap_size], 'little')
+            non_null = int.from_bytes(body[pos + bitmap_size:pos + 2 * bitmap_size], 'little')
+            pos += 2 * bitmap_size
+            count = bin(non_null).count('1')
+
+        if name in STRING_COLUMNS:
+            indexes, pos = _unpack_array(body, pos, count, signed=False)
+            values = [strings[index] for index in indexes]
+        else:
+            values, pos = _decode_numbers(body, pos, count)
+
+        if present is None:
+            for action, value in zip(actions, values[start:stop]):
+                action[name] = value
+        else:
+            # Position of row i among the non-null values = popcount of lower bits
+            value_index = bin(non_null & ((1 << start) - 1)).count('1')
+            for i in range(start, stop):
+                if (non_null >> i) & 1:
+                    value = values[value_index]
+                    value_index += 1
+                else:
+                    value = None
+                if (present >> i) & 1:
+                    actions[i - start][name] = value
+    return actions
+
+
+def decode_action_columns(blob: bytes) -> ActionColumns:
+    """
+    Decode a blob straight into columns, without a dict per action.
+
+    Keys absent from an action come back as null (ActionColumns gives every
+    action every key).
+    """
+    body = _body(blob)
+    n, pos = _read_varint(body, 0)
+    count, pos = _read_varint(body, pos)
+    strings = []
+    for _ in range(count):
+        length, pos = _read_varint(body, pos)
+        strings.append(body[pos:pos + length].decode('utf-8'))
+        pos += length
+
+    columns = {}
+    bitmap_size = (n + 7) // 8
+    for name in COLUMNS:
+        layout = body[pos]
+        pos += 1
+        if layout == _LAYOUT_ABSENT:
+            continue
+        non_null = None
+        count = n
+        if layout == _LAYOUT_SPARSE:
+            non_null = body[pos + bitmap_size:pos + 2 * bitmap_size]
+            pos += 2 * bitmap_size
+            count = bin(int.from_bytes(non_null, 'little')).count('1')
+
+        if name in STRING_COLUMNS:
+            indexes, pos = _unpack_array(body, pos, count, signed=False)
+            values = [strings[index] for index in indexes]
+        else:
+            values, pos = _decode_numbers(body, pos, count)
+
+        if non_null is not None:
+            values = iter(values)
+            values = [next(values) if (non_null[i >> 3] >> (i & 7)) & 1 else None for i in range(n)]
+        columns[name] = values
+    return ActionColumns(columns) if columns else ActionColumns({name: [None] * n for name in COLUMNS})
+
+
+def _decode_numbers(body, pos, count):
+    kind = body[pos]
+    pos += 1
+    if kind == _KIND_FLOAT:
+        values = list(struct.unpack_from(f'<{count}d', body, pos))
+        return values, pos + 8 * count
+    deltas, pos = _unpack_array(body, pos, count, signed=True)
+    values = list(accumulate(deltas))
+    if kind == _KIND_INTEGRAL_FLOAT:
+        values = [float(value) for value in values]
+    return values, pos
+
+
+def _body(blob):
+    blob = bytes(blob)
+    if blob[:2] != MAGIC:
+        raise ValueError("Not an encoded action blob")
+    if blob[2] != VERSION:
+        raise ValueError(f"Unsupported action blob version: {blob[2]}")
+    body = blob[4:]
+    if blob[3] & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    return body
@@ -0,0 +1,226 @@
+"""
+Write-behind queue that group-commits database writes from a single thread.
+
+Callers enqueue items and get a Future back; a dedicated writer thread drains
+the queue and hands whole batches to a ``write_batch`` callable, which is
+expected to persist them in one transaction and return one result per item.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, List
+from backend.logger import get_logger
+
+log = get_logger('write_behind')
+
+_STOP = object()
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class WriteBehindFull(Exception):
+    """Raised (through the Future) when an item is dropped because the queue is full."""
+
+
+class WriteBehindWriter:
+    def __init__(self, write_batch: Callable[[List[Any]], List[Any]], max_queue: int = 10000,
+                 max_batch: int = 500, enqueue_timeout: float = 0.5, name: str = "write-behind"):
+        """
+        Args:
+            write_batch: Callable persisting a list of items and returning their results
+            max_queue: Maximum number of pending items before new ones are dropped
+            max_batch: Maximum number of items written per transaction
+            enqueue_timeout: Seconds to wait for queue space before dropping an item
+            name: Name of the writer thread
+        """
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        # Held by submit from the closed check through the enqueue, and by close
+        self._close_lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'failed': 0,
+            'dropped': 0,
+            'batches': 0,
+            'max_batch_size': 0,
+            'flush_seconds_total': 0.0,
+            'flush_seconds_max': 0.0,
+            'last_flush_seconds': 0.0,
+        }
+        self._batch_histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue an item for writing.
+
+        Returns:
+            Future resolved with the write_batch result for this item, or failed
+            with WriteBehindFull if the queue stayed full for enqueue_timeout.
+        """
+        future = Future()
+        with self._close_lock:
+            if self._closed:
+                future.set_exception(RuntimeError("Write-behind writer is closed"))
+                return future
+            try:
+                self._queue.put((item, future), timeout=self.enqueue_timeout)
+            except queue.Full:
+                with self._lock:
+                    self._stats['dropped'] += 1
+                future.set_exception(WriteBehindFull("Write-behind queue is full, event dropped"))
+                return future
+        with self._lock:
+            self._stats['enqueued'] += 1
+        return future
+
+    def flush(self, timeout: float = 30.0):
+        """
+        Block until everything queued so far has been written.
+
+        Returns at once after close(), which already wrote everything queued.
+
+        Raises:
+            TimeoutError: The queue did not drain within timeout seconds
+        """
+        if self._closed:
+            return
+        started = time.monotonic()
+        marker = Future()
+        try:
+            self._queue.put((None, marker), timeout=timeout)
+        except queue.Full:
+            raise TimeoutError(f"Write-behind queue still full after {timeout}s") from None
+        remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+        try:
+            marker.result(timeout=remaining)
+        except FutureTimeout:
+            raise TimeoutError(f"Write-behind queue not drained after {timeout}s") from None
+
+    def close(self, timeout: float = 10.0):
+        """
+        Flush pending items and stop the writer thread.
+
+        Waits at most timeout seconds. If the queue is too full to take the
+        stop marker in that time, the writer still drains it and exits once
+        it is empty.
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        started = time.monotonic()
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            log.warning("Queue still full at close, writer exits once drained", timeout=timeout)
+            return
+        self._thread.join(max(0.0, timeout - (time.monotonic() - started)))
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth, batch sizes, flush latency and drops."""
+        with self._lock:
+            stats = dict(self._stats)
+            histogram = list(self._batch_histogram)
+        batches = stats['batches']
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['avg_batch_size'] = stats['written'] / batches if batches else 0
+        stats['avg_flush_seconds'] = stats['flush_seconds_total'] / batches if batches else 0
+        labels = [f"<={bound}" for bound in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+        stats['batch_size_histogram'] = dict(zip(labels, histogram))
+        return stats
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            stop = entry is _STOP
+            batch = [] if stop else [entry]
+            # Drain whatever piled up while the previous transaction was committing
+            while not stop and len(batch) < self.max_batch:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            if stop:
+                # Flush everything still queued before exiting
+                while True:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is not _STOP:
+                        batch.append(entry)
+                for start in range(0, len(batch), self.max_batch):
+                    self._write(batch[start:start + self.max_batch])
+                self._fail_pending()
+                return
+            self._write(batch)
+            if self._closed and self._queue.empty():
+                # close() could not queue _STOP while the queue was full
+                self._fail_pending()
+                return
+
+    def _fail_pending(self):
+        """Settle whatever reached the queue after the writer stopped taking items"""
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if entry is _STOP:
+                continue
+            item, future = entry
+            if item is None:
+                # A flush marker: everything before it was written
+                future.set_result(None)
+            else:
+                future.set_exception(RuntimeError("Write-behind writer is closed"))
+
+    def _write(self, batch):
+        items = [(item, future) for item, future in batch if item is not None]
+        markers = [future for item, future in batch if item is None]
+        if items:
+            started = time.perf_counter()
+            try:
+                results = self.write_batch([item for item, _ in items])
+            except Exception as e:
+                log.error("Batch failed", size=len(items), error=str(e))
+                with self._lock:
+                    self._stats['failed'] += len(items)
+                for _, future in items:
+                    future.set_exception(e)
+            else:
+                elapsed = time.perf_counter() - started
+                self._record_batch(len(items), elapsed)
+                for (_, future), result in zip(items, results):
+                    future.set_result(result)
+        for future in markers:
+            future.set_result(None)
+
+    def _record_batch(self, size, elapsed):
+        bucket = len(BATCH_SIZE_BUCKETS)
+        for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                bucket = i
+                break
+        with self._lock:
+            self._stats['written'] += size
+            self._stats['batches'] += 1
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], size)
+            self._stats['flush_seconds_total'] += elapsed
+            self._stats['flush_seconds_max'] = max(self._stats['flush_seconds_max'], elapsed)
+            self._stats['last_flush_seconds'] = elapsed
+            self._batch_histogram[bucket] += 1
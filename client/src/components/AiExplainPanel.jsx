@@ -13,8 +13,11 @@ import { API_URL } from '../config/api';
  * - Regenerate button
  * - Copy to clipboard
  * - Add to report
+ *
+ * Lists can pass batchExplanation (from /api/ai/explain/batch) and batchPending
+ * so each row does not request its own explanation.
  */
-const AiExplainPanel = ({ eventId, eventData, onAddToReport }) => {
+const AiExplainPanel = ({ eventId, eventData, onAddToReport, batchExplanation, batchPending }) => {
     const [explanation, setExplanation] = useState(null);
     const [loading, setLoading] = useState(false);
     const [copied, setCopied] = useState(false);
@@ -53,10 +56,16 @@ const AiExplainPanel = ({ eventId, eventData, onAddToReport }) => {
     };
 
     useEffect(() => {
-        if (eventId || eventData) {
+        if (batchExplanation) {
+            setExplanation(batchExplanation);
+            setLoading(false);
+        } else if (batchPending) {
+            setLoading(true);
+        } else if (eventId || eventData) {
+            // Not in the batch (or no batch): fetch this event on its own
             fetchExplanation();
         }
-    }, [eventId, eventData]);
+    }, [eventId, eventData, batchExplanation, batchPending]);
 
     const copyToClipboard = async () => {
         if (!explanation) return;
@@ -27,6 +27,8 @@ const Dashboard = () => {
     const [lastUpdateTime, setLastUpdateTime] = useState(null);
     const [connectionStatus, setConnectionStatus] = useState('connected'); // 'connected', 'disconnected', 'error'
     const [errorMessage, setErrorMessage] = useState(null);
+    const [explanations, setExplanations] = useState({});
+    const [explanationsPending, setExplanationsPending] = useState(true);
 
     const fetchLogs = async () => {
         try {
@@ -202,6 +204,34 @@ const Dashboard = () => {
         setFilteredLogs(filtered);
     }, [logs, searchQuery, filterType]);
 
+    useEffect(() => {
+        // Explain new log rows with a few batch requests instead of one request per row
+        const ids = logs.map(log => log.id).filter(id => !(id in explanations));
+        if (ids.length === 0) {
+            setExplanationsPending(false);
+            return;
+        }
+        setExplanationsPending(true);
+        const fetchExplanations = async () => {
+            const fetched = {};
+            try {
+                for (let i = 0; i < ids.length; i += 500) {
+                    const response = await axios.post(`${API_URL}/api/ai/explain/batch`, {
+                        event_ids: ids.slice(i, i + 500)
+                    }, { timeout: 30000 });
+                    for (const item of response.data.explanations || []) {
+                        fetched[item.event_id] = item.explanation;
+                    }
+                }
+            } catch (error) {
+                console.error('[Dashboard] Error fetching explanations:', error.message);
+            }
+            setExplanations(previous => ({ ...previous, ...fetched }));
+            setExplanationsPending(false);
+        };
+        fetchExplanations();
+    }, [logs]);
+
     const downloadReport = (format = 'txt') => {
         const dataToExport = filteredLogs.length > 0 ? filteredLogs : logs;
         
@@ -823,7 +853,12 @@ const Dashboard = () => {
                             </div>
                             {/* AI Panel (hidden by default, shown on click) */}
                             <div id={`ai-panel-${log.id}`} className="ai-panel hidden mt-3">
-                                <AiExplainPanel eventId={log.id} eventData={log} />
+                                <AiExplainPanel
+                                    eventId={log.id}
+                                    eventData={log}
+                                    batchExplanation={explanations[log.id]}
+                                    batchPending={explanationsPending}
+                                />
                             </div>
                             </div>
                         ))}
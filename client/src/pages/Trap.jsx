@@ -4,6 +4,7 @@ import { useNavigate } from 'react-router-dom';
 import { Lock, ShieldCheck, Sun, Moon, Circle } from 'lucide-react';
 import { useTheme } from '../contexts/ThemeContext';
 import sessionRecorder from '../utils/sessionRecorder';
+import ActionStream from '../utils/actionStream';
 import { API_URL } from '../config/api';
 
 // ⚠️ DEMO MODE: Set to false in production to disable keystroke capture
@@ -19,6 +20,7 @@ const Trap = () => {
   const navigate = useNavigate();
   const userIdRef = useRef(null);
   const passwordRef = useRef(null);
+  const actionStreamRef = useRef(null);
 
   // Initialize session recorder
   useEffect(() => {
@@ -27,10 +29,16 @@ const Trap = () => {
       sessionRecorder.start();
       setIsRecording(true);
 
+      // Upload actions while the page is open, not only at submit
+      const actionStream = new ActionStream(sessionRecorder);
+      actionStream.start();
+      actionStreamRef.current = actionStream;
+
       // Record initial focus
       sessionRecorder.recordFocus('page_load');
 
       return () => {
+        actionStream.stop();
         sessionRecorder.stop();
       };
     }
@@ -97,17 +105,33 @@ const Trap = () => {
       // Send both fields for analysis
       const payload = `User ID: ${userId}, Password: ${password}`;
 
-      // Get recorded actions
-      const actions = DEMO_MODE && isRecording ? sessionRecorder.getActions() : [];
+      // The actions are already uploaded: send only the session id once the last chunk is
+      // stored, or the actions themselves (column by column) if the upload failed
+      const actionStream = actionStreamRef.current;
+      let sessionFields = {};
+      if (DEMO_MODE && isRecording && actionStream) {
+        await actionStream.flush();
+        sessionFields = actionStream.isComplete()
+          ? { session_id: actionStream.sessionId }
+          : { action_columns: sessionRecorder.getActionColumns(actionStream.sessionStart) };
+      }
 
       // Use /api/submit endpoint which handles both analysis and logging
       // This prevents duplicate log entries
-      const response = await axios.post(`${API_URL}/api/submit`, {
-        input: payload,
-        username: userId,
-        ip_address: '127.0.0.1',
-        actions: actions
-      });
+      let response;
+      try {
+        response = await axios.post(`${API_URL}/api/submit`, {
+          input: payload,
+          username: userId,
+          ip_address: '127.0.0.1',
+          ...sessionFields
+        });
+      } finally {
+        // The submit closed this session; later actions go to a new one
+        if (DEMO_MODE && isRecording && actionStream) {
+          actionStream.rotate();
+        }
+      }
 
       // Extract response data (submit endpoint returns different structure)
       const responseData = {
@@ -0,0 +1,121 @@
+/**
+ * Live upload of recorded session actions
+ *
+ * While the page is open, actions the session recorder has not uploaded yet
+ * are sent to POST /api/sessions/{sessionId}/actions every few seconds as
+ * numbered chunks, so a session the attacker abandons is still captured and
+ * /api/submit only has to carry the session id.
+ *
+ * Chunks go out one at a time, in order. A chunk that fails on the network is
+ * resent with the same seq on the next flush (the server ignores duplicates);
+ * if the server refuses the session (409/413), isComplete() turns false and
+ * the caller sends the actions inline instead.
+ */
+import axios from 'axios';
+import { API_URL } from '../config/api';
+
+const CHUNK_ACTIONS = 200; // actions per chunk (the server accepts up to ACTION_CHUNK_MAX)
+const FLUSH_INTERVAL_MS = 2000;
+
+const newSessionId = () => {
+    if (window.crypto?.randomUUID) {
+        return window.crypto.randomUUID();
+    }
+    return `s-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+};
+
+class ActionStream {
+    constructor(recorder) {
+        this.recorder = recorder;
+        this.sessionId = null;
+        this.sessionStart = 0; // index of the session's first action in the recorder
+        this.sent = 0; // recorder actions stored by the server
+        this.seq = 0; // next chunk number
+        this.failed = false;
+        this.pending = Promise.resolve();
+        this.timer = null;
+        this.handlePageHide = () => this.flushOnUnload();
+    }
+
+    /**
+     * Start uploading (call after the recorder has started)
+     */
+    start() {
+        this.rotate();
+        this.timer = setInterval(() => this.flush(), FLUSH_INTERVAL_MS);
+        window.addEventListener('pagehide', this.handlePageHide);
+    }
+
+    stop() {
+        clearInterval(this.timer);
+        this.timer = null;
+        window.removeEventListener('pagehide', this.handlePageHide);
+    }
+
+    /**
+     * Begin a new session for the actions recorded from now on.
+     * A submit closes the server-side session, so call this after each one.
+     */
+    rotate() {
+        this.sessionId = newSessionId();
+        this.sessionStart = this.recorder.getActions().length;
+        this.sent = this.sessionStart;
+        this.seq = 0;
+        this.failed = false;
+    }
+
+    /**
+     * Upload every action not sent yet; resolves once they are stored or the upload failed
+     */
+    flush() {
+        this.pending = this.pending.then(() => this.sendPending());
+        return this.pending;
+    }
+
+    /**
+     * True if the server holds every action of the current session
+     */
+    isComplete() {
+        return !this.failed && this.sent === this.recorder.getActions().length;
+    }
+
+    async sendPending() {
+        const total = this.recorder.getActions().length;
+        while (!this.failed && this.sent < total) {
+            const end = Math.min(total, this.sent + CHUNK_ACTIONS);
+            try {
+                const response = await axios.post(`${API_URL}/api/sessions/${this.sessionId}/actions`, {
+                    seq: this.seq,
+                    action_columns: this.recorder.getActionColumns(this.sent, end)
+                });
+                this.seq = response.data.next_seq;
+                this.sent = end;
+            } catch (error) {
+                const status = error.response?.status;
+                if (status && status < 500 && status !== 429) {
+                    console.warn('[ActionStream] Session upload refused', error.response?.data);
+                    this.failed = true;
+                }
+                // Network errors and 5xx: the same chunk is retried on the next flush
+                return;
+            }
+        }
+    }
+
+    /**
+     * Best-effort upload of the next chunk while the page is being closed
+     */
+    flushOnUnload() {
+        const total = this.recorder.getActions().length;
+        if (this.failed || this.sent >= total) return;
+        const end = Math.min(total, this.sent + CHUNK_ACTIONS);
+        fetch(`${API_URL}/api/sessions/${this.sessionId}/actions`, {
+            method: 'POST',
+            keepalive: true, // lets the request outlive the page
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ seq: this.seq, action_columns: this.recorder.getActionColumns(this.sent, end) })
+        }).catch(() => {});
+    }
+}
+
+export default ActionStream;
@@ -406,6 +406,23 @@ class SessionRecorder {
         return this.actions;
     }
     
+    /**
+     * Get recorded actions [start, end) as parallel arrays (the action_columns form of /api/submit).
+     * Only the fields the server stores are included; index i of each array is action i.
+     */
+    getActionColumns(start = 0, end = this.actions.length) {
+        const columns = { type: [], ts: [], payload: [], x: [], y: [], target: [] };
+        this.actions.slice(start, end).forEach(action => {
+            columns.type.push(action.type);
+            columns.ts.push(action.ts);
+            columns.payload.push(action.payload ?? null);
+            columns.x.push(action.x ?? null);
+            columns.y.push(action.y ?? null);
+            columns.target.push(action.target ?? null);
+        });
+        return columns;
+    }
+    
     /**
      * Get actions summary
      */
@@ -38,8 +38,7 @@ def test_pdf_generation():
         # Generate PDF
         print("Generating PDF...")
         try:
-            pdf_buffer = generate_pdf_report(test_ip)
-            pdf_data = pdf_buffer.read()
+            pdf_data = generate_pdf_report(test_ip).getvalue()
             
             print(f"PDF generated successfully!")
             print(f"Size: {len(pdf_data)} bytes")
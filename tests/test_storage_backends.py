@@ -0,0 +1,180 @@
+"""
+Behavioural conformance of every backend in backend.storage.BACKENDS.
+
+Each test runs against every backend, with and without the write-behind
+writer (DB_WRITE_BEHIND), on a fresh store in a temporary directory.
+
+    python -m pytest tests/test_storage_backends.py
+"""
+import os
+
+import pytest
+
+os.environ.setdefault("DB_MIGRATE_ON_START", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from backend.database import LOG_COLUMNS, ActionSessionConflict, now_ms  # noqa: E402
+from backend.storage import BACKENDS, create_database  # noqa: E402
+from backend.utils.action_codec import ActionColumns  # noqa: E402
+from backend.utils.hash import EVENT_HASH_VERSION  # noqa: E402
+
+ACTIONS = [
+    {'type': 'focus', 'ts': 1000, 'target': 'username'},
+    {'type': 'keystroke', 'ts': 1150, 'payload': "'", 'target': 'username'},
+    {'type': 'click', 'ts': 1900, 'x': 10.5, 'y': 20.0, 'target': 'submit'},
+]
+
+CONFIGS = [(name, write_behind) for name in BACKENDS for write_behind in (False, True)]
+
+
+def _event(i, actions=None):
+    attack_type = ('SQLi', 'XSS', 'Benign')[i % 3]
+    return (f"10.0.{i % 5}.{i % 5}", f"payload {i}", attack_type, 0.5 + (i % 50) / 100,
+            f"strategy-{i % 4}", f"{i:064x}", actions)
+
+
+@pytest.fixture(params=CONFIGS, ids=[f"{name}-write-behind" if write_behind else name
+                                     for name, write_behind in CONFIGS])
+def db(request, tmp_path):
+    name, write_behind = request.param
+    kwargs = {}
+    if name == 'sqlite':
+        kwargs.update(db_name=str(tmp_path / "test.db"), migrate=False)
+    elif name == 'segment':
+        kwargs.update(path=str(tmp_path / "segments"))
+    store = create_database(name, write_behind=write_behind, **kwargs)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def events(db):
+    """Seven events: a batch of six (the second with actions) and a single one, as (ids, single, before, after)"""
+    before = now_ms()
+    ingested = []
+    db.add_ingest_listener(lambda log_ids, events: ingested.extend(log_ids))
+    ids = db.log_attacks([_event(i, ACTIONS if i == 1 else None) for i in range(6)])
+    assert ids == list(range(ids[0], ids[0] + 6)), ids
+    single = db.log_attack(*_event(6))
+    assert single == ids[-1] + 1
+    assert ingested == ids + [single], ingested
+    return ids, single, before, now_ms() + 1
+
+
+def test_lookups(db, events):
+    ids, single, before, after = events
+    log = db.get_log(ids[2])
+    assert list(log) == list(LOG_COLUMNS), list(log)
+    assert (log['id'], log['ip_address'], log['attack_type']) == (ids[2], "10.0.2.2", 'Benign')
+    assert log['timestamp'] and before <= log['ts_ms'] < after
+    assert log['hash_version'] == EVENT_HASH_VERSION
+    assert db.get_log(single + 1000) is None
+    assert [row['id'] for row in db.get_logs_by_ids([ids[3], single + 1000, ids[0], ids[3]])] == [ids[3], ids[0], ids[3]]
+    assert db.get_logs_by_ids([ids[2]]) == [log] and db.get_logs_by_ids([]) == []
+
+
+def test_time_ranges_and_ip_reads(db, events):
+    ids, single, before, after = events
+    logs = db.get_logs()
+    assert [row['id'] for row in logs] == list(range(single, ids[0] - 1, -1))
+    assert len(db.get_logs(since_ms=before, until_ms=after)) == 7
+    assert db.get_logs(since_ms=after) == [] and db.get_logs(until_ms=before) == []
+    assert [row['id'] for row in db.get_logs(limit=2)] == [row['id'] for row in logs[:2]]
+    assert db.get_logs(since_ms=before, until_ms=after, limit=100) == db.get_logs(since_ms=before, until_ms=after)
+
+    assert [row['id'] for row in db.get_logs_for_ip("10.0.0.0")] == [ids[5], ids[0]]
+    assert db.get_logs_for_ip("192.0.2.1") == []
+    assert [row['id'] for row in db.get_logs_for_ip("10.0.0.0", limit=1)] == [ids[5]]
+    assert [row['id'] for row in db.get_logs_for_ip("10.0.0.0", since_ms=before, until_ms=after)] == [ids[5], ids[0]]
+    assert db.get_logs_for_ip("10.0.0.0", since_ms=after) == []
+    assert [[row['id'] for row in chunk] for chunk in db.iter_logs_for_ip("10.0.0.0", chunk_size=1)] == [[ids[0]], [ids[5]]]
+    assert list(db.iter_logs_for_ip("192.0.2.1")) == []
+    assert db.get_ip_last_event_id("10.0.0.0") == ids[5] and db.get_ip_last_event_id("192.0.2.1") is None
+
+
+def test_actions(db, events):
+    ids = events[0]
+    assert db.get_actions(ids[1]) == ACTIONS
+    assert db.get_actions(ids[1], 1, 2) == ACTIONS[1:2]
+    assert db.get_actions(ids[0]) == []
+    db.save_actions(ids[0], ACTIONS[:1])
+    assert db.get_actions(ids[0]) == ACTIONS[:1]
+
+
+def test_action_session_chunks(db):
+    full = ActionColumns.from_dicts(ACTIONS).to_dicts()
+    assert db.get_action_session("s-1") is None and db.get_action_chunks("s-1") == []
+    assert db.append_action_chunk("s-1", 1, ACTIONS[:1]) == ('gap', 0)
+    assert db.append_action_chunk("s-1", 0, ACTIONS[:2]) == ('stored', 1)
+    assert db.append_action_chunk("s-1", 0, ACTIONS[:2]) == ('duplicate', 1)
+    assert db.append_action_chunk("s-1", 1, ACTIONS[2:], max_actions=2) == ('full', 1)
+    assert db.append_action_chunk("s-1", 1, ActionColumns.from_dicts(ACTIONS[2:])) == ('stored', 2)
+    assert [chunk.to_dicts() for chunk in db.get_action_chunks("s-1")] == [full[:2], full[2:]]
+    session = db.close_action_session("s-1")
+    assert (session['chunks'], session['actions'], session['closed'], session['event_id']) == (2, 3, True, None), session
+    assert db.append_action_chunk("s-1", 2, ACTIONS) == ('closed', 2)
+    assert db.append_action_chunk("s-1", 1, ACTIONS) == ('duplicate', 2)
+    assert db.close_action_session("s-2")['chunks'] == 0 and db.append_action_chunk("s-2", 0, ACTIONS) == ('closed', 0)
+
+
+def test_session_submit_and_expiry(db):
+    full = ActionColumns.from_dicts(ACTIONS).to_dicts()
+    db.append_action_chunk("s-1", 0, ACTIONS)
+    db.close_action_session("s-1")
+    # Submitting a session stores the event and links the session in one step, once
+    linked = db.log_session_attack("s-1", "10.0.2.2", "s", "XSS", 0.5, "None", "h", full)
+    assert db.get_action_session("s-1")['event_id'] == linked and db.get_action_chunks("s-1") == []
+    assert db.get_actions(linked) == full
+    with pytest.raises(ActionSessionConflict) as conflict:
+        db.log_session_attack("s-1", "10.0.2.2", "s", "XSS", 0.5, "None", "h")
+    assert conflict.value.event_id == linked
+    assert db.get_confidence_stats()['total'] == 1
+
+    assert db.append_action_chunk("s-3", 0, ACTIONS) == ('stored', 1)
+    assert db.expire_action_sessions(now_ms() + 1) == 2
+    assert db.get_action_session("s-3") is None and db.get_action_chunks("s-3") == []
+    assert db.get_action_session("s-1") is None and db.get_log(linked) is not None
+    with pytest.raises(ActionSessionConflict) as conflict:
+        db.log_session_attack("s-3", "10.0.2.2", "s", "XSS", 0.5, "None", "h")
+    assert conflict.value.event_id is None
+
+
+def test_explanations(db, events):
+    ids, single = events[:2]
+    db.save_explanations([(ids[0], 1, {'severity': 7}), (ids[1], 1, {'severity': 3})])
+    db.save_explanations([(ids[0], 2, {'severity': 8})])
+    assert db.get_explanations([ids[0], ids[1], single + 1000]) == {ids[0]: (2, {'severity': 8}), ids[1]: (1, {'severity': 3})}
+    assert db.get_explanations([]) == {}
+
+
+def test_rollups(db, events):
+    top = db.get_top_ips(3)
+    assert top[0]['total'] == 2 and set(top[0]) == {'ip', 'total', 'sqli', 'xss', 'benign'}, top
+    assert sum(row['count'] for row in db.get_strategy_counts()) == 7
+    confidence = db.get_confidence_stats()
+    assert confidence['total'] == 7 and confidence['min'] == 0.5 and confidence['max'] == 0.56, confidence
+
+
+def test_bucket_counts(db, events):
+    before, after = events[2:]
+    hour = 3600000
+    start = before // hour * hour
+    for bucket_ms, end in ((hour, start + 2 * hour), (60000, after)):
+        rows = db.get_bucket_counts(start, end, bucket_ms, 'attack_type')
+        assert sum(count for _, _, count in rows) == 7, rows
+        assert {key for _, key, _ in rows} == {'SQLi', 'XSS', 'Benign'}, rows
+    rows = db.get_bucket_counts(start, start + 2 * hour, hour, 'strategy')
+    assert sum(count for _, key, count in rows if key == 'strategy-0') == 2, rows
+
+
+def test_queued_writes(db):
+    futures = [db.queue_attack(*_event(i, ACTIONS if i == 0 else None)) for i in range(20)]
+    db.flush()
+    ids = [future.result(timeout=10) for future in futures]
+    assert ids == list(range(ids[0], ids[0] + 20)), ids
+    assert [row['input_payload'] for row in db.get_logs_by_ids(ids)] == [f"payload {i}" for i in range(20)]
+    assert db.get_actions(ids[0]) == ACTIONS
+    stats = db.write_stats()
+    assert stats['enabled'] == db.write_behind
+    if db.write_behind:
+        assert stats['written'] == 20 and stats['failed'] == stats['dropped'] == 0, stats